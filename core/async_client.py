@@ -0,0 +1,183 @@
+# core/async_client.py
+import asyncio
+import time
+
+import httpx
+
+from core.client import SDClientBase, checkpoint_matches, retries_exhausted, server_error
+from core.settings import WEBUI_API_URL, HTTP_POOL_SETTINGS
+
+
+def build_async_http_client(pool_settings=None):
+    cfg = {**HTTP_POOL_SETTINGS, **(pool_settings or {})}
+    limits = httpx.Limits(
+        max_connections=cfg["pool_maxsize"] * cfg["pool_connections"],
+        max_keepalive_connections=cfg["pool_maxsize"] if cfg["keep_alive"] else 0,
+    )
+    # httpx transports only retry connection failures, matching build_session().
+    transport = httpx.AsyncHTTPTransport(retries=cfg["connect_retries"], limits=limits)
+    headers = {} if cfg["keep_alive"] else {"Connection": "close"}
+    return httpx.AsyncClient(transport=transport, headers=headers)
+
+
+class AsyncSDClient(SDClientBase):
+    """asyncio counterpart of SDClient for the FastAPI server.
+
+    Mirrors the SDClient method names and return values so call sites only
+    need an ``await``; status calls never block a threadpool thread.
+    """
+
+    def __init__(self, base_url=WEBUI_API_URL, request_timeout=None, max_retries=3, retry_delay=3, model_timeout=300,
+                 http_client=None, pool_settings=None, timeouts=None, poll_interval=3):
+        super().__init__(base_url, request_timeout, max_retries, retry_delay, model_timeout, timeouts, poll_interval)
+        self.http = http_client or build_async_http_client(pool_settings)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    async def check_connection(self):
+        try:
+            r = await self.http.get(f"{self.api_url}/progress", timeout=self._timeout("progress"))
+            return r.is_success
+        except Exception:
+            return False
+
+    async def get_progress(self):
+        r = await self.http.get(f"{self.api_url}/progress", timeout=self._timeout("progress"))
+        r.raise_for_status()
+        return r.json()
+
+    async def get_sd_models(self):
+        r = await self.http.get(f"{self.api_url}/sd-models", timeout=self._timeout("sd_models"))
+        r.raise_for_status()
+        return r.json()
+
+    async def get_controlnet_models(self):
+        r = await self.http.get(f"{self.base_url}/controlnet/model_list", timeout=self._timeout("controlnet_models"))
+        r.raise_for_status()
+        return r.json().get("model_list", [])
+
+    async def interrupt(self):
+        try:
+            r = await self.http.post(f"{self.api_url}/interrupt", timeout=self._timeout("interrupt"))
+            return r.is_success
+        except httpx.HTTPError:
+            return False
+
+    async def _post_with_retry(self, url, payload):
+        last_error = None
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                r = await self.http.post(url, json=payload, timeout=self._timeout("generate"))
+                if r.status_code == 200:
+                    return r.json()
+
+                last_error = server_error(r.status_code, r.text)
+                if last_error.out_of_memory:
+                    raise last_error
+            except httpx.ReadTimeout as e:
+                raise RuntimeError(
+                    "Generation timed out. The WebUI job may still be running, so the request was not retried."
+                ) from e
+            except httpx.ConnectError:
+                last_error = RuntimeError("WEBUI connection failed")
+            except httpx.HTTPError as e:
+                last_error = e
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.retry_delay)
+
+        raise retries_exhausted(self.max_retries, last_error)
+
+    async def get_options(self):
+        try:
+            r = await self.http.get(f"{self.api_url}/options", timeout=self._timeout("options"))
+            r.raise_for_status()
+            return r.json()
+        except httpx.HTTPError:
+            return {}
+
+    async def set_model(self, model_name):
+        current = (await self.get_options()).get("sd_model_checkpoint", "")
+        if checkpoint_matches(model_name, current):
+            try:
+                await self.http.post(f"{self.api_url}/options", json={"sd_vae": "Automatic"}, timeout=self._timeout("options_vae"))
+            except httpx.HTTPError:
+                pass
+            return True
+
+        try:
+            r = await self.http.post(
+                f"{self.api_url}/options", json={"sd_model_checkpoint": model_name, "sd_vae": "Automatic"},
+                timeout=self._timeout("options"),
+            )
+            r.raise_for_status()
+        except httpx.ReadTimeout:
+            # Model loading may outlive the HTTP response window. Poll below.
+            pass
+        except httpx.HTTPError:
+            return False
+
+        deadline = time.monotonic() + self.model_timeout
+        while True:
+            # Same as SDClient.set_model: the load is usually done when the POST returns.
+            opts = await self.get_options()
+            if checkpoint_matches(model_name, opts.get("sd_model_checkpoint", "")):
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(self.poll_interval)
+
+    async def interrogate(self, image_b64, model="deepdanbooru"):
+        payload = {"image": image_b64, "model": model}
+        try:
+            r = await self.http.post(f"{self.api_url}/interrogate", json=payload, timeout=self._timeout("interrogate"))
+            if r.status_code == 200:
+                return r.json().get("caption", "")
+        except httpx.HTTPError:
+            pass
+        return ""
+
+    async def find_controlnet_model(self, keywords):
+        if not keywords:
+            return None
+        if not self._cn_models_cache and not ("[" in keywords and "]" in keywords):
+            try:
+                self._cn_models_cache = await self.get_controlnet_models()
+            except Exception:
+                pass
+        return self._match_controlnet_model(keywords)
+
+    async def _build_alwayson_scripts(self, adetailer_args=None, controlnet_name=None, controlnet_img=None, use_dt=False, cn_weight=1.0, cn_end=1.0, alwayson_scripts=None):
+        real_model = await self.find_controlnet_model(controlnet_name) if controlnet_name else None
+        return self._compose_alwayson_scripts(
+            real_model, adetailer_args=adetailer_args, controlnet_name=controlnet_name,
+            controlnet_img=controlnet_img, use_dt=use_dt, cn_weight=cn_weight, cn_end=cn_end,
+            alwayson_scripts=alwayson_scripts,
+        )
+
+    async def txt2img(self, prompt, adetailer_args=None, controlnet_name=None, controlnet_img=None, use_dt=False, cn_weight=1.0, cn_end=1.0, **kwargs):
+        alwayson_scripts = await self._build_alwayson_scripts(
+            adetailer_args=adetailer_args, controlnet_name=controlnet_name,
+            controlnet_img=controlnet_img, use_dt=use_dt,
+            cn_weight=cn_weight, cn_end=cn_end,
+            alwayson_scripts=kwargs.pop("alwayson_scripts", {}),
+        )
+        payload = self._txt2img_payload(prompt, alwayson_scripts, kwargs)
+        return await self._post_with_retry(f"{self.api_url}/txt2img", payload)
+
+    async def img2img(self, init_image_b64, prompt, adetailer_args=None, controlnet_name=None, controlnet_img=None, use_dt=False, cn_weight=1.0, cn_end=1.0, **kwargs):
+        alwayson_scripts = await self._build_alwayson_scripts(
+            adetailer_args=adetailer_args, controlnet_name=controlnet_name,
+            controlnet_img=controlnet_img or init_image_b64, use_dt=use_dt,
+            cn_weight=cn_weight, cn_end=cn_end,
+            alwayson_scripts=kwargs.pop("alwayson_scripts", {}),
+        )
+        payload = self._img2img_payload(init_image_b64, prompt, alwayson_scripts, kwargs)
+        return await self._post_with_retry(f"{self.api_url}/img2img", payload)
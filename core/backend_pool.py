@@ -0,0 +1,199 @@
+# core/backend_pool.py
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+from core.client import SDClient, checkpoint_matches
+from core.settings import WEBUI_API_URLS
+
+
+def configured_webui_urls():
+    env_urls = os.getenv("PROJECT_ERO_WEBUI_URLS", "")
+    urls = [u.strip().rstrip("/") for u in env_urls.split(",") if u.strip()]
+    return urls or list(WEBUI_API_URLS)
+
+
+class Backend:
+    def __init__(self, client):
+        self.client = client
+        self.url = client.base_url
+        self.healthy = False
+        self.loaded_model = ""
+        self.queue_depth = 0
+        self.last_checked = None
+
+    def holds(self, model_name):
+        return bool(model_name and self.loaded_model) and checkpoint_matches(model_name, self.loaded_model)
+
+    def snapshot(self):
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "loaded_model": self.loaded_model,
+            "queue_depth": self.queue_depth,
+            "last_checked": self.last_checked,
+        }
+
+
+class BackendPool:
+    """Routes WebUI calls across several SD WebUI instances.
+
+    A backend is eligible for a model if it already holds that checkpoint, or if
+    it is idle and can switch without pulling the model out from under a running
+    request. Among eligible backends the ones holding the model win, then the
+    least busy one. When nothing is eligible, lease() waits for a backend to free up.
+    ``slots`` caps concurrent leases per backend (None = no cap).
+    """
+
+    def __init__(self, urls=None, client_factory=SDClient, health_ttl=15, slots=None):
+        urls = urls or configured_webui_urls()
+        self.backends = [Backend(client_factory(url)) for url in urls]
+        self.health_ttl = health_ttl
+        self.slots = slots
+        self.model_loads = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        for backend in self.backends:
+            backend.client.close()
+
+    @property
+    def primary(self):
+        return self.backends[0].client
+
+    def refresh(self, backend=None):
+        for b in [backend] if backend else self.backends:
+            healthy = b.client.check_connection()
+            loaded = b.client.get_options().get("sd_model_checkpoint", "") if healthy else ""
+            with self._cond:
+                b.healthy = healthy
+                # Keep a reservation made by an in-flight set_model.
+                if b.queue_depth == 0 or not b.loaded_model:
+                    b.loaded_model = loaded
+                b.last_checked = time.monotonic()
+                self._cond.notify_all()
+
+    def observe(self, url, healthy, loaded_model=None):
+        """Record a health sample taken elsewhere (the WebUI status poller); loaded_model=None keeps the last one."""
+        if not healthy:
+            loaded_model = ""
+        with self._cond:
+            for b in self.backends:
+                if b.url != url:
+                    continue
+                b.healthy = healthy
+                # Same rule as refresh(): keep a reservation made by an in-flight set_model.
+                if loaded_model is not None and (b.queue_depth == 0 or not b.loaded_model):
+                    b.loaded_model = loaded_model
+                b.last_checked = time.monotonic()
+            self._cond.notify_all()
+
+    def check_connection(self):
+        self.refresh()
+        return any(b.healthy for b in self.backends)
+
+    def holders(self, model_name):
+        with self._cond:
+            return [b.url for b in self.backends if b.healthy and b.holds(model_name)]
+
+    def status(self):
+        with self._cond:
+            return [b.snapshot() for b in self.backends]
+
+    def connection_stats(self):
+        totals = {"requests": 0, "connections_opened": 0, "connections_reused": 0}
+        for b in self.backends:
+            for key, value in b.client.connection_stats().items():
+                totals[key] += value
+        return totals
+
+    def _refresh_stale(self):
+        now = time.monotonic()
+        stale = [
+            b for b in self.backends
+            if b.queue_depth == 0 and (b.last_checked is None or now - b.last_checked > self.health_ttl)
+        ]
+        for b in stale:
+            self.refresh(b)
+
+    def _pick(self, model_name, exclude):
+        candidates = []
+        for idx, b in enumerate(self.backends):
+            if not b.healthy or b.url in exclude:
+                continue
+            if self.slots is not None and b.queue_depth >= self.slots:
+                continue
+            holds = b.holds(model_name) if model_name else True
+            if not holds and b.queue_depth > 0:
+                continue
+            candidates.append(((0 if holds else 1, b.queue_depth, idx), b))
+        if not candidates:
+            return None
+        return min(candidates, key=lambda c: c[0])[1]
+
+    @contextmanager
+    def lease(self, model_name=None, exclude=(), timeout=None):
+        """Reserve a backend that holds (or has just loaded) model_name and yield its client."""
+        self._refresh_stale()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            while True:
+                if not any(b.healthy and b.url not in exclude for b in self.backends):
+                    raise RuntimeError("No healthy WebUI backend available")
+                backend = self._pick(model_name, exclude)
+                if backend:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No WebUI backend became available for [{model_name}]")
+                self._cond.wait(remaining)
+            needs_switch = bool(model_name) and not backend.holds(model_name)
+            backend.queue_depth += 1
+            if needs_switch:
+                backend.loaded_model = model_name
+                self.model_loads += 1
+
+        try:
+            if needs_switch and not backend.client.set_model(model_name):
+                with self._cond:
+                    backend.loaded_model = ""
+                raise RuntimeError(f"Failed to load model [{model_name}] on {backend.url}")
+            yield backend.client
+        # RequestException covers transport errors a client call lets through unwrapped.
+        except (requests.exceptions.RequestException, OSError, RuntimeError):
+            if not backend.client.check_connection():
+                with self._cond:
+                    backend.healthy = False
+            raise
+        finally:
+            with self._cond:
+                backend.queue_depth -= 1
+                self._cond.notify_all()
+
+    def preload(self, model_name, exclude=()):
+        try:
+            with self.lease(model_name, exclude=exclude):
+                return True
+        except RuntimeError:
+            return False
+
+    def txt2img(self, model_name, prompt, **kwargs):
+        with self.lease(model_name) as client:
+            return client.txt2img(prompt, **kwargs)
+
+    def img2img(self, model_name, init_image_b64, prompt, **kwargs):
+        with self.lease(model_name) as client:
+            return client.img2img(init_image_b64, prompt, **kwargs)
+
+    def interrogate(self, image_b64, model="deepdanbooru"):
+        with self.lease() as client:
+            return client.interrogate(image_b64, model=model)
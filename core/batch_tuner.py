@@ -0,0 +1,107 @@
+# core/batch_tuner.py
+import json
+import os
+import threading
+from pathlib import Path
+
+from core.settings import BATCH_TUNER_SETTINGS
+
+# Weight of the newest measurement in the running seconds-per-image average.
+EWMA_ALPHA = 0.3
+
+
+def tuning_key(model, width, height, extensions=()):
+    """Configuration a batch size is learned for: model, resolution and active extensions."""
+    ext = "+".join(sorted(e for e in extensions if e)) or "plain"
+    return f"{model.split(' [')[0]}|{width}x{height}|{ext}"
+
+
+class BatchTuner:
+    """Learns the batch size with the best throughput for each generation configuration.
+
+    Every finished request is recorded as seconds per image for its batch
+    size. The tuner suggests one size above the current best until a bigger
+    batch stops being at least ``min_gain`` faster per image. An OOM or HTTP
+    500 at some size caps that configuration below it, and a batch that
+    filled VRAM past ``vram_headroom`` caps it at that size. What was learned
+    is saved to ``path`` and picked up by later runs.
+    """
+
+    def __init__(self, path=None, max_batch=None, min_gain=None, vram_headroom=None):
+        self.path = Path(path or BATCH_TUNER_SETTINGS["file"])
+        self.max_batch = max_batch or BATCH_TUNER_SETTINGS["max_batch"]
+        self.min_gain = BATCH_TUNER_SETTINGS["min_gain"] if min_gain is None else min_gain
+        self.vram_headroom = BATCH_TUNER_SETTINGS["vram_headroom"] if vram_headroom is None else vram_headroom
+        self._lock = threading.Lock()
+        self.configs = {}
+        if self.path.exists():
+            try:
+                self.configs = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.configs = {}
+
+    def _config(self, key):
+        return self.configs.setdefault(key, {"ceiling": None, "samples": {}})
+
+    def _limit(self, config):
+        return min(self.max_batch, config["ceiling"] or self.max_batch)
+
+    def _best(self, config):
+        limit = self._limit(config)
+        samples = {int(n): spi for n, spi in config["samples"].items() if int(n) <= limit}
+        best = min(samples) if samples else 1
+        for n in sorted(samples):
+            if samples[n] < samples[best] * (1 - self.min_gain):
+                best = n
+        return best, samples
+
+    def limit(self, key):
+        """Largest batch size the tuner may suggest for key."""
+        with self._lock:
+            return self._limit(self._config(key))
+
+    def best(self, key):
+        """Batch size with the best measured throughput (1 until something was measured)."""
+        with self._lock:
+            return self._best(self._config(key))[0]
+
+    def suggest(self, key):
+        """Batch size for the next request: the best one, or one above it while that is untested."""
+        with self._lock:
+            config = self._config(key)
+            best, samples = self._best(config)
+            if best in samples and best + 1 <= self._limit(config) and best + 1 not in samples:
+                return best + 1
+            return best
+
+    def record(self, key, batch_size, seconds, vram_fraction=None):
+        """A finished request; vram_fraction is the peak VRAM use sampled while it ran, if known."""
+        with self._lock:
+            config = self._config(key)
+            samples = config["samples"]
+            spi = seconds / batch_size
+            previous = samples.get(str(batch_size))
+            samples[str(batch_size)] = spi if previous is None else previous + EWMA_ALPHA * (spi - previous)
+            if vram_fraction is not None and vram_fraction >= self.vram_headroom:
+                config["ceiling"] = min(batch_size, config["ceiling"] or batch_size)
+
+    def record_failure(self, key, batch_size):
+        """An OOM/500 at batch_size: never try it (or anything bigger) again for this configuration."""
+        with self._lock:
+            config = self._config(key)
+            config["ceiling"] = max(1, batch_size - 1)
+            config["samples"] = {n: spi for n, spi in config["samples"].items() if int(n) < batch_size}
+            return self._best(config)[0]
+
+    def seconds_per_image(self, key):
+        with self._lock:
+            config = self._config(key)
+            best, samples = self._best(config)
+            return samples.get(best)
+
+    def save(self):
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".json.tmp")
+            tmp_path.write_text(json.dumps(self.configs, indent=2, sort_keys=True), encoding="utf-8")
+            os.replace(tmp_path, self.path)
@@ -1,42 +1,188 @@
 # core/client.py
 import requests
 import time
-from core.settings import WEBUI_API_URL, DT_DEFAULT_ARGS, CONTROLNET_MODULE
-from core.utils import OtakuSpinner, EvaText
+from core.settings import WEBUI_API_URL, DT_DEFAULT_ARGS, CONTROLNET_MODULE, HTTP_TIMEOUTS
+from core.http_session import build_session, session_stats
+from core.render_cache import is_cacheable, render_key
+from core.stream_json import decode_image_response
+from core.utils import OtakuSpinner, EvaText, enable_ansi_console
 
-class SDClient:
-    def __init__(self, base_url=WEBUI_API_URL, request_timeout=None, max_retries=3, retry_delay=3, model_timeout=300):
+RESPONSE_CHUNK_SIZE = 64 * 1024
+OOM_MARKERS = ("out of memory", "outofmemoryerror")
+
+
+class WebUIServerError(RuntimeError):
+    """The WebUI answered a generation request with an HTTP error status."""
+
+    def __init__(self, message, status_code=None, out_of_memory=False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.out_of_memory = out_of_memory
+
+
+def server_error(status_code, response_text):
+    response_body = response_text[:500].replace("\n", " ")
+    out_of_memory = any(marker in response_text.lower() for marker in OOM_MARKERS)
+    return WebUIServerError(f"SERVER ERROR {status_code}: {response_body}", status_code, out_of_memory)
+
+
+def retries_exhausted(max_retries, last_error):
+    message = f"WEBUI request failed after {max_retries} attempts: {last_error}"
+    if isinstance(last_error, WebUIServerError):
+        return WebUIServerError(message, last_error.status_code)
+    return RuntimeError(message)
+
+
+def checkpoint_matches(model_name, checkpoint):
+    model_clean = model_name.split(" [")[0].strip()
+    checkpoint_clean = checkpoint.split(" [")[0].strip()
+    return model_clean == checkpoint_clean or model_clean in checkpoint or checkpoint_clean in model_name
+
+
+class SDClientBase:
+    """Transport-independent part of the WebUI client: configuration and payload building.
+
+    SDClient (requests) and AsyncSDClient (httpx) only differ in how they talk
+    to the WebUI, so everything that decides *what* is sent lives here.
+    """
+
+    def __init__(self, base_url=WEBUI_API_URL, request_timeout=None, max_retries=3, retry_delay=3, model_timeout=300,
+                 timeouts=None, poll_interval=3):
+        # The client prints EvaText colours from main, webui/app.py and the tools alike.
+        if not EvaText.headless:
+            enable_ansi_console()
         self.base_url = base_url
         self.api_url = f"{base_url}/sdapi/v1"
         self.request_timeout = request_timeout
         self.max_retries = max_retries
         self.retry_delay = retry_delay
         self.model_timeout = model_timeout
+        self.timeouts = {**HTTP_TIMEOUTS, **(timeouts or {})}
+        self.poll_interval = poll_interval
         self._cn_models_cache = []
 
+    def _timeout(self, endpoint):
+        if endpoint in ("generate", "interrogate") and self.request_timeout is not None:
+            return self.request_timeout
+        return self.timeouts.get(endpoint)
+
+    def _match_controlnet_model(self, keywords):
+        if "[" in keywords and "]" in keywords:
+            return keywords
+        for model in self._cn_models_cache:
+            if keywords.lower() in model.lower():
+                return model
+        return None
+
+    def _compose_alwayson_scripts(self, real_model, adetailer_args=None, controlnet_name=None, controlnet_img=None,
+                                  use_dt=False, cn_weight=1.0, cn_end=1.0, alwayson_scripts=None):
+        alwayson_scripts = dict(alwayson_scripts or {})
+        if adetailer_args:
+            alwayson_scripts["ADetailer"] = {"args": adetailer_args}
+
+        if controlnet_name:
+            if not real_model:
+                raise ValueError(f"ControlNet model not found: {controlnet_name}")
+            if not controlnet_img:
+                raise ValueError("ControlNet image is required")
+            alwayson_scripts["ControlNet"] = {
+                "args": [{
+                    "enabled": True,
+                    "module": CONTROLNET_MODULE,
+                    "model": real_model,
+                    "weight": cn_weight,
+                    "guidance_end": cn_end,
+                    "image": controlnet_img,
+                    "resize_mode": "Crop and Resize",
+                    "pixel_perfect": True,
+                    "control_mode": "Balanced",
+                }]
+            }
+
+        if use_dt:
+            alwayson_scripts["Dynamic Thresholding (CFG Scale Fix)"] = {"args": DT_DEFAULT_ARGS}
+
+        return alwayson_scripts
+
+    @staticmethod
+    def _txt2img_payload(prompt, alwayson_scripts, kwargs):
+        return {"prompt": prompt, "alwayson_scripts": alwayson_scripts, **kwargs}
+
+    @staticmethod
+    def _img2img_payload(init_image_b64, prompt, alwayson_scripts, kwargs):
+        return {"init_images": [init_image_b64], "prompt": prompt, "alwayson_scripts": alwayson_scripts, **kwargs}
+
+
+class SDClient(SDClientBase):
+    def __init__(self, base_url=WEBUI_API_URL, request_timeout=None, max_retries=3, retry_delay=3, model_timeout=300,
+                 session=None, pool_settings=None, timeouts=None, poll_interval=3, render_cache=None, tag_cache=None):
+        super().__init__(base_url, request_timeout, max_retries, retry_delay, model_timeout, timeouts, poll_interval)
+        self.session = session or build_session(pool_settings)
+        self.render_cache = render_cache
+        self.tag_cache = tag_cache
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def connection_stats(self):
+        return session_stats(self.session)
+
     def check_connection(self):
         try:
-            return requests.get(f"{self.api_url}/progress", timeout=3).ok
+            return self.session.get(f"{self.api_url}/progress", timeout=self._timeout("progress")).ok
         except Exception:
             return False
 
+    def get_progress(self):
+        r = self.session.get(f"{self.api_url}/progress", timeout=self._timeout("progress"))
+        r.raise_for_status()
+        return r.json()
+
+    def get_sd_models(self):
+        r = self.session.get(f"{self.api_url}/sd-models", timeout=self._timeout("sd_models"))
+        r.raise_for_status()
+        return r.json()
+
+    def get_controlnet_models(self):
+        r = self.session.get(f"{self.base_url}/controlnet/model_list", timeout=self._timeout("controlnet_models"))
+        r.raise_for_status()
+        return r.json().get("model_list", [])
+
+    def interrupt(self):
+        try:
+            return self.session.post(f"{self.api_url}/interrupt", timeout=self._timeout("interrupt")).ok
+        except requests.exceptions.RequestException:
+            return False
+
     def _post_with_retry(self, url, payload):
         last_error = None
         for attempt in range(1, self.max_retries + 1):
             try:
-                r = requests.post(url, json=payload, timeout=self.request_timeout)
-                if r.status_code == 200:
-                    return r.json()
+                # Streamed, so base64 images are cut out of the body without holding it twice.
+                r = self.session.post(url, json=payload, timeout=self._timeout("generate"), stream=True)
+                try:
+                    if r.status_code == 200:
+                        return decode_image_response(r.iter_content(chunk_size=RESPONSE_CHUNK_SIZE))
 
-                response_body = r.text[:500].replace("\n", " ")
-                last_error = RuntimeError(f"SERVER ERROR {r.status_code}: {response_body}")
+                    last_error = server_error(r.status_code, r.text)
+                finally:
+                    r.close()
+                if last_error.out_of_memory:
+                    # The same batch would run out of memory again; the caller has to shrink it.
+                    raise last_error
             except requests.exceptions.ReadTimeout as e:
                 raise RuntimeError(
                     "Generation timed out. The WebUI job may still be running, so the request was not retried."
                 ) from e
             except requests.exceptions.ConnectionError as e:
                 last_error = RuntimeError("WEBUI connection failed")
-            except requests.exceptions.RequestException as e:
+            except (requests.exceptions.RequestException, ValueError) as e:
                 last_error = e
 
             if attempt < self.max_retries:
@@ -47,30 +193,67 @@ class SDClient:
                 with OtakuSpinner(msg) as _:
                     time.sleep(self.retry_delay)
 
-        raise RuntimeError(f"WEBUI request failed after {self.max_retries} attempts: {last_error}")
+        raise retries_exhausted(self.max_retries, last_error)
+
+    def _render_cache_key(self, endpoint, payload):
+        if self.render_cache is None:
+            return None
+        if not is_cacheable(payload):
+            self.render_cache.record_bypass()
+            return None
+        # The key includes the checkpoint (title carries its hash) and VAE actually loaded.
+        options = self.get_options()
+        if not options.get("sd_model_checkpoint"):
+            self.render_cache.record_bypass()
+            return None
+        return render_key(endpoint, payload, options["sd_model_checkpoint"], options.get("sd_vae"))
+
+    def _generate(self, endpoint, payload):
+        cache_key = self._render_cache_key(endpoint, payload)
+        if cache_key:
+            cached = self.render_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        resp = self._post_with_retry(f"{self.api_url}/{endpoint}", payload)
+        if cache_key:
+            try:
+                self.render_cache.put(cache_key, resp)
+            except Exception as e:
+                print(f"{EvaText.WARNING}RENDER CACHE WRITE FAILED: {e}{EvaText.ENDC}")
+        return resp
 
     def get_options(self):
         try:
-            r = requests.get(f"{self.api_url}/options", timeout=10)
+            r = self.session.get(f"{self.api_url}/options", timeout=self._timeout("options"))
             r.raise_for_status()
             return r.json()
         except requests.exceptions.RequestException:
             return {}
 
+    def get_memory(self):
+        """The WebUI's /sdapi/v1/memory report (RAM and CUDA stats), or {} if unavailable."""
+        try:
+            r = self.session.get(f"{self.api_url}/memory", timeout=self._timeout("memory"))
+            r.raise_for_status()
+            return r.json()
+        except (requests.exceptions.RequestException, ValueError):
+            return {}
+
     def set_model(self, model_name):
         current = self.get_options().get("sd_model_checkpoint", "")
-        model_clean = model_name.split(" [")[0].strip()
-        current_clean = current.split(" [")[0].strip()
-        if model_clean == current_clean or model_clean in current or current_clean in model_name:
+        if checkpoint_matches(model_name, current):
             try:
-                requests.post(f"{self.api_url}/options", json={"sd_vae": "Automatic"}, timeout=5)
+                self.session.post(f"{self.api_url}/options", json={"sd_vae": "Automatic"}, timeout=self._timeout("options_vae"))
             except Exception:
                 pass
             return True
 
         print(f"🔄 DEPLOYING UNIT: [{model_name}] ...")
         try:
-            r = requests.post(f"{self.api_url}/options", json={"sd_model_checkpoint": model_name, "sd_vae": "Automatic"}, timeout=10)
+            r = self.session.post(
+                f"{self.api_url}/options", json={"sd_model_checkpoint": model_name, "sd_vae": "Automatic"},
+                timeout=self._timeout("options"),
+            )
             r.raise_for_status()
         except requests.exceptions.ReadTimeout:
             # Model loading may outlive the HTTP response window. Poll below.
@@ -80,28 +263,32 @@ class SDClient:
             return False
 
         deadline = time.monotonic() + self.model_timeout
-        while time.monotonic() < deadline:
-            try:
-                time.sleep(3)
-                r = requests.get(f"{self.api_url}/options", timeout=10)
-                r.raise_for_status()
-                opts = r.json()
-                opt_checkpoint = opts.get("sd_model_checkpoint", "")
-                opt_clean = opt_checkpoint.split(" [")[0].strip()
-                if model_clean == opt_clean or model_clean in opt_checkpoint or opt_clean in model_name:
-                    print("\r                                         ", end="\r") 
-                    return True
-            except requests.exceptions.RequestException:
-                pass
+        while True:
+            # The WebUI answers POST /options once the checkpoint is loaded, so look
+            # right away; waiting a poll interval first idled the GPU on every swap.
+            if checkpoint_matches(model_name, self.get_options().get("sd_model_checkpoint", "")):
+                if not EvaText.headless:
+                    print("\r                                         ", end="\r")
+                return True
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll_interval)
         print(f"{EvaText.FAIL}MODEL DEPLOY TIMEOUT: [{model_name}]{EvaText.ENDC}")
         return False
 
     def interrogate(self, image_b64, model="deepdanbooru"):
+        if self.tag_cache is not None:
+            cached = self.tag_cache.get(image_b64, model)
+            if cached is not None:
+                return cached
         payload = {"image": image_b64, "model": model}
         try:
-            r = requests.post(f"{self.api_url}/interrogate", json=payload, timeout=self.request_timeout)
+            r = self.session.post(f"{self.api_url}/interrogate", json=payload, timeout=self._timeout("interrogate"))
             if r.status_code == 200:
-                return r.json().get("caption", "")
+                caption = r.json().get("caption", "")
+                if self.tag_cache is not None:
+                    self.tag_cache.put(image_b64, model, caption)
+                return caption
         except requests.exceptions.RequestException:
             pass
         return ""
@@ -109,49 +296,20 @@ class SDClient:
     def find_controlnet_model(self, keywords):
         if not keywords:
             return None
-        if "[" in keywords and "]" in keywords:
-            return keywords
-        if not self._cn_models_cache:
+        if not self._cn_models_cache and not ("[" in keywords and "]" in keywords):
             try:
-                res = requests.get(f"{self.base_url}/controlnet/model_list", timeout=10)
-                if res.status_code == 200:
-                    self._cn_models_cache = res.json().get("model_list", [])
+                self._cn_models_cache = self.get_controlnet_models()
             except Exception:
                 pass
-        for model in self._cn_models_cache:
-            if keywords.lower() in model.lower():
-                return model
-        return None
+        return self._match_controlnet_model(keywords)
 
     def _build_alwayson_scripts(self, adetailer_args=None, controlnet_name=None, controlnet_img=None, use_dt=False, cn_weight=1.0, cn_end=1.0, alwayson_scripts=None):
-        alwayson_scripts = dict(alwayson_scripts or {})
-        if adetailer_args:
-            alwayson_scripts["ADetailer"] = {"args": adetailer_args}
-
-        if controlnet_name:
-            real_model = self.find_controlnet_model(controlnet_name)
-            if not real_model:
-                raise ValueError(f"ControlNet model not found: {controlnet_name}")
-            if not controlnet_img:
-                raise ValueError("ControlNet image is required")
-            alwayson_scripts["ControlNet"] = {
-                "args": [{
-                    "enabled": True,
-                    "module": CONTROLNET_MODULE,
-                    "model": real_model,
-                    "weight": cn_weight,
-                    "guidance_end": cn_end,
-                    "image": controlnet_img,
-                    "resize_mode": "Crop and Resize",
-                    "pixel_perfect": True,
-                    "control_mode": "Balanced",
-                }]
-            }
-
-        if use_dt:
-            alwayson_scripts["Dynamic Thresholding (CFG Scale Fix)"] = {"args": DT_DEFAULT_ARGS}
-
-        return alwayson_scripts
+        real_model = self.find_controlnet_model(controlnet_name) if controlnet_name else None
+        return self._compose_alwayson_scripts(
+            real_model, adetailer_args=adetailer_args, controlnet_name=controlnet_name,
+            controlnet_img=controlnet_img, use_dt=use_dt, cn_weight=cn_weight, cn_end=cn_end,
+            alwayson_scripts=alwayson_scripts,
+        )
 
     def txt2img(self, prompt, adetailer_args=None, controlnet_name=None, controlnet_img=None, use_dt=False, cn_weight=1.0, cn_end=1.0, **kwargs):
         alwayson_scripts = self._build_alwayson_scripts(
@@ -160,16 +318,15 @@ class SDClient:
             cn_weight=cn_weight, cn_end=cn_end,
             alwayson_scripts=kwargs.pop("alwayson_scripts", {}),
         )
-        payload = {"prompt": prompt, "alwayson_scripts": alwayson_scripts, **kwargs}
-        return self._post_with_retry(f"{self.api_url}/txt2img", payload)
+        payload = self._txt2img_payload(prompt, alwayson_scripts, kwargs)
+        return self._generate("txt2img", payload)
 
     def img2img(self, init_image_b64, prompt, adetailer_args=None, controlnet_name=None, controlnet_img=None, use_dt=False, cn_weight=1.0, cn_end=1.0, **kwargs):
-        alwayson_scripts = dict(kwargs.pop("alwayson_scripts", {}))
         alwayson_scripts = self._build_alwayson_scripts(
             adetailer_args=adetailer_args, controlnet_name=controlnet_name,
             controlnet_img=controlnet_img or init_image_b64, use_dt=use_dt,
             cn_weight=cn_weight, cn_end=cn_end,
-            alwayson_scripts=alwayson_scripts,
+            alwayson_scripts=kwargs.pop("alwayson_scripts", {}),
         )
-        payload = {"init_images": [init_image_b64], "prompt": prompt, "alwayson_scripts": alwayson_scripts, **kwargs}
-        return self._post_with_retry(f"{self.api_url}/img2img", payload)
+        payload = self._img2img_payload(init_image_b64, prompt, alwayson_scripts, kwargs)
+        return self._generate("img2img", payload)
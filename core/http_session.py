@@ -0,0 +1,96 @@
+# core/http_session.py
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from core.settings import HTTP_POOL_SETTINGS
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that counts requests sent and TCP connections actually opened."""
+
+    def __init__(self, *args, **kwargs):
+        self._stats_lock = threading.Lock()
+        self.requests_sent = 0
+        self.connections_opened = 0
+        super().__init__(*args, **kwargs)
+
+    def _count_connection(self):
+        with self._stats_lock:
+            self.connections_opened += 1
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, HTTPConnection, self._count_connection),
+            "https": _counting_pool(HTTPSConnectionPool, HTTPSConnection, self._count_connection),
+        }
+
+    def send(self, request, *args, **kwargs):
+        with self._stats_lock:
+            self.requests_sent += 1
+        return super().send(request, *args, **kwargs)
+
+    def stats(self):
+        with self._stats_lock:
+            sent = self.requests_sent
+            opened = self.connections_opened
+        return {
+            "requests": sent,
+            "connections_opened": opened,
+            "connections_reused": max(0, sent - opened),
+        }
+
+
+def _counting_pool(pool_cls, conn_cls, on_connect):
+    class CountingConnection(conn_cls):
+        def connect(self):
+            on_connect()
+            return super().connect()
+
+    class CountingPool(pool_cls):
+        ConnectionCls = CountingConnection
+
+    return CountingPool
+
+
+def build_session(pool_settings=None):
+    """Create a keep-alive requests.Session backed by a counting connection pool.
+
+    Only connection failures are retried at this layer: nothing has reached the
+    WebUI yet, so it is safe even for txt2img/img2img POSTs. HTTP errors and read
+    timeouts are left to SDClient, which knows whether a retry is safe.
+    """
+    cfg = {**HTTP_POOL_SETTINGS, **(pool_settings or {})}
+    retry = Retry(
+        total=cfg["connect_retries"],
+        connect=cfg["connect_retries"],
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=cfg["backoff_factor"],
+        raise_on_status=False,
+    )
+    adapter = CountingHTTPAdapter(
+        pool_connections=cfg["pool_connections"],
+        pool_maxsize=cfg["pool_maxsize"],
+        max_retries=retry,
+        pool_block=cfg["pool_block"],
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if not cfg["keep_alive"]:
+        session.headers["Connection"] = "close"
+    return session
+
+
+def session_stats(session):
+    adapter = session.get_adapter("http://")
+    if isinstance(adapter, CountingHTTPAdapter):
+        return adapter.stats()
+    return {"requests": 0, "connections_opened": 0, "connections_reused": 0}
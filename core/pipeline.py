@@ -0,0 +1,115 @@
+# core/pipeline.py
+import queue
+import threading
+import time
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.idle_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "idle_seconds": round(self.idle_seconds, 3),
+        }
+
+
+class RefinePipeline:
+    """Bounded in-memory hand-off from a producer (Phase 1) to consumer threads (Phase 2).
+
+    The producer calls submit() for every finished draft and blocks while the
+    queue is full, so at most ``maxsize`` decoded drafts are held in memory.
+    Consumer errors are collected and the first one is re-raised by close(),
+    after the remaining items have been processed.
+    """
+
+    _STOP = object()
+
+    def __init__(self, consume, maxsize=4, workers=1, producer_name="draft", consumer_name="refine"):
+        self.consume = consume
+        self.maxsize = maxsize
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.producer = StageStats(producer_name)
+        self.consumer = StageStats(consumer_name)
+        self.errors = []
+        self.max_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers)]
+        self._started_at = None
+        self._closed = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(raise_errors=exc_type is None)
+
+    def start(self):
+        self._started_at = time.monotonic()
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _sample_depth(self):
+        depth = self.queue.qsize()
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_total += depth
+            self._depth_samples += 1
+
+    def submit(self, item):
+        t0 = time.monotonic()
+        self.queue.put(item)
+        waited = time.monotonic() - t0
+        with self._lock:
+            self.producer.idle_seconds += waited
+            self.producer.items += 1
+        self._sample_depth()
+
+    def _run(self):
+        while True:
+            t0 = time.monotonic()
+            item = self.queue.get()
+            t1 = time.monotonic()
+            if item is self._STOP:
+                return
+            self._sample_depth()
+            try:
+                self.consume(item)
+            except Exception as e:
+                with self._lock:
+                    self.errors.append(e)
+            with self._lock:
+                self.consumer.idle_seconds += t1 - t0
+                self.consumer.busy_seconds += time.monotonic() - t1
+                self.consumer.items += 1
+
+    def close(self, raise_errors=True):
+        if not self._closed:
+            self._closed = True
+            # The producer is done once it closes; draining time belongs to the consumers.
+            elapsed = time.monotonic() - self._started_at
+            self.producer.busy_seconds = max(0.0, elapsed - self.producer.idle_seconds)
+            for _ in self._threads:
+                self.queue.put(self._STOP)
+            for thread in self._threads:
+                thread.join()
+        if raise_errors and self.errors:
+            raise self.errors[0]
+        return self.stats()
+
+    def stats(self):
+        with self._lock:
+            avg_depth = self._depth_total / self._depth_samples if self._depth_samples else 0.0
+            return {
+                self.producer.name: self.producer.as_dict(),
+                self.consumer.name: self.consumer.as_dict(),
+                "queue": {"maxsize": self.maxsize, "max_depth": self.max_depth, "avg_depth": round(avg_depth, 2)},
+            }
@@ -0,0 +1,114 @@
+# core/remix_pipeline.py
+import base64
+import time
+from pathlib import Path
+
+from core.pipeline import RefinePipeline
+
+
+class RemixInput:
+    """One file of inputs/, read and base64-encoded by the prefetch stage."""
+
+    def __init__(self, path, width, height, image_b64=None):
+        self.path = Path(path)
+        self.width = width
+        self.height = height
+        self.image_b64 = image_b64
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def __repr__(self):
+        return f"RemixInput({self.path.name!r}, {self.width}x{self.height})"
+
+
+def order_by_size(paths):
+    """Group inputs by image size, groups in order of first appearance.
+
+    Only the image header is read here. Consecutive requests then share a
+    resolution, so a backend does not reallocate between every image.
+    Returns (RemixInputs not yet loaded, [(path, error)] for unreadable files).
+    """
+    from PIL import Image  # Only remix runs need Pillow; story runs start without it.
+
+    groups = {}
+    unreadable = []
+    for path in paths:
+        try:
+            with Image.open(path) as img:
+                size = img.size
+        except OSError as e:
+            unreadable.append((path, e))
+            continue
+        groups.setdefault(size, []).append(RemixInput(path, *size))
+    return [item for members in groups.values() for item in members], unreadable
+
+
+def load_input(item):
+    """Read the file once and attach its base64 payload."""
+    item.image_b64 = base64.b64encode(item.path.read_bytes()).decode()
+    return item
+
+
+def run_remix_pipeline(items, render, save, prefetch=4, gpu_workers=1, save_workers=2, on_done=None):
+    """Read, render and save remix inputs as three overlapping stages.
+
+    The calling thread reads and encodes inputs and keeps at most
+    ``prefetch`` of them queued for the GPU stage; ``gpu_workers`` threads
+    call render(item) (one per WebUI keeps every backend busy) and hand the
+    response to ``save_workers`` threads calling save(item, response). A
+    failing item is reported through on_done(item, error) and does not stop
+    the others; on_done(item, None) follows a successful save.
+
+    Returns per-stage timings: {"read": ..., "gpu": ..., "save": ..., "queues": ...}.
+    """
+    def finish(item, error=None):
+        if on_done:
+            on_done(item, error)
+
+    def save_item(job):
+        item, response = job
+        try:
+            save(item, response)
+        except Exception as e:
+            finish(item, e)
+        else:
+            finish(item)
+        finally:
+            # The payload is only needed until the result is on disk.
+            item.image_b64 = None
+
+    def render_item(item):
+        try:
+            response = render(item)
+        except Exception as e:
+            item.image_b64 = None
+            finish(item, e)
+            return
+        save_pipe.submit((item, response))
+
+    started_at = time.monotonic()
+    save_pipe = RefinePipeline(save_item, maxsize=max(1, save_workers) * 2, workers=max(1, save_workers),
+                               producer_name="gpu", consumer_name="save").start()
+    gpu_pipe = RefinePipeline(render_item, maxsize=max(1, prefetch), workers=max(1, gpu_workers),
+                              producer_name="read", consumer_name="gpu").start()
+    try:
+        for item in items:
+            try:
+                load_input(item)
+            except OSError as e:
+                finish(item, e)
+                continue
+            gpu_pipe.submit(item)
+    finally:
+        gpu_stats = gpu_pipe.close(raise_errors=False)
+        save_stats = save_pipe.close(raise_errors=False)
+
+    return {
+        "read": gpu_stats["read"],
+        "gpu": gpu_stats["gpu"],
+        "save": save_stats["save"],
+        "queues": {"prefetch": gpu_stats["queue"], "save": save_stats["queue"]},
+        "elapsed_seconds": round(time.monotonic() - started_at, 3),
+    }
@@ -0,0 +1,216 @@
+# core/render_cache.py
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from core.settings import RENDER_CACHE_SETTINGS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    info TEXT,
+    parameters TEXT,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entry_blobs (
+    key TEXT NOT NULL REFERENCES entries(key) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    hash TEXT NOT NULL REFERENCES blobs(hash),
+    PRIMARY KEY (key, position)
+);
+CREATE INDEX IF NOT EXISTS entry_blobs_hash ON entry_blobs(hash);
+"""
+
+
+def is_cacheable(payload):
+    """Only fixed-seed requests render the same image twice; seed -1 (random) bypasses the cache."""
+    seed = payload.get("seed", -1)
+    if isinstance(seed, bool) or not isinstance(seed, int) or seed < 0:
+        return False
+    if payload.get("subseed_strength", 0) and payload.get("subseed", -1) == -1:
+        return False
+    return True
+
+
+def _canonical(value):
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    # 5 and 5.0 render the same image; bools stay bools.
+    if isinstance(value, float) and not isinstance(value, bool) and value.is_integer():
+        return int(value)
+    return value
+
+
+def render_key(endpoint, payload, checkpoint, vae):
+    """Content address of a render: endpoint, full payload (init/ControlNet images included) and loaded weights."""
+    canonical = json.dumps(
+        _canonical({"endpoint": endpoint, "payload": payload, "checkpoint": checkpoint, "vae": vae}),
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def build_render_cache(settings=None, root=None):
+    """RenderCache from RENDER_CACHE_SETTINGS, or None when the cache is disabled."""
+    cfg = {**RENDER_CACHE_SETTINGS, **(settings or {})}
+    if not cfg["enabled"]:
+        return None
+    return RenderCache(root or cfg["dir"], max_bytes=int(cfg["max_gb"] * 1024 ** 3))
+
+
+class RenderCache:
+    """On-disk cache of WebUI responses for fixed-seed requests.
+
+    PNGs are stored once under blobs/ by the sha256 of their bytes; a SQLite
+    index maps each render key to its images, info and last use. When the
+    blobs exceed ``max_bytes`` the least recently used renders are evicted
+    and PNGs no other render refers to are deleted.
+    """
+
+    def __init__(self, root, max_bytes=2 * 1024 ** 3):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.root / "index.sqlite3"), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _blob_path(self, digest):
+        return self.blob_dir / digest[:2] / f"{digest}.png"
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def get(self, key):
+        """Cached response for key (images as base64, like the WebUI), or None on a miss."""
+        with self._lock:
+            row = self.conn.execute("SELECT info, parameters FROM entries WHERE key = ?", (key,)).fetchone()
+            hashes = [h for (h,) in self.conn.execute(
+                "SELECT hash FROM entry_blobs WHERE key = ? ORDER BY position", (key,)
+            )]
+        images = []
+        if row is not None:
+            try:
+                images = [base64.b64encode(self._blob_path(h).read_bytes()).decode("ascii") for h in hashes]
+            except OSError:
+                # A PNG was removed behind our back; forget the render and regenerate it.
+                self._delete_entries([key])
+                row = None
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._transaction():
+            self.conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        info, parameters = row
+        return {"images": images, "parameters": json.loads(parameters) if parameters else {}, "info": info}
+
+    def put(self, key, response):
+        images = response.get("images") or []
+        if not images:
+            return
+        blobs = []
+        for b64_img in images:
+            data = base64.b64decode(b64_img)
+            digest = hashlib.sha256(data).hexdigest()
+            path = self._blob_path(digest)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+            blobs.append((digest, len(data)))
+
+        now = time.time()
+        with self._transaction():
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.conn.execute(
+                "INSERT INTO entries (key, info, parameters, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, response.get("info"), json.dumps(response.get("parameters") or {}, ensure_ascii=False), now, now),
+            )
+            self.conn.executemany("INSERT OR IGNORE INTO blobs (hash, size) VALUES (?, ?)", blobs)
+            self.conn.executemany(
+                "INSERT INTO entry_blobs (key, position, hash) VALUES (?, ?, ?)",
+                [(key, position, digest) for position, (digest, _) in enumerate(blobs)],
+            )
+        self.evict()
+
+    def total_bytes(self):
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used renders until the blobs fit in max_bytes."""
+        while self.total_bytes() > self.max_bytes:
+            with self._lock:
+                row = self.conn.execute("SELECT key FROM entries ORDER BY last_used, rowid LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._delete_entries([row[0]])
+            with self._lock:
+                self.evictions += 1
+
+    def _delete_entries(self, keys):
+        with self._transaction():
+            self.conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in keys])
+            orphans = [h for (h,) in self.conn.execute(
+                "SELECT hash FROM blobs WHERE hash NOT IN (SELECT hash FROM entry_blobs)"
+            )]
+            self.conn.executemany("DELETE FROM blobs WHERE hash = ?", [(h,) for h in orphans])
+        for digest in orphans:
+            self._blob_path(digest).unlink(missing_ok=True)
+
+    def stats(self):
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+            }
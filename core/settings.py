@@ -12,6 +12,78 @@ INPUT_DIR = BASE_DIR / "inputs"
 # WebUI 的 API 位址，若在雲端或區網請修改此處 IP
 WEBUI_API_URL = "http://127.0.0.1:7860"
 
+# 多台 GPU 主機時在此列出所有 WebUI 位址，工作會分派給「已載入所需模型且最閒」的那台
+# 也可用環境變數 PROJECT_ERO_WEBUI_URLS (逗號分隔) 覆寫
+WEBUI_API_URLS = [WEBUI_API_URL]
+
+# ==========================================
+# 🔌 [HTTP 連線池設定]
+# ==========================================
+# SDClient 內建 keep-alive 連線池，避免每次呼叫 WebUI 都重新建立 TCP 連線
+HTTP_POOL_SETTINGS = {
+    "pool_connections": 4,   # 快取幾個主機的連線池 (每台 WebUI 一個)
+    "pool_maxsize": 8,       # 每台主機保留的最大連線數
+    "pool_block": False,     # 連線用盡時是否等待 (False = 臨時多開一條)
+    "keep_alive": True,
+    "connect_retries": 1,    # 僅重試「連線失敗」；HTTP 500 由 SDClient.max_retries 處理
+    "backoff_factor": 0.5,
+}
+
+# 各 API 端點的逾時秒數；None = 不設限 (生成可能跑很久)
+HTTP_TIMEOUTS = {
+    "progress": 3,
+    "options": 10,
+    "options_vae": 5,
+    "sd_models": 10,
+    "controlnet_models": 10,
+    "interrupt": 5,
+    "memory": 5,
+    "interrogate": None,
+    "generate": None,
+}
+
+# ==========================================
+# 🗃️ [算圖快取]
+# ==========================================
+# 固定 seed (seed != -1) 且參數、模型、VAE 完全相同的請求，直接取回上次的 PNG，不再送 WebUI 重算
+# seed = -1 (隨機) 的請求一律不經快取
+RENDER_CACHE_SETTINGS = {
+    "enabled": True,
+    "dir": OUTPUT_DIR / "render_cache",
+    "max_gb": 2.0,   # 超過時刪除最久未使用的結果
+}
+
+# Remix 反推 Tag 快取：同一張圖 (依內容 hash) + 同一個反推模型只跑一次
+# 可先用 python tools/pretag_inputs.py 把 inputs/ 全部預先反推
+TAG_CACHE_SETTINGS = {
+    "enabled": True,
+    "file": OUTPUT_DIR / "tag_cache.sqlite3",
+}
+
+# ==========================================
+# 📈 [自動 Batch Size]
+# ==========================================
+# 依「模型 + 解析度 + 擴充 (ControlNet/ADetailer)」分別量測每張圖秒數：
+# 吞吐量有提升就加大 batch，遇到 OOM / HTTP 500 就退回，學到的結果存檔供下次沿用
+BATCH_TUNER_SETTINGS = {
+    "file": OUTPUT_DIR / "batch_tuning.json",
+    "max_batch": 8,        # 探索上限
+    "min_gain": 0.05,      # 每張圖至少快 5% 才算有提升，避免被量測雜訊帶著跑
+    "vram_headroom": 0.92, # 生成中取樣到的 VRAM 使用率超過此值，就不再往上加 batch
+}
+
+# ==========================================
+# 🌡️ [GPU 遙測]
+# ==========================================
+# VRAM 資訊優先向 WebUI 的 /sdapi/v1/memory 查詢 (算圖主機通常不是跑 main.py 的這台)
+# probe: 自訂查詢指令，輸出需同 nvidia-smi --query-gpu=memory.total,memory.used,name --format=csv,noheader,nounits
+#        例: ["ssh", "gpu-box", "nvidia-smi", "--query-gpu=memory.total,memory.used,name", "--format=csv,noheader,nounits"]
+GPU_TELEMETRY_SETTINGS = {
+    "probe": None,
+    "local_fallback": True,   # 都查不到時才用本機 nvidia-smi
+    "sample_interval": 0.5,   # 生成期間的 VRAM 取樣間隔 (秒)
+}
+
 # ==========================================
 # 🎨 [預設生成參數] (當 JSON 未指定時使用)
 # ==========================================
@@ -0,0 +1,202 @@
+# core/story_batch.py
+import json
+import threading
+from pathlib import Path
+
+from core.batch_tuner import tuning_key
+from core.settings import AD_PRESETS, CN_CONFIG_STORY, DEFAULT_GEN_SETTINGS, PROMPT_PRESETS
+from core.story_plan import StoryManifest, StoryPlan
+from core.story_scheduler import WorkItem, pack_batches
+
+
+def format_lora(items):
+    res = ""
+    for x in items:
+        if not x:
+            continue
+        if "lora:" not in x and not x.startswith("<"):
+            res += f" <lora:{x}:1>"
+        elif x.startswith("<"):
+            res += f" {x}"
+        else:
+            res += f" <{x}>"
+    return res
+
+
+def find_story_files(paths):
+    """Story files named on the command line; a directory adds its *.json files in name order.
+
+    Raises FileNotFoundError for a path that does not exist. A file named
+    twice is only run once.
+    """
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(path.glob("*.json")))
+        elif path.is_file():
+            files.append(path)
+        else:
+            raise FileNotFoundError(f"Story file not found: {path}")
+    return list(dict.fromkeys(path.resolve() for path in files))
+
+
+def group_by_model(jobs, attr):
+    """[(model, [jobs])] for attr ("draft_model" or "final_model"), models in order of first appearance."""
+    groups = {}
+    for job in jobs:
+        groups.setdefault(getattr(job, attr), []).append(job)
+    return list(groups.items())
+
+
+class StoryJob:
+    """One story of a run: its settings, prompts, output folders and render plan.
+
+    A batch run builds one per story file and renders the drafts of every
+    story before any final, so each model is loaded once per phase.
+    """
+
+    def __init__(self, story, output_dir, source=None):
+        self.story = story
+        self.source = Path(source) if source else None
+        self.name = story.get("project_name", "Untitled_Project")
+        self.gen_opts = {**DEFAULT_GEN_SETTINGS, **story.get("generation_settings", {})}
+        self.models = story.get("models", {})
+        self.draft_model = self.models.get("draft_model")
+        self.final_model = self.models.get("final_model")
+        self.refine_mode = story.get("story_refine_mode", "controlnet_txt2img")
+        # "twopass": all drafts, then all finals (single GPU). "pipelined": refine each draft as it lands.
+        self.pipeline_mode = story.get("story_pipeline_mode", "twopass")
+        seed_strategy = story.get("seed_strategy", {})
+        self.global_num = seed_strategy.get("global_num_images", 2)
+        self.base_seed = seed_strategy.get("base_seed", -1)
+        self.header = story.get("character_header", "")
+        self.draft_loras = format_lora(story.get("draft_loras", []))
+        self.final_loras = format_lora(story.get("final_loras", []))
+        self.draft_negative = story.get('draft_negative', PROMPT_PRESETS['draft']['negative'])
+        self.final_negative = story.get('final_negative', PROMPT_PRESETS['final']['negative'])
+        ad_keys = story.get("ad_modes", story.get("active_adetailers", ["face"]))
+        self.ad_args = [AD_PRESETS[k] for k in ad_keys if k in AD_PRESETS]
+        self.scenes = story.get("scenes", [])
+        self.project_root = Path(output_dir) / self.name
+        self.draft_root = self.project_root / "draft"
+        self.example_root = self.project_root / "example"
+        self.draft_key = tuning_key(self.draft_model or "", self.gen_opts["draft_width"], self.gen_opts["draft_height"])
+        self.plan = None
+        self.orphans = []
+        self.saved = {"draft": 0, "example": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, output_dir):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), output_dir, source=path)
+
+    def missing_models(self):
+        return [key for key in ("draft_model", "final_model") if not self.models.get(key)]
+
+    def draft_prompt(self, scene):
+        prefix = self.story.get('draft_prefix', PROMPT_PRESETS['draft']['prefix'])
+        return f"{prefix} {self.header} {self.draft_loras}, {scene['prompt']}"
+
+    def final_prompt(self, scene):
+        prefix = self.story.get('final_prefix', PROMPT_PRESETS['final']['prefix'])
+        return f"{prefix} {self.header} {self.final_loras}, {scene['prompt']}"
+
+    def image_seed(self, s_idx, i):
+        return self.base_seed + (s_idx * 10000) + i if self.base_seed != -1 else -1
+
+    def draft_path(self, scene, i):
+        return self.draft_root / f"{scene['scene_id']}_{i+1:03}.png"
+
+    def final_path(self, scene, i):
+        return self.example_root / f"{scene['scene_id']}_{i+1:03}.png"
+
+    def images(self):
+        """(scene index, scene, image index) of every image of the story, in order."""
+        for s_idx, scene in enumerate(self.scenes):
+            for i in range(scene.get("num_images", self.global_num)):
+                yield s_idx, scene, i
+
+    def build_plan(self):
+        """Hash the inputs of every output and decide what to reuse; before any GPU work."""
+        self.draft_root.mkdir(parents=True, exist_ok=True)
+        self.example_root.mkdir(parents=True, exist_ok=True)
+        gen_opts = self.gen_opts
+        plan = StoryPlan(StoryManifest(self.project_root))
+        for s_idx, scene, i in self.images():
+            draft_digest = plan.add(self.draft_path(scene, i), {
+                "model": self.draft_model, "prompt": self.draft_prompt(scene), "seed": self.image_seed(s_idx, i),
+                "negative": self.draft_negative,
+                "width": gen_opts["draft_width"], "height": gen_opts["draft_height"],
+                "steps": gen_opts["draft_steps"], "cfg": gen_opts["draft_cfg"], "sampler": gen_opts["draft_sampler"],
+            })
+            plan.add(self.final_path(scene, i), {
+                "model": self.final_model, "prompt": self.final_prompt(scene), "seed": self.image_seed(s_idx, i),
+                "negative": self.final_negative,
+                "width": gen_opts["final_width"], "height": gen_opts["final_height"],
+                "steps": gen_opts["steps"], "cfg": gen_opts["final_cfg"], "sampler": gen_opts["sampler"],
+                "refine_mode": self.refine_mode, "use_dt": self.story.get("use_dt", True),
+                "denoise": gen_opts["final_denoise"] if self.refine_mode == "img2img" else None,
+                "adetailer": self.ad_args, "controlnet": self.models.get("controlnet_openpose", None),
+                "cn_config": CN_CONFIG_STORY, "draft": draft_digest,
+            }, depends_on=self.draft_path(scene, i))
+        self.plan = plan
+        self.orphans = plan.find_orphans()
+        return plan
+
+    def todo(self, folder):
+        counts = self.plan.counts(folder)
+        return counts["new"] + counts["changed"]
+
+    @property
+    def drafts_todo(self):
+        return self.todo("draft")
+
+    @property
+    def finals_todo(self):
+        return self.todo("example")
+
+    def plan_lines(self):
+        lines = []
+        for label, folder in (("DRAFTS", "draft"), ("FINALS", "example")):
+            c = self.plan.counts(folder)
+            lines.append(
+                f"{label} : {c['reused'] + c['adopted']} reused / {c['new'] + c['changed']} regenerated "
+                f"({c['changed']} changed)"
+            )
+        lines.append(f"ORPHANS: {len(self.orphans)} (listed in manifest.json, not deleted)")
+        return lines
+
+    def draft_items(self, max_batch):
+        """Drafts to render, same-prompt images packed into WorkItems of up to max_batch."""
+        return pack_batches("draft", [
+            (self.draft_prompt(scene), s_idx, i, self.image_seed(s_idx, i))
+            for s_idx, scene, i in self.images()
+            if self.plan.needs_render(self.draft_path(scene, i))
+        ], max_batch)
+
+    def reused_draft_items(self):
+        """Drafts kept from an earlier run; the pipelined mode refines them from disk."""
+        return [
+            WorkItem("reuse", None, [(s_idx, i)], self.image_seed(s_idx, i))
+            for s_idx, scene, i in self.images()
+            if self.plan.is_current(self.draft_path(scene, i))
+        ]
+
+    def final_items(self):
+        # Each final is guided by its own draft, so finals never share a batch.
+        return [
+            WorkItem("final", None, [(s_idx, i)], self.image_seed(s_idx, i))
+            for s_idx, scene, i in self.images()
+            if self.plan.needs_render(self.final_path(scene, i))
+        ]
+
+    def record(self, path):
+        """Note a freshly saved output in the manifest and the story's counts."""
+        self.plan.record(path)
+        with self._lock:
+            self.saved[Path(path).parent.name] += 1
+
+    def summary_line(self):
+        return (f"{self.name[:24]:<24}: {self.saved['draft']}/{self.drafts_todo} drafts | "
+                f"{self.saved['example']}/{self.finals_todo} finals")
@@ -0,0 +1,133 @@
+# core/story_plan.py
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+MANIFEST_NAME = "manifest.json"
+OUTPUT_DIRS = ("draft", "example")
+
+NEW = "new"
+CHANGED = "changed"
+REUSED = "reused"
+ADOPTED = "adopted"
+
+
+def input_hash(inputs):
+    """Stable hash of the effective inputs of one output image."""
+    canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class StoryManifest:
+    """JSON record of the input hash each story output was rendered from.
+
+    Lives at ``<project>/manifest.json`` and maps paths relative to the project
+    folder (``draft/Scene_001.png``) to the hash of their inputs. Every record
+    is written through to disk, so an interrupted run keeps what it finished.
+    """
+
+    def __init__(self, project_root):
+        self.root = Path(project_root)
+        self.path = self.root / MANIFEST_NAME
+        self._lock = threading.Lock()
+        self.outputs = {}
+        self.orphans = []
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            self.outputs = data.get("outputs", {})
+            self.orphans = data.get("orphans", [])
+
+    def key(self, path):
+        return Path(path).relative_to(self.root).as_posix()
+
+    def get(self, path):
+        return self.outputs.get(self.key(path))
+
+    def record(self, path, digest):
+        with self._lock:
+            self.outputs[self.key(path)] = digest
+            self._write()
+
+    def mark_orphans(self, paths):
+        with self._lock:
+            self.orphans = sorted(self.key(p) for p in paths)
+            for key in self.orphans:
+                self.outputs.pop(key, None)
+            self._write()
+
+    def _write(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        tmp_path.write_text(
+            json.dumps({"outputs": self.outputs, "orphans": self.orphans}, indent=2, sort_keys=True, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, self.path)
+
+
+class StoryPlan:
+    """Decides which story outputs can be reused and which must be rendered again.
+
+    An output is reused when its file exists and the manifest holds the same
+    input hash. Files from before the manifest existed are adopted as they are.
+    An output whose dependency (a final's draft) is rendered again is rendered
+    again too.
+    """
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.entries = {}
+
+    def add(self, path, inputs, depends_on=None):
+        path = Path(path)
+        digest = input_hash(inputs)
+        recorded = self.manifest.get(path)
+        if not path.exists():
+            action = NEW
+        elif depends_on is not None and self.needs_render(depends_on):
+            action = CHANGED
+        elif recorded is None:
+            action = ADOPTED
+        elif recorded == digest:
+            action = REUSED
+        else:
+            action = CHANGED
+        self.entries[path] = (digest, action)
+        if action == ADOPTED:
+            self.manifest.record(path, digest)
+        return digest
+
+    def digest(self, path):
+        return self.entries[Path(path)][0]
+
+    def needs_render(self, path):
+        return self.entries[Path(path)][1] in (NEW, CHANGED)
+
+    def is_current(self, path):
+        return not self.needs_render(path)
+
+    def record(self, path):
+        """Mark a freshly saved output as rendered from its planned inputs."""
+        self.manifest.record(path, self.digest(path))
+
+    def find_orphans(self):
+        """PNG outputs on disk that no scene produces any more; recorded in the manifest."""
+        planned = set(self.entries)
+        orphans = sorted(
+            path for folder in OUTPUT_DIRS for path in (self.manifest.root / folder).glob("*.png")
+            if path not in planned
+        )
+        self.manifest.mark_orphans(orphans)
+        return orphans
+
+    def counts(self, folder):
+        counts = {NEW: 0, CHANGED: 0, REUSED: 0, ADOPTED: 0}
+        for path, (_, action) in self.entries.items():
+            if path.parent.name == folder:
+                counts[action] += 1
+        return counts
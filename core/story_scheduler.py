@@ -0,0 +1,103 @@
+# core/story_scheduler.py
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from core.utils import progress_bar
+
+BAR_FORMAT = "{desc:8}: {percentage:3.0f}%|{bar:50}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}{postfix}]"
+
+
+class WorkItem:
+    """One WebUI request of a story run.
+
+    ``images`` lists the (scene index, image index) pairs it renders, in
+    batch order; ``seed`` is the seed of the first one (-1 = random).
+    """
+
+    def __init__(self, phase, key, images, seed):
+        self.phase = phase
+        self.key = key
+        self.images = images
+        self.seed = seed
+
+    @property
+    def size(self):
+        return len(self.images)
+
+    def __repr__(self):
+        return f"WorkItem({self.phase!r}, images={self.images!r}, seed={self.seed})"
+
+
+def pack_batches(phase, candidates, max_batch):
+    """Pack (key, scene index, image index, seed) candidates into as few requests as possible.
+
+    Candidates with the same key (the same prompt and settings) share a batch,
+    even across scenes. The WebUI gives image k of a batch seed+k, so a batch
+    with a fixed seed only takes consecutive seeds; random seeds pack freely.
+    Items come out in the order their key first appears.
+    """
+    groups = {}
+    for key, s_idx, i, seed in candidates:
+        groups.setdefault(key, []).append((s_idx, i, seed))
+
+    items = []
+    for key, members in groups.items():
+        batch = []
+        for s_idx, i, seed in members:
+            if batch:
+                last_seed = batch[-1][2]
+                if seed == -1 or last_seed == -1:
+                    seeds_fit = seed == last_seed
+                else:
+                    seeds_fit = seed == last_seed + 1
+                fits = len(batch) < max_batch and seeds_fit
+                if not fits:
+                    items.append(WorkItem(phase, key, [(s, n) for s, n, _ in batch], batch[0][2]))
+                    batch = []
+            batch.append((s_idx, i, seed))
+        if batch:
+            items.append(WorkItem(phase, key, [(s, n) for s, n, _ in batch], batch[0][2]))
+    return items
+
+
+def run_work_items(items, run_item, concurrency=1):
+    """Run run_item(item) for every item on up to ``concurrency`` threads.
+
+    Items start in list order. The first failure stops items that have not
+    started yet and is re-raised once the running ones finish.
+    """
+    if not items:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="scene") as executor:
+        futures = [executor.submit(run_item, item) for item in items]
+        _, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+    for future in futures:
+        if not future.cancelled() and future.exception() is not None:
+            raise future.exception()
+
+
+class ThroughputBar:
+    """Progress bar across all scenes of a phase that shows images per minute."""
+
+    def __init__(self, total, desc):
+        self.bar = progress_bar(total, desc, BAR_FORMAT)
+        self._started_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.bar.set_postfix_str("-- img/min", refresh=False)
+
+    def update(self, n=1):
+        with self._lock:
+            elapsed = time.monotonic() - self._started_at
+            rate = (self.bar.n + n) * 60 / elapsed if elapsed > 0 else 0.0
+            self.bar.set_postfix_str(f"{rate:.1f} img/min", refresh=False)
+            self.bar.update(n)
+
+    def images_per_minute(self):
+        elapsed = time.monotonic() - self._started_at
+        return self.bar.n * 60 / elapsed if elapsed > 0 else 0.0
+
+    def close(self):
+        self.bar.close()
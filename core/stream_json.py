@@ -0,0 +1,105 @@
+# core/stream_json.py
+import json
+
+WHITESPACE = b" \t\r\n"
+
+
+class ImageResponseDecoder:
+    """Incremental decoder for WebUI generation responses.
+
+    ``r.json()`` keeps the raw body, its decoded text and the parsed strings in
+    memory at the same time, which is three copies of every base64 image. This
+    decoder is fed the body in pieces and cuts the strings of the top-level
+    ``"images"`` array out as they complete, so only one copy of each image is
+    kept. Everything else is small and parsed with json at the end.
+    """
+
+    def __init__(self):
+        self.images = []
+        self._rest = bytearray()
+        self._depth = 0
+        self._string = None
+        self._escape = False
+        self._expect_key = False
+        self._last_key = None
+        self._images_depth = None
+        self._saw_images = False
+
+    def feed(self, data):
+        i, n = 0, len(data)
+        while i < n:
+            if self._string is not None:
+                i = self._read_string(data, i)
+                continue
+            c = data[i:i + 1]
+            i += 1
+            if c in WHITESPACE:
+                continue
+            if c == b'"':
+                self._string = bytearray()
+                continue
+            in_images = self._images_depth is not None and self._depth == self._images_depth
+            if c in b"{[":
+                if c == b"[" and self._depth == 1 and self._last_key == b"images":
+                    self._images_depth = 2
+                    self._saw_images = True
+                self._depth += 1
+                self._expect_key = c == b"{" and self._depth == 1
+            elif c in b"}]":
+                if in_images:
+                    self._images_depth = None
+                self._depth -= 1
+            elif c == b",":
+                self._expect_key = self._depth == 1
+                if in_images:
+                    continue
+            self._rest += c
+
+    def _read_string(self, data, i):
+        n = len(data)
+        while i < n:
+            if self._escape:
+                self._string += data[i:i + 1]
+                self._escape = False
+                i += 1
+                continue
+            quote = data.find(b'"', i)
+            backslash = data.find(b"\\", i, n if quote == -1 else quote)
+            if backslash != -1:
+                self._string += data[i:backslash + 1]
+                self._escape = True
+                i = backslash + 1
+            elif quote == -1:
+                self._string += data[i:]
+                return n
+            else:
+                self._string += data[i:quote]
+                self._end_string()
+                return quote + 1
+        return i
+
+    def _end_string(self):
+        raw, self._string = self._string, None
+        if self._images_depth is not None and self._depth == self._images_depth:
+            self.images.append(raw.decode("ascii") if b"\\" not in raw else json.loads(b'"' + raw + b'"'))
+            return
+        if self._depth == 1 and self._expect_key:
+            self._last_key = bytes(raw)
+            self._expect_key = False
+        self._rest += b'"' + raw + b'"'
+
+    def result(self):
+        if self._string is not None or self._depth:
+            raise ValueError("Truncated JSON response")
+        data = json.loads(self._rest)
+        if self._saw_images:
+            data["images"] = self.images
+        return data
+
+
+def decode_image_response(chunks):
+    """Decode a JSON body given as an iterable of byte chunks (e.g. ``r.iter_content()``)."""
+    decoder = ImageResponseDecoder()
+    for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.result()
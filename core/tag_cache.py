@@ -0,0 +1,87 @@
+# core/tag_cache.py
+import base64
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from core.settings import TAG_CACHE_SETTINGS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tags (
+    image_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    caption TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (image_hash, model)
+);
+"""
+
+
+def image_hash(image_b64):
+    """sha256 of the decoded image bytes, so the same file hashes the same however it was encoded."""
+    return hashlib.sha256(base64.b64decode(image_b64)).hexdigest()
+
+
+def build_tag_cache(settings=None, path=None):
+    """TagCache from TAG_CACHE_SETTINGS, or None when the cache is disabled."""
+    cfg = {**TAG_CACHE_SETTINGS, **(settings or {})}
+    if not cfg["enabled"]:
+        return None
+    return TagCache(path or cfg["file"])
+
+
+class TagCache:
+    """SQLite cache of interrogation captions keyed by image content and interrogator model.
+
+    Tags of an image never change for a given interrogator, so entries do not
+    expire. Empty captions (a failed interrogation) are never stored.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def get(self, image_b64, model):
+        key = image_hash(image_b64)
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT caption FROM tags WHERE image_hash = ? AND model = ?", (key, model)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def contains(self, image_b64, model):
+        """Like get() but without touching the hit/miss counters."""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT 1 FROM tags WHERE image_hash = ? AND model = ?", (image_hash(image_b64), model)
+            ).fetchone() is not None
+
+    def put(self, image_b64, model, caption):
+        if not caption:
+            return
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO tags (image_hash, model, caption, created_at) VALUES (?, ?, ?, ?)",
+                (image_hash(image_b64), model, caption, time.time()),
+            )
+
+    def stats(self):
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM tags").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
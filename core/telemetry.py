@@ -0,0 +1,159 @@
+# core/telemetry.py
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+from core.settings import GPU_TELEMETRY_SETTINGS
+
+GIB = 1024 ** 3
+MIB = 1024 ** 2
+NVIDIA_SMI_QUERY = ["nvidia-smi", "--query-gpu=memory.total,memory.used,name", "--format=csv,noheader,nounits"]
+
+
+def gpu_reading(source, name, total_bytes, used_bytes, peak_bytes=None):
+    return {
+        "source": source,
+        "name": name,
+        "total_gb": round(total_bytes / GIB, 2),
+        "used_gb": round(used_bytes / GIB, 2),
+        "peak_gb": round(peak_bytes / GIB, 2) if peak_bytes is not None else None,
+        "used_fraction": used_bytes / total_bytes,
+    }
+
+
+class WebUIMemoryTelemetry:
+    """VRAM of the render host, read from the WebUI's /sdapi/v1/memory."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def sample(self):
+        cuda = self.client.get_memory().get("cuda") or {}
+        system = cuda.get("system") or {}
+        if not system.get("total"):
+            # No CUDA on the render host, or an old WebUI without the endpoint.
+            return None
+        peak = (cuda.get("active") or {}).get("peak")
+        host = self.client.base_url.split("://", 1)[-1]
+        return gpu_reading("webui", f"CUDA @ {host}", system["total"], system["used"], peak)
+
+
+class CommandTelemetry:
+    """VRAM from a command printing nvidia-smi CSV: memory.total,memory.used,name (MiB)."""
+
+    def __init__(self, command, source="probe"):
+        self.command = command
+        self.source = source
+
+    def sample(self):
+        try:
+            if sys.platform == "win32":
+                si = subprocess.STARTUPINFO()
+                si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+                output = subprocess.check_output(self.command, encoding="utf-8", startupinfo=si, timeout=10)
+            else:
+                output = subprocess.check_output(self.command, encoding="utf-8", timeout=10)
+            total, used, name = [part.strip() for part in output.strip().splitlines()[0].split(",", 2)]
+            return gpu_reading(self.source, name, float(total) * MIB, float(used) * MIB)
+        except (OSError, subprocess.SubprocessError, ValueError, IndexError):
+            return None
+
+
+class StubTelemetry:
+    """Fixed readings for tests and GPU-less machines; set used_gb to move the needle."""
+
+    def __init__(self, total_gb=24.0, used_gb=0.0, name="Stub GPU"):
+        self.total_gb = total_gb
+        self.used_gb = used_gb
+        self.name = name
+
+    def sample(self):
+        return gpu_reading("stub", self.name, self.total_gb * GIB, self.used_gb * GIB)
+
+
+class FallbackTelemetry:
+    """Asks each source in order and returns the first reading."""
+
+    def __init__(self, sources):
+        self.sources = list(sources)
+
+    def sample(self):
+        for source in self.sources:
+            reading = source.sample()
+            if reading is not None:
+                return reading
+        return None
+
+
+def build_telemetry(client=None, settings=None):
+    """Configured probe, then the WebUI memory endpoint, then local nvidia-smi."""
+    cfg = {**GPU_TELEMETRY_SETTINGS, **(settings or {})}
+    sources = []
+    if cfg["probe"]:
+        sources.append(CommandTelemetry(cfg["probe"]))
+    if client is not None:
+        sources.append(WebUIMemoryTelemetry(client))
+    if cfg["local_fallback"]:
+        sources.append(CommandTelemetry(NVIDIA_SMI_QUERY, source="local"))
+    return FallbackTelemetry(sources)
+
+
+class VramSampler:
+    """Samples VRAM use of one or more render hosts on a background thread.
+
+    Keeps timestamped samples so a caller can ask for the peak use while its
+    own request was running.
+    """
+
+    def __init__(self, sources, interval=None, max_samples=10000):
+        self.sources = list(sources)
+        self.interval = GPU_TELEMETRY_SETTINGS["sample_interval"] if interval is None else interval
+        self.samples = deque(maxlen=max_samples)
+        self.peak = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        if self.sources and self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="vram-sampler")
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sample_once(self):
+        readings = [r for r in (source.sample() for source in self.sources) if r is not None]
+        if not readings:
+            return None
+        # Batch sizing cares about the fullest card.
+        reading = max(readings, key=lambda r: r["used_fraction"])
+        with self._lock:
+            self.samples.append((time.monotonic(), reading["used_fraction"]))
+            if self.peak is None or reading["used_fraction"] > self.peak["used_fraction"]:
+                self.peak = reading
+        return reading
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample_once()
+            self._stop.wait(self.interval)
+
+    def peak_fraction(self, since, until=None):
+        """Highest VRAM use fraction sampled between since and until (monotonic time), or None."""
+        until = time.monotonic() if until is None else until
+        with self._lock:
+            window = [fraction for t, fraction in self.samples if since <= t <= until]
+        return max(window) if window else None
@@ -1,17 +1,21 @@
 # core/utils.py
 import base64
+import functools
 import json
+import re
 import sys
 import time
 import threading
 import itertools
 import os
+import struct
+import zlib
 from io import BytesIO
 from pathlib import Path
-from PIL import Image, PngImagePlugin
 from core.settings import SPINNER_EMOJIS, GLOBAL_TAG_BLACKLIST, TAG_CONFLICT_MAP
 
-os.system('')
+HEADLESS_ENV = "PROJECT_ERO_HEADLESS"
+ANSI_NAMES = ("HEADER", "BLUE", "CYAN", "GREEN", "WARNING", "FAIL", "ENDC", "BOLD", "UNDERLINE")
 
 def configure_utf8_console():
     for stream in (sys.stdout, sys.stderr):
@@ -21,6 +25,23 @@ def configure_utf8_console():
 
 configure_utf8_console()
 
+_ansi_enabled = False
+
+def enable_ansi_console():
+    """Turn on escape-code handling in the Windows console; other terminals already have it.
+
+    Safe to call more than once; only the first call spawns the shell.
+    """
+    global _ansi_enabled
+    if sys.platform == "win32" and not _ansi_enabled:
+        os.system('')
+    _ansi_enabled = True
+
+def headless_requested(environ=None):
+    """True when PROJECT_ERO_HEADLESS is set to anything but an empty/false value."""
+    value = (os.environ if environ is None else environ).get(HEADLESS_ENV, "")
+    return value.strip().lower() not in ("", "0", "false", "no", "off")
+
 class EvaText:
     HEADER = '\033[95m'
     BLUE = '\033[94m'
@@ -32,8 +53,21 @@ class EvaText:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+    # Headless: no typing effect, no boxes, no colour codes; one plain line per message.
+    headless = False
+    _ansi = {name: value for name, value in locals().items() if name in ANSI_NAMES}
+
+    @classmethod
+    def set_headless(cls, enabled=True):
+        cls.headless = enabled
+        for name, value in cls._ansi.items():
+            setattr(cls, name, "" if enabled else value)
+
     @staticmethod
     def slow_print(text, delay=0.01, end='\n'):
+        if EvaText.headless:
+            print(text, end=end, flush=True)
+            return
         for char in text:
             sys.stdout.write(char)
             sys.stdout.flush()
@@ -45,8 +79,24 @@ class EvaText:
     def print_system(text):
         EvaText.slow_print(f"{EvaText.CYAN}[SYSTEM]{EvaText.ENDC} {text}", delay=0.005)
 
+    @staticmethod
+    def print_alert(text):
+        print(f"{EvaText.FAIL}[ALERT]{EvaText.ENDC} {text}", flush=True)
+
+    @staticmethod
+    def print_phase(text):
+        if EvaText.headless:
+            print(f"[PHASE] {text}", flush=True)
+            return
+        print(f"\n{EvaText.CYAN}┌{'─' * 60}┐{EvaText.ENDC}")
+        print(f"{EvaText.CYAN}│  {text:<58}│{EvaText.ENDC}")
+        print(f"{EvaText.CYAN}└{'─' * 60}┘{EvaText.ENDC}")
+
     @staticmethod
     def print_heavy_warning(text):
+        if EvaText.headless:
+            print(f"[WARNING] {text}", flush=True)
+            return
         total_width = 58 
         border_pattern = "◢◤"
         border = border_pattern * (total_width // 2)
@@ -65,6 +115,12 @@ class EvaText:
 
     @staticmethod
     def box_msg(lines, color=GREEN, title="MAGI SYSTEM"):
+        if EvaText.headless:
+            tag = title.replace(" ", "_")
+            for line in lines:
+                print(f"[{tag}] {line}")
+            sys.stdout.flush()
+            return
         width = 60
         print(f"{color}╔{'═'*width}╗")
         print(f"║{title.center(width)}║")
@@ -79,9 +135,64 @@ class EvaText:
             time.sleep(0.05)
         print(f"{color}╚{'═'*width}╝{EvaText.ENDC}")
 
+class LineProgress:
+    """Headless stand-in for the tqdm bars: a "[PROGRESS]" line per update, at most one per ``interval`` seconds.
+
+    The first and the last update are always printed, so a log shows when a
+    phase started and that it finished.
+    """
+
+    def __init__(self, total, desc, interval=5.0):
+        self.total = total
+        self.desc = desc
+        self.interval = interval
+        self.n = 0
+        self.postfix = ""
+        self._started_at = time.monotonic()
+        self._printed_at = None
+
+    def set_postfix_str(self, text, refresh=True):
+        self.postfix = text
+
+    def update(self, n=1):
+        self.n += n
+        now = time.monotonic()
+        if self._printed_at is None or self.n >= self.total or now - self._printed_at >= self.interval:
+            self._printed_at = now
+            self.write(self.line())
+
+    def line(self):
+        elapsed = time.monotonic() - self._started_at
+        percent = self.n * 100 / self.total if self.total else 100.0
+        parts = [f"[PROGRESS] {self.desc} {self.n}/{self.total} ({percent:.0f}%) {elapsed:.1f}s"]
+        if self.postfix:
+            parts.append(self.postfix)
+        return " | ".join(parts)
+
+    @staticmethod
+    def write(text):
+        print(text, flush=True)
+
+    def close(self):
+        pass
+
+def progress_bar(total, desc, bar_format=None):
+    """tqdm bar for a terminal, LineProgress in headless mode."""
+    if EvaText.headless:
+        return LineProgress(total, desc)
+    from tqdm import tqdm  # Only interactive runs pay for importing tqdm.
+    return tqdm(total=total, desc=desc, bar_format=bar_format, ncols=120, leave=True)
+
 def ensure_dir(path):
     Path(path).mkdir(parents=True, exist_ok=True)
 
+def list_input_images(folder):
+    exts = ["*.png", "*.jpg", "*.jpeg", "*.PNG", "*.JPG", "*.JPEG"]
+    files = set()
+    for ext in exts:
+        files.update(Path(folder).glob(ext))
+    return sorted(files)
+
 def extract_infotext(response_info):
     if not response_info:
         return ""
@@ -93,44 +204,137 @@ def extract_infotext(response_info):
     except Exception:
         return response_info
 
+def extract_seeds(response_info):
+    """Seeds the WebUI actually used, one per returned image (empty if the info has none)."""
+    try:
+        info_data = json.loads(response_info) if response_info else None
+    except Exception:
+        return []
+    if not isinstance(info_data, dict):
+        return []
+    if info_data.get("all_seeds"):
+        return list(info_data["all_seeds"])
+    return [info_data["seed"]] if "seed" in info_data else []
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_TEXT_CHUNKS = (b"tEXt", b"zTXt", b"iTXt")
+
+
+def _png_chunk(chunk_type, data):
+    crc = zlib.crc32(chunk_type + data) & 0xFFFFFFFF
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", crc)
+
+
+def _png_text_chunk(key, value):
+    # Same rule as PngInfo.add_text: latin-1 goes to tEXt, anything else to UTF-8 iTXt.
+    try:
+        return _png_chunk(b"tEXt", key.encode("latin-1") + b"\0" + value.encode("latin-1"))
+    except UnicodeEncodeError:
+        return _png_chunk(b"iTXt", key.encode("latin-1") + b"\0\0\0\0\0" + value.encode("utf-8"))
+
+
+def inject_png_text(png_bytes, info_text=None, key="parameters"):
+    """Rewrite PNG text metadata without decoding pixels.
+
+    Existing text chunks are dropped, mirroring a PIL re-save, and the new one is
+    placed before the first IDAT so readers see it without decoding the image.
+    Returns None when the payload is not a well-formed PNG.
+    """
+    if not png_bytes.startswith(PNG_SIGNATURE):
+        return None
+    out = [PNG_SIGNATURE]
+    pos = len(PNG_SIGNATURE)
+    injected = not info_text
+    while pos + 8 <= len(png_bytes):
+        length, chunk_type = struct.unpack(">I4s", png_bytes[pos:pos + 8])
+        end = pos + 12 + length
+        if end > len(png_bytes):
+            return None
+        if chunk_type == b"IDAT" and not injected:
+            out.append(_png_text_chunk(key, info_text))
+            injected = True
+        if chunk_type not in PNG_TEXT_CHUNKS:
+            out.append(png_bytes[pos:end])
+        pos = end
+        if chunk_type == b"IEND":
+            return b"".join(out) if injected else None
+    return None
+
+
+def _save_image_reencode(img_data, path, info_text=None):
+    from PIL import Image, PngImagePlugin  # Rare fallback; keeps Pillow out of start-up.
+    img = Image.open(BytesIO(img_data))
+    pnginfo = PngImagePlugin.PngInfo()
+    if info_text:
+        pnginfo.add_text("parameters", info_text)
+    img.save(path, pnginfo=pnginfo)
+
+
 def save_image(image_base64, path, info_text=None):
     try:
         ensure_dir(Path(path).parent)
         img_data = base64.b64decode(image_base64)
-        img = Image.open(BytesIO(img_data))
-        pnginfo = PngImagePlugin.PngInfo()
-        if info_text:
-            pnginfo.add_text("parameters", info_text)
-        img.save(path, pnginfo=pnginfo)
+        png_data = inject_png_text(img_data, info_text)
+        if png_data is None:
+            _save_image_reencode(img_data, path, info_text)
+        else:
+            Path(path).write_bytes(png_data)
     except Exception as e:
         if "unittest" not in sys.modules:
             print(f"{EvaText.FAIL}❌ LOGIC GATE COLLAPSE (SAVE ERROR): {e}{EvaText.ENDC}")
         raise
 
+def _trie_pattern(node):
+    """Regex source for a character trie; shared prefixes keep the regex engine from re-scanning."""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    ends_here = "" in node
+    if not branches:
+        return ""
+    if len(branches) == 1 and not ends_here:
+        return branches[0]
+    group = "(?:" + "|".join(branches) + ")"
+    # A word ending here also matches when none of the longer branches do.
+    return group + "?" if ends_here else group
+
+
+@functools.lru_cache(maxsize=32)
+def compile_tag_blacklist(block_words):
+    """One compiled regex matching any of block_words (a frozenset) as a substring, or None if empty."""
+    if not block_words:
+        return None
+    root = {}
+    for word in block_words:
+        node = root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return re.compile(_trie_pattern(root))
+
+
+@functools.lru_cache(maxsize=256)
+def conflicting_tags(user_prompt_lower):
+    """Tags of TAG_CONFLICT_MAP that clash with traits already in the user prompt."""
+    conflicts = []
+    for user_key, conflict_vals in TAG_CONFLICT_MAP.items():
+        if user_key in user_prompt_lower:
+            conflicts.extend(conflict_vals)
+    return tuple(conflicts)
+
+
 def smart_process_tags(scanned_tags_str, user_prompt, weight, blocked_list=None):
     if not scanned_tags_str:
         return ""
     
     scanned_list = [t.strip() for t in scanned_tags_str.split(',')]
-    user_prompt_lower = user_prompt.lower()
-    
-    active_blacklist = set(GLOBAL_TAG_BLACKLIST)
-    if blocked_list:
-        active_blacklist.update(blocked_list)
-        
-    for user_key, conflict_vals in TAG_CONFLICT_MAP.items():
-        if user_key in user_prompt_lower:
-            active_blacklist.update(conflict_vals)
-
-    kept_tags = []
-    for tag in scanned_list:
-        is_blocked = False
-        for block_word in active_blacklist:
-            if block_word in tag:
-                is_blocked = True
-                break
-        if not is_blocked:
-            kept_tags.append(tag)
+
+    # Drop every tag containing a blacklisted word. The matcher is compiled once
+    # per blacklist and reused for every image of a remix run.
+    block_words = frozenset(itertools.chain(GLOBAL_TAG_BLACKLIST, blocked_list or (), conflicting_tags(user_prompt.lower())))
+    matcher = compile_tag_blacklist(block_words)
+    if matcher is None:
+        kept_tags = scanned_list
+    else:
+        kept_tags = [tag for tag in scanned_list if not matcher.search(tag)]
             
     if not kept_tags:
         return ""
@@ -141,28 +345,34 @@ def smart_process_tags(scanned_tags_str, user_prompt, weight, blocked_list=None)
 class OtakuSpinner:
     def __init__(self, message=" Processing..."):
         self.message = message
-        self.stop_running = False
+        self._stop = threading.Event()
         self.thread = None
 
     def spin(self):
         chars = itertools.cycle(SPINNER_EMOJIS)
-        while not self.stop_running:
+        while not self._stop.is_set():
             sys.stdout.write(f"\r {EvaText.GREEN}{next(chars)}{EvaText.ENDC} {self.message}")
             sys.stdout.flush()
-            time.sleep(2.0)
+            # Waiting on the event lets __exit__ return as soon as the work is done.
+            self._stop.wait(2.0)
 
     def __enter__(self):
+        if EvaText.headless:
+            print(self.message.strip(), flush=True)
+            return self
         sys.stdout.write("\n") 
-        self.stop_running = False
+        self._stop.clear()
         self.thread = threading.Thread(target=self.spin)
         self.thread.daemon = True
         self.thread.start()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.stop_running = True
-        if self.thread:
-            self.thread.join()
+        if self.thread is None:
+            return
+        self._stop.set()
+        self.thread.join()
+        self.thread = None
         sys.stdout.write(f"\r {' ' * (len(self.message) + 20)} \r")
         sys.stdout.write("\033[F") 
         sys.stdout.flush()
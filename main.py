@@ -1,92 +1,102 @@
 # main.py
-import json
+import argparse
 import base64
-import sys
-import subprocess
 import os
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor
-from tqdm import tqdm
-from PIL import Image
+from functools import partial
 
 from core.settings import (
-    STORY_FILE, OUTPUT_DIR, INPUT_DIR, DEFAULT_GEN_SETTINGS, 
+    STORY_FILE, OUTPUT_DIR, INPUT_DIR,
     AD_PRESETS, PROMPT_PRESETS, CN_CONFIG_REMIX, CN_CONFIG_STORY
 )
-from core.client import SDClient 
-from core.utils import ensure_dir, save_image, extract_infotext, smart_process_tags, OtakuSpinner, EvaText
+from core.backend_pool import BackendPool
+from core.batch_tuner import BatchTuner
+from core.client import SDClient, WebUIServerError
+from core.remix_pipeline import RemixInput, order_by_size, run_remix_pipeline
+from core.render_cache import build_render_cache
+from core.tag_cache import build_tag_cache
+from core.pipeline import RefinePipeline
+from core.story_batch import StoryJob, find_story_files, group_by_model
+from core.story_scheduler import ThroughputBar, run_work_items
+from core.telemetry import VramSampler, build_telemetry
+from core.utils import (
+    ensure_dir, list_input_images, save_image, extract_infotext, smart_process_tags, EvaText,
+    enable_ansi_console, headless_requested, progress_bar,
+)
 
 def wait_for_futures(futures):
     for future in futures:
         future.result()
 
-def get_next_draft_batch(draft_root, scene_id, cnt, num_imgs, max_batch):
-    next_path = draft_root / f"{scene_id}_{cnt+1:03}.png"
-    if next_path.exists():
-        return 0
-
-    batch = min(max_batch, num_imgs - cnt)
-    while batch > 1:
-        batch_paths = [draft_root / f"{scene_id}_{i:03}.png" for i in range(cnt + 1, cnt + batch + 1)]
-        if not any(path.exists() for path in batch_paths):
-            break
-        batch -= 1
-    return batch
-
 class SystemScanner:
-    def __init__(self):
-        self.vram_gb = 8.0 
-        self.gpu_name = "Generic/Apple GPU (Auto-Detected)"
+    def __init__(self, telemetry=None):
         self.cpu_cores = os.cpu_count() or 4
-        self._scan_gpu()
-
-    def _scan_gpu(self):
-        try:
-            cmd = ['nvidia-smi', '--query-gpu=memory.total,name', '--format=csv,noheader,nounits']
-            if sys.platform == "win32":
-                si = subprocess.STARTUPINFO()
-                si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                output = subprocess.check_output(cmd, encoding='utf-8', startupinfo=si)
-            else:
-                output = subprocess.check_output(cmd, encoding='utf-8')
-            
-            self.vram_gb = float(output.split(',')[0].strip()) / 1024
-            self.gpu_name = output.split(',')[1].strip()
-        except Exception:
-            pass
+        self.telemetry = telemetry
+        self.reading = None
+
+    def scan(self):
+        # Asks the render host (WebUI /memory or a probe); local nvidia-smi is only the fallback.
+        self.reading = self.telemetry.sample() if self.telemetry else None
+        return self.reading
+
+    @property
+    def gpu_name(self):
+        if not self.reading:
+            return "Unknown (no GPU telemetry)"
+        return f"{self.reading['name']} [{self.reading['source']}]"
+
+    @property
+    def vram_line(self):
+        if not self.reading:
+            return "N/A"
+        return f"{self.reading['used_gb']:.1f} / {self.reading['total_gb']:.1f} GB VRAM"
 
     def get_optimization_strategy(self):
-        strategy = {"batch_size": 1, "save_workers": 2}
-        if self.vram_gb - 4 > 0:
-            strategy["batch_size"] = max(1, min(int((self.vram_gb - 4) / 3.5), 4))
-        strategy["save_workers"] = max(2, min(self.cpu_cores - 2, 4))
-        return strategy
+        # Batch size is learned per configuration by BatchTuner; the GPU is often on another box.
+        return {"save_workers": max(2, min(self.cpu_cores - 2, 4))}
 
-def main():
-    start_time = time.time()
-    EvaText.print_system("INITIALIZING MAGI SYSTEM...")
-    time.sleep(0.5)
-    
-    print(r"""
+BANNER = r"""
    ╔═══════════════════════════════════════════╗
    ║   ❖ PROJECT ERO 6.9 : OPERATION START     ║
    ║   (｀・ω・´)b  COMMAND CONSOLE ONLINE     ║
    ╚═══════════════════════════════════════════╝
-    """)
+    """
 
-    if not STORY_FILE.exists():
-        EvaText.print_alert("CRITICAL ERROR: SCRIPT NOT FOUND")
-        return
+def main(headless=None, story_paths=None):
+    """Run remix mode (files in inputs/) or the story; returns 1 when the run could not start.
 
-    with open(STORY_FILE, "r", encoding="utf-8") as f:
-        story = json.load(f)
-        
-    gen_opts = {**DEFAULT_GEN_SETTINGS, **story.get("generation_settings", {})}
-    models = story.get("models", {})
-    story_refine_mode = story.get("story_refine_mode", "controlnet_txt2img")
-    seed_strategy = story.get("seed_strategy", {})
-    global_num = seed_strategy.get("global_num_images", 2)
-    base_seed = seed_strategy.get("base_seed", -1)
+    story_paths (story files or folders of them) renders those stories as one
+    batch instead of data/story.json, and never switches to remix mode.
+    """
+    start_time = time.time()
+    if headless is None:
+        headless = headless_requested()
+    EvaText.set_headless(headless)
+    if not headless:
+        enable_ansi_console()
+    EvaText.print_system("INITIALIZING MAGI SYSTEM...")
+    if not headless:
+        time.sleep(0.5)
+        print(BANNER)
+
+    batch = bool(story_paths)
+    try:
+        story_files = find_story_files(story_paths) if batch else [STORY_FILE]
+    except FileNotFoundError as e:
+        EvaText.print_alert(f"CRITICAL ERROR: {e}")
+        return 1
+    if not story_files or not story_files[0].exists():
+        EvaText.print_alert("CRITICAL ERROR: SCRIPT NOT FOUND")
+        return 1
+
+    jobs = [StoryJob.load(path, OUTPUT_DIR) for path in story_files]
+    # Remix mode and the shared settings of a batch come from the first story.
+    lead = jobs[0]
+    story = lead.story
+    gen_opts = lead.gen_opts
+    models = lead.models
     
     remix_cfg = story.get("remix_settings", {})
     user_weight = remix_cfg.get("user_prompt_weight", 1.5)
@@ -94,39 +104,44 @@ def main():
     remix_denoise = remix_cfg.get("denoising_strength", 0.6)
     conflict_keys = remix_cfg.get("conflict_keywords", [])
     
-    project_name = story.get("project_name", "Untitled_Project")
-    project_root = OUTPUT_DIR / project_name
-    draft_root = project_root / "draft"
-    example_root = project_root / "example"
+    project_root = lead.project_root if len(jobs) == 1 else OUTPUT_DIR
     remix_root = OUTPUT_DIR / "remix"
     
-    ensure_dir(draft_root)
-    ensure_dir(example_root)
     ensure_dir(INPUT_DIR)
 
-    scanner = SystemScanner()
+    render_cache = build_render_cache()
+    tuner = BatchTuner()
+    vram = None
+    draft_key = lead.draft_key
+    tag_cache = build_tag_cache()
+    pool = BackendPool(client_factory=partial(SDClient, render_cache=render_cache, tag_cache=tag_cache))
+    telemetry = [build_telemetry(b.client) for b in pool.backends]
+    scanner = SystemScanner(telemetry[0])
     opt = scanner.get_optimization_strategy()
-    sd = SDClient()
 
     EvaText.print_system("ESTABLISHING NEURAL LINKAGE...")
     EvaText.print_system("PINGING CORE SECTOR (WEBUI)...")
     
-    if sd.check_connection():
+    if pool.check_connection():
+        scanner.scan()
         sync_rate = "100.0%"
-        batch_level = opt['batch_size']
+        learned = tuner.best(draft_key)
+        batch_level = f"ADAPTIVE (LEARNED {learned})" if tuner.seconds_per_image(draft_key) else "ADAPTIVE (LEARNING)"
         worker_count = opt['save_workers']
+        online = sum(1 for b in pool.status() if b["healthy"])
         
         EvaText.box_msg([
             f"▷ TACTICAL UNIT    : {scanner.gpu_name}",
-            f"▷ NEURAL CAPACITY  : {scanner.vram_gb:.1f} GB VRAM",
+            f"▷ NEURAL CAPACITY  : {scanner.vram_line}",
             f"▷ SYNCHRONIZATION  : {sync_rate}",
-            f"▷ LIMITER RELEASE  : LEVEL {batch_level} (MAX OUTPUT)",
+            f"▷ CORE SECTORS     : {online}/{len(pool.backends)} WEBUI ONLINE",
+            f"▷ LIMITER RELEASE  : {batch_level}",
             f"▷ LOGISTICS WING   : {worker_count} DRONES ONLINE"
         ], color=EvaText.GREEN, title="STATUS REPORT")
     else:
         EvaText.print_heavy_warning("SYNC LOST: WEBUI NOT RESPONDING")
         print(f"{EvaText.FAIL}Please ensure WebUI is running with API enabled.{EvaText.ENDC}")
-        return
+        return 1
     
     io_executor = ThreadPoolExecutor(max_workers=opt['save_workers'])
     save_futures = []
@@ -150,33 +165,17 @@ def main():
             return None
         return model_name
 
-    def format_lora(items):
-        res = ""
-        for x in items:
-            if not x:
-                continue
-            if "lora:" not in x and not x.startswith("<"):
-                res += f" <lora:{x}:1>"
-            elif x.startswith("<"):
-                res += f" {x}"
-            else:
-                res += f" <{x}>"
-        return res
-
-    final_loras = format_lora(story.get("final_loras", []))
-    header = story.get("character_header", "")
-    bar_fmt = "{desc:8}: {percentage:3.0f}%|{bar:50}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]"
+    final_loras = lead.final_loras
+    header = lead.header
+    bar_fmt = "{desc:8}: {percentage:3.0f}%|{bar:50}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}{postfix}]"
 
     # =======================================================
     # 🕵️ Remix Mode (PATTERN BLUE)
     # =======================================================
-    EvaText.print_system("SCANNING EXTERNAL INPUTS...")
-    
-    exts = ["*.png", "*.jpg", "*.jpeg", "*.PNG", "*.JPG", "*.JPEG"]
-    files = set()
-    for ext in exts:
-        files.update(INPUT_DIR.glob(ext))
-    input_images = sorted(list(files))
+    input_images = []
+    if not batch:
+        EvaText.print_system("SCANNING EXTERNAL INPUTS...")
+        input_images = list_input_images(INPUT_DIR)
     
     if not input_images:
         EvaText.slow_print(">> NO ANOMALIES DETECTED. RESUMING STANDARD PROTOCOL.", delay=0.02)
@@ -194,198 +193,376 @@ def main():
         ensure_dir(remix_root)
         print(f"{EvaText.CYAN}<<< UNIT-FINAL EMERGENCY LAUNCH >>>{EvaText.ENDC}")
         final_model = required_model("final_model")
-        if not final_model or not sd.set_model(final_model):
+        if not final_model or not pool.preload(final_model):
             finish_pending_saves()
-            return
+            return 1
 
         prefix = story.get('final_prefix', PROMPT_PRESETS['final']['prefix'])
         negative = story.get('final_negative', PROMPT_PRESETS['final']['negative'])
         ad_keys = story.get("ad_modes", story.get("active_adetailers", ["face"]))
         ad_args = [AD_PRESETS[k] for k in ad_keys if k in AD_PRESETS]
 
-        pbar = tqdm(total=len(input_images), desc="REMIXING", bar_format=bar_fmt, ncols=120, leave=True)
-        
-        for idx, img_path in enumerate(input_images):
-            try:
-                with Image.open(img_path) as pil_img:
-                    orig_w, orig_h = pil_img.size
-                with open(img_path, "rb") as f:
-                    init_img_b64 = base64.b64encode(f.read()).decode()
-
-                with OtakuSpinner(f" ENGAGING TARGET ({img_path.name})...") as _:
-                    raw_tags = sd.interrogate(init_img_b64, model="deepdanbooru")
-                
-                processed_tags = smart_process_tags(raw_tags, header, original_weight, blocked_list=conflict_keys)
-                full_prompt = f"{prefix} ({header}:{user_weight}), {processed_tags} {final_loras}"
-
-                with OtakuSpinner(" OVERCLOCKING NEURAL CIRCUITRY...") as _:
-                    resp = sd.img2img(
-                        init_image_b64=init_img_b64, prompt=full_prompt, negative_prompt=negative,
-                        width=orig_w, height=orig_h, steps=gen_opts["steps"],
-                        cfg_scale=gen_opts["final_cfg"], denoising_strength=remix_denoise,
-                        sampler_name=gen_opts["sampler"], use_dt=story.get("use_dt", True),
-                        adetailer_args=ad_args, controlnet_name=models.get("controlnet_openpose", None),
-                        controlnet_img=init_img_b64,
-                        cn_weight=CN_CONFIG_REMIX["weight"], cn_end=CN_CONFIG_REMIX["guidance_end"]
-                    )
-                
-                imgs = resp.get("images", [])
-                info = extract_infotext(resp.get("info", ""))
-                if imgs:
-                    save_name = f"Remix_{img_path.stem}.png"
-                    save_futures.append(io_executor.submit(save_image, imgs[0], remix_root / save_name, info))
-            except Exception as e:
-                print(f"\n{EvaText.FAIL}❌ IMPACT FAILED: {e}{EvaText.ENDC}")
+        # Read ahead, render on every WebUI and save in parallel; same-size inputs run back to back.
+        online = sum(1 for b in pool.status() if b["healthy"])
+        gpu_workers = remix_cfg.get("gpu_workers") or max(1, online)
+        while len(pool.holders(final_model)) < min(gpu_workers, online, len(input_images)):
+            if not pool.preload(final_model, exclude=pool.holders(final_model)):
+                break
+        pbar = progress_bar(len(input_images), "REMIXING", bar_fmt)
+        pbar_lock = threading.Lock()
+
+        def remix_render(item):
+            raw_tags = pool.interrogate(item.image_b64, model="deepdanbooru")
+            processed_tags = smart_process_tags(raw_tags, header, original_weight, blocked_list=conflict_keys)
+            full_prompt = f"{prefix} ({header}:{user_weight}), {processed_tags} {final_loras}"
+            return pool.img2img(
+                final_model, init_image_b64=item.image_b64, prompt=full_prompt, negative_prompt=negative,
+                width=item.width, height=item.height, steps=gen_opts["steps"],
+                cfg_scale=gen_opts["final_cfg"], denoising_strength=remix_denoise,
+                sampler_name=gen_opts["sampler"], use_dt=story.get("use_dt", True),
+                adetailer_args=ad_args, controlnet_name=models.get("controlnet_openpose", None),
+                controlnet_img=item.image_b64,
+                cn_weight=CN_CONFIG_REMIX["weight"], cn_end=CN_CONFIG_REMIX["guidance_end"]
+            )
+
+        def remix_save(item, resp):
+            imgs = resp.get("images", [])
+            if imgs:
+                save_image(imgs[0], remix_root / f"Remix_{item.path.stem}.png", extract_infotext(resp.get("info", "")))
+
+        def remix_done(item, error):
+            with pbar_lock:
+                remix_progress(item, error)
+
+        def remix_progress(item, error):
+            if error is not None:
+                pbar.write(f"{EvaText.FAIL}❌ IMPACT FAILED ({item.path.name}): {error}{EvaText.ENDC}")
+            if tag_cache is not None:
+                # Tags from an earlier run come straight from the cache; no GPU time.
+                pbar.set_postfix_str(f"tags cached {tag_cache.hits}/{tag_cache.hits + tag_cache.misses}", refresh=False)
             pbar.update(1)
-        pbar.close()
+
+        remix_items, unreadable = order_by_size(input_images)
+        for img_path, error in unreadable:
+            remix_done(RemixInput(img_path, 0, 0), error)
+        try:
+            remix_stats = run_remix_pipeline(
+                remix_items, remix_render, remix_save,
+                prefetch=remix_cfg.get("prefetch", 4), gpu_workers=gpu_workers,
+                save_workers=opt["save_workers"], on_done=remix_done,
+            )
+        finally:
+            pbar.close()
+
+        queues = remix_stats["queues"]
+        EvaText.box_msg([
+            f"READ   : {remix_stats['read']['items']} items | busy {remix_stats['read']['busy_seconds']:.1f}s | blocked {remix_stats['read']['idle_seconds']:.1f}s",
+            f"GPU    : {remix_stats['gpu']['items']} items | busy {remix_stats['gpu']['busy_seconds']:.1f}s | idle {remix_stats['gpu']['idle_seconds']:.1f}s | {gpu_workers} workers",
+            f"SAVE   : {remix_stats['save']['items']} items | busy {remix_stats['save']['busy_seconds']:.1f}s | idle {remix_stats['save']['idle_seconds']:.1f}s",
+            f"QUEUE  : prefetch max {queues['prefetch']['max_depth']}/{queues['prefetch']['maxsize']} | save max {queues['save']['max_depth']}/{queues['save']['maxsize']}",
+            f"RATE   : {len(remix_items) * 60 / max(remix_stats['elapsed_seconds'], 1e-9):.1f} img/min | {len({i.size for i in remix_items})} size groups",
+        ], color=EvaText.BLUE, title="PIPELINE REPORT")
 
     # =======================================================
     # 📖 Story Mode (HUMAN INSTRUMENTALITY)
     # =======================================================
     else:
         EvaText.print_system("REALITY ANCHOR: STABLE.")
-        EvaText.print_system(f"EXECUTING \"GENESIS\" SCRIPT: {project_name}")
-        draft_loras = format_lora(story.get("draft_loras", []))
-        
-        # === Phase 1: Draft ===
-        print(f"\n{EvaText.CYAN}┌────────────────────────────────────────────────────────────┐{EvaText.ENDC}")
-        print(f"{EvaText.CYAN}│  PHASE 1 : CONCEPTUALIZATION (DRAFT)                       │{EvaText.ENDC}")
-        print(f"{EvaText.CYAN}└────────────────────────────────────────────────────────────┘{EvaText.ENDC}")
-        
-        print(f"{EvaText.CYAN}<<< UNIT-01 LAUNCH >>>{EvaText.ENDC}")
-        draft_model = required_model("draft_model")
-        if not draft_model or not sd.set_model(draft_model):
+        for job in jobs:
+            if job.missing_models():
+                source = job.source.name if job.source else "story.json"
+                EvaText.print_alert(f"CRITICAL ERROR: Missing models.{job.missing_models()[0]} in {source}")
+                finish_pending_saves()
+                return 1
+            if job.pipeline_mode not in ("twopass", "pipelined"):
+                raise ValueError(f"Unknown story_pipeline_mode: {job.pipeline_mode}")
+        roots = [job.project_root for job in jobs]
+        if len(set(roots)) != len(roots):
+            EvaText.print_alert("CRITICAL ERROR: Two stories share a project_name (and its output folder)")
             finish_pending_saves()
-            return
-
-        scenes = story.get("scenes", [])
-        for s_idx, scene in enumerate(scenes):
-            scene_id = scene["scene_id"]
-            num_imgs = scene.get("num_images", global_num)
-            
-            prefix = story.get('draft_prefix', PROMPT_PRESETS['draft']['prefix'])
-            negative = story.get('draft_negative', PROMPT_PRESETS['draft']['negative'])
-            prompt = f"{prefix} {header} {draft_loras}, {scene['prompt']}"
-            
-            scene_seed_start = base_seed + (s_idx * 10000) if base_seed != -1 else -1
-
-            pbar = tqdm(total=num_imgs, desc=scene_id[:8], bar_format=bar_fmt, ncols=120, leave=True)
-            cnt = 0
-            while cnt < num_imgs:
-                batch = get_next_draft_batch(draft_root, scene_id, cnt, num_imgs, opt['batch_size'])
-                if batch == 0:
-                    pbar.update(1)
-                    cnt += 1
-                    continue
+            return 1
+
+        for job in jobs:
+            EvaText.print_system(f"EXECUTING \"GENESIS\" SCRIPT: {job.name}")
+            # === Render plan: reuse outputs whose inputs are unchanged since the last run ===
+            job.build_plan()
+            EvaText.box_msg(job.plan_lines(), color=EvaText.BLUE, title="RENDER PLAN")
+        drafts_todo = sum(job.drafts_todo for job in jobs)
+        finals_todo = sum(job.finals_todo for job in jobs)
+        online = sum(1 for b in pool.status() if b["healthy"])
+
+        # Pipelining only helps when Phase 2 does not evict the draft model,
+        # i.e. a second backend can keep the final model resident.
+        pipelined = False
+        if any(job.pipeline_mode == "pipelined" for job in jobs):
+            if len(jobs) > 1:
+                EvaText.print_system("BATCH RUNS LOAD EACH MODEL ONCE PER PHASE. RUNNING PIPELINED STORIES TWO-PASS.")
+            else:
+                pipelined = online >= 2 or lead.draft_model == lead.final_model
+                if not pipelined:
+                    EvaText.print_system("PIPELINE NEEDS A SECOND WEBUI OR A SHARED MODEL. FALLING BACK TO TWO-PASS.")
+
+        def save_output(job, b64, path, info):
+            save_image(b64, path, info)
+            job.record(path)
+
+        def refine_image(job, s_idx, scene, i, init_img=None):
+            src = job.draft_path(scene, i)
+            dst = job.final_path(scene, i)
+            if job.plan.is_current(dst):
+                return
+            if init_img is None:
+                if not src.exists():
+                    return
+                with open(src, "rb") as f:
+                    init_img = base64.b64encode(f.read()).decode()
 
-                current_seed = scene_seed_start + cnt if scene_seed_start != -1 else -1
+            opts = job.gen_opts
+            common_args = {
+                "prompt": job.final_prompt(scene), "negative_prompt": job.final_negative,
+                "seed": job.image_seed(s_idx, i),
+                "width": opts["final_width"], "height": opts["final_height"],
+                "steps": opts["steps"], "cfg_scale": opts["final_cfg"],
+                "sampler_name": opts["sampler"], "use_dt": job.story.get("use_dt", True),
+                "adetailer_args": job.ad_args, "controlnet_name": job.models.get("controlnet_openpose", None),
+                "controlnet_img": init_img, "cn_weight": CN_CONFIG_STORY["weight"],
+                "cn_end": CN_CONFIG_STORY["guidance_end"],
+            }
+            if job.refine_mode == "controlnet_txt2img":
+                resp = pool.txt2img(job.final_model, **common_args)
+            elif job.refine_mode == "img2img":
+                resp = pool.img2img(
+                    job.final_model, init_image_b64=init_img,
+                    denoising_strength=opts["final_denoise"],
+                    **common_args,
+                )
+            else:
+                raise ValueError(f"Unknown story_refine_mode: {job.refine_mode}")
+
+            imgs = resp.get("images", [])
+            info = extract_infotext(resp.get("info", ""))
+            if imgs:
+                save_futures.append(io_executor.submit(save_output, job, imgs[0], dst, info))
+
+        # One request in flight per WebUI by default; story.json "scene_workers" overrides it.
+        scene_workers = max(job.story.get("scene_workers") or 0 for job in jobs) or max(1, online)
+
+        def spread_model(model_name, requests):
+            # The pool prefers backends that already hold a model, so load it on
+            # enough of them up front for concurrent requests to fan out.
+            while len(pool.holders(model_name)) < min(scene_workers, online, requests):
+                if not pool.preload(model_name, exclude=pool.holders(model_name)):
+                    break
+
+        def draft_runs():
+            # Every draft group of the run, same-prompt images packed together. Groups are
+            # sized so each worker gets one; the tuner picks the batch size inside a group.
+            # Stories sharing a draft model run back to back, so it is loaded once.
+            for model_name, group in group_by_model(jobs, "draft_model"):
+                items = [
+                    (job, item) for job in group
+                    for item in job.draft_items(min(tuner.limit(job.draft_key), max(1, -(-job.drafts_todo // scene_workers))))
+                ]
+                if pipelined:
+                    items += [(job, item) for job in group for item in job.reused_draft_items()]
+                yield model_name, items
 
-                with OtakuSpinner(" COMPILING KINETIC VECTORS...") as _:
-                    resp = sd.txt2img(
-                        prompt=prompt, negative_prompt=negative, seed=current_seed,
-                        steps=gen_opts["draft_steps"], width=gen_opts["draft_width"], height=gen_opts["draft_height"],
-                        batch_size=batch, cfg_scale=gen_opts["draft_cfg"], sampler_name=gen_opts["draft_sampler"]
+        # === Phase 1: Draft ===
+        if pipelined:
+            EvaText.print_phase("PHASE 1+2 : CONCEPTUALIZATION ⇒ REALITY ANCHORING (PIPE)")
+        else:
+            EvaText.print_phase("PHASE 1 : CONCEPTUALIZATION (DRAFT)")
+        
+        print(f"{EvaText.CYAN}<<< UNIT-01 LAUNCH >>>{EvaText.ENDC}")
+        refine_pipe = None
+        refine_bar = None
+        if pipelined:
+            if drafts_todo and not pool.preload(lead.draft_model):
+                finish_pending_saves()
+                return 1
+            if finals_todo:
+                print(f"{EvaText.CYAN}<<< UNIT-02 LAUNCH >>>{EvaText.ENDC}")
+                # Keep the draft backend on the draft model; the final model goes elsewhere.
+                keep_drafting = pool.holders(lead.draft_model)[:1] if lead.draft_model != lead.final_model else []
+                if not pool.preload(lead.final_model, exclude=keep_drafting):
+                    finish_pending_saves()
+                    return 1
+                refine_bar = ThroughputBar(finals_todo, "REFINE")
+
+                def refine_item(item):
+                    job, _, scene, i = item[:4]
+                    rendered = job.plan.needs_render(job.final_path(scene, i))
+                    try:
+                        refine_image(*item)
+                    finally:
+                        if rendered:
+                            refine_bar.update(1)
+
+                refine_pipe = RefinePipeline(
+                    refine_item, maxsize=lead.story.get("refine_queue_size", 4),
+                    workers=lead.story.get("refine_workers", 1),
+                ).start()
+
+        draft_bar = ThroughputBar(drafts_todo, "DRAFT")
+        # VRAM use sampled on the render hosts while drafts run caps how far the tuner grows a batch.
+        vram = VramSampler(telemetry if drafts_todo else [])
+
+        def render_drafts(entry):
+            job, item = entry
+            scenes = job.scenes
+            if item.phase == "reuse":
+                if refine_pipe:
+                    s_idx, i = item.images[0]
+                    refine_pipe.submit((job, s_idx, scenes[s_idx], i))
+                return
+            opts = job.gen_opts
+            offset = 0
+            while offset < item.size:
+                batch = min(tuner.suggest(job.draft_key), item.size - offset)
+                # Image k of a batch gets seed+k, so a later sub-batch starts further along.
+                seed = item.seed + offset if item.seed != -1 else -1
+                started = time.monotonic()
+                try:
+                    resp = pool.txt2img(
+                        job.draft_model, prompt=item.key, negative_prompt=job.draft_negative, seed=seed,
+                        steps=opts["draft_steps"], width=opts["draft_width"], height=opts["draft_height"],
+                        batch_size=batch, cfg_scale=opts["draft_cfg"], sampler_name=opts["draft_sampler"]
                     )
-                
+                except WebUIServerError as e:
+                    if batch == 1:
+                        raise
+                    smaller = tuner.record_failure(job.draft_key, batch)
+                    print(f"\n{EvaText.WARNING}(´・ω・`) BATCH {batch} FAILED ({e.status_code}). "
+                          f"FALLING BACK TO {smaller}.{EvaText.ENDC}")
+                    continue
                 imgs = resp.get("images", [])
                 if len(imgs) != batch:
                     raise RuntimeError(f"Draft generation returned {len(imgs)} image(s); expected {batch}.")
+                tuner.record(job.draft_key, batch, time.monotonic() - started, vram.peak_fraction(started))
                 info = extract_infotext(resp.get("info", ""))
-                for idx, b64 in enumerate(imgs):
-                    fname = f"{scene_id}_{cnt+idx+1:03}.png"
-                    future = io_executor.submit(save_image, b64, draft_root / fname, info)
+                for (s_idx, i), b64 in zip(item.images[offset:offset + batch], imgs):
+                    future = io_executor.submit(save_output, job, b64, job.draft_path(scenes[s_idx], i), info)
                     save_futures.append(future)
                     draft_save_futures.append(future)
-                
-                cnt += batch
-                pbar.update(batch)
-            pbar.close()
-
-        wait_for_futures(draft_save_futures)
+                    if refine_pipe:
+                        refine_pipe.submit((job, s_idx, scenes[s_idx], i, b64))
+                offset += batch
+                draft_bar.update(batch)
 
-        print(f"\n{EvaText.WARNING}[SYSTEM] ENTROPY CASCADE IMMINENT.{EvaText.ENDC}")
-        print(f"{EvaText.WARNING}[SYSTEM] ENGAGING REFINEMENT PROTOCOL.{EvaText.ENDC}")
-
-        # === Phase 2: Refine ===
-        print(f"\n{EvaText.CYAN}┌────────────────────────────────────────────────────────────┐{EvaText.ENDC}")
-        print(f"{EvaText.CYAN}│  PHASE 2 : REALITY ANCHORING (REFINE)                      │{EvaText.ENDC}")
-        print(f"{EvaText.CYAN}└────────────────────────────────────────────────────────────┘{EvaText.ENDC}")
-        
-        print(f"{EvaText.CYAN}<<< UNIT-02 LAUNCH >>>{EvaText.ENDC}")
-        
-        # 修正: 斷行處理
-        final_model = required_model("final_model")
-        if not final_model or not sd.set_model(final_model):
+        load_failed = False
+        try:
+            with vram:
+                for model_name, items in draft_runs():
+                    if not items:
+                        continue
+                    if not pipelined:
+                        if not pool.preload(model_name):
+                            load_failed = True
+                            break
+                        spread_model(model_name, len(items))
+                    run_work_items(items, render_drafts, scene_workers)
+        finally:
+            draft_bar.close()
+            tuner.save()
+            if refine_pipe:
+                pipe_stats = refine_pipe.close(raise_errors=False)
+                refine_bar.close()
+        if load_failed:
             finish_pending_saves()
-            return
-
-        ad_keys = story.get("ad_modes", story.get("active_adetailers", ["face"]))
-        ad_args = [AD_PRESETS[k] for k in ad_keys if k in AD_PRESETS]
-
-        for s_idx, scene in enumerate(scenes):
-            scene_id = scene["scene_id"]
-            num_imgs = scene.get("num_images", global_num)
-            prefix = story.get('final_prefix', PROMPT_PRESETS['final']['prefix'])
-            negative = story.get('final_negative', PROMPT_PRESETS['final']['negative'])
-            prompt = f"{prefix} {header} {final_loras}, {scene['prompt']}"
+            return 1
+
+        if refine_pipe:
+            EvaText.box_msg([
+                f"DRAFT  : {pipe_stats['draft']['items']} items | busy {pipe_stats['draft']['busy_seconds']:.1f}s | blocked {pipe_stats['draft']['idle_seconds']:.1f}s",
+                f"REFINE : {pipe_stats['refine']['items']} items | busy {pipe_stats['refine']['busy_seconds']:.1f}s | idle {pipe_stats['refine']['idle_seconds']:.1f}s",
+                f"QUEUE  : max {pipe_stats['queue']['max_depth']}/{pipe_stats['queue']['maxsize']} | avg {pipe_stats['queue']['avg_depth']}",
+                f"RATE   : {draft_bar.images_per_minute():.1f} drafts/min | {refine_bar.images_per_minute():.1f} finals/min",
+            ], color=EvaText.BLUE, title="PIPELINE REPORT")
+            if refine_pipe.errors:
+                raise refine_pipe.errors[0]
+        elif not pipelined:
+            wait_for_futures(draft_save_futures)
+
+            print(f"\n{EvaText.WARNING}[SYSTEM] ENTROPY CASCADE IMMINENT.{EvaText.ENDC}")
+            print(f"{EvaText.WARNING}[SYSTEM] ENGAGING REFINEMENT PROTOCOL.{EvaText.ENDC}")
+
+            # === Phase 2: Refine ===
+            EvaText.print_phase("PHASE 2 : REALITY ANCHORING (REFINE)")
             
-            scene_seed_start = base_seed + (s_idx * 10000) if base_seed != -1 else -1
-
-            pbar = tqdm(total=num_imgs, desc=scene_id[:8], bar_format=bar_fmt, ncols=120, leave=True)
-            for i in range(num_imgs):
-                filename = f"{scene_id}_{i+1:03}.png"
-                src = draft_root / filename
-                dst = example_root / filename
-                if not src.exists() or dst.exists():
-                    pbar.update(1)
-                    continue
-                
-                current_seed = scene_seed_start + i if scene_seed_start != -1 else -1
-                    
-                with open(src, "rb") as f:
-                    init_img = base64.b64encode(f.read()).decode()
+            print(f"{EvaText.CYAN}<<< UNIT-02 LAUNCH >>>{EvaText.ENDC}")
+            # A final model still loaded from Phase 1 goes first, saving one swap.
+            final_runs = sorted(group_by_model(jobs, "final_model"), key=lambda run: not pool.holders(run[0]))
+            final_bar = ThroughputBar(finals_todo, "REFINE")
 
-                with OtakuSpinner(f" #{i+1} REWRITING HISTORY LOGS...") as _:
-                    common_args = {
-                        "prompt": prompt, "negative_prompt": negative, "seed": current_seed,
-                        "width": gen_opts["final_width"], "height": gen_opts["final_height"],
-                        "steps": gen_opts["steps"], "cfg_scale": gen_opts["final_cfg"],
-                        "sampler_name": gen_opts["sampler"], "use_dt": story.get("use_dt", True),
-                        "adetailer_args": ad_args, "controlnet_name": models.get("controlnet_openpose", None),
-                        "controlnet_img": init_img, "cn_weight": CN_CONFIG_STORY["weight"],
-                        "cn_end": CN_CONFIG_STORY["guidance_end"],
-                    }
-                    if story_refine_mode == "controlnet_txt2img":
-                        resp = sd.txt2img(**common_args)
-                    elif story_refine_mode == "img2img":
-                        resp = sd.img2img(
-                            init_image_b64=init_img,
-                            denoising_strength=gen_opts["final_denoise"],
-                            **common_args,
-                        )
-                    else:
-                        raise ValueError(f"Unknown story_refine_mode: {story_refine_mode}")
-                
-                imgs = resp.get("images", [])
-                info = extract_infotext(resp.get("info", ""))
-                if imgs: 
-                    save_futures.append(io_executor.submit(save_image, imgs[0], dst, info))
-                pbar.update(1)
-            pbar.close()
+            def render_final(entry):
+                job, item = entry
+                s_idx, i = item.images[0]
+                refine_image(job, s_idx, job.scenes[s_idx], i)
+                final_bar.update(1)
+
+            try:
+                for model_name, group in final_runs:
+                    items = [(job, item) for job in group for item in job.final_items()]
+                    if not items:
+                        continue
+                    if not pool.preload(model_name):
+                        load_failed = True
+                        break
+                    spread_model(model_name, len(items))
+                    run_work_items(items, render_final, scene_workers)
+            finally:
+                final_bar.close()
+            if load_failed:
+                finish_pending_saves()
+                return 1
 
     EvaText.print_system("SAVING BATTLE DATA...")
     finish_pending_saves()
+    link_stats = pool.connection_stats()
+    model_loads = pool.model_loads
+    pool.close()
+    spi = tuner.seconds_per_image(draft_key)
+    tuner_line = f"DRAFT BATCH  : {tuner.best(draft_key)} ({spi:.1f}s/img)" if spi else "DRAFT BATCH  : not measured"
+    vram_peak = vram.peak if vram else None
+    vram_line = (f"VRAM PEAK    : {vram_peak['used_gb']:.1f} / {vram_peak['total_gb']:.1f} GB [{vram_peak['source']}]"
+                 if vram_peak else "VRAM PEAK    : not sampled")
+    cache_line = "RENDER CACHE : off"
+    if render_cache:
+        cache_stats = render_cache.stats()
+        cache_line = (f"RENDER CACHE : {cache_stats['hits']} hits / {cache_stats['misses']} misses / "
+                      f"{cache_stats['bypassed']} random-seed")
+        render_cache.close()
+    report_lines = [cache_line, tuner_line, vram_line]
+    if tag_cache:
+        tag_stats = tag_cache.stats()
+        tag_cache.close()
+        if input_images:
+            report_lines[1:] = [f"TAG CACHE    : {tag_stats['hits']} cached / {tag_stats['misses']} interrogated"]
     elapsed = time.time() - start_time
     m, s = divmod(elapsed, 60)
     
     print("")
+    if len(jobs) > 1 and not input_images:
+        # One line per story; each keeps its own folder and manifest.json.
+        EvaText.box_msg([job.summary_line() for job in jobs], color=EvaText.BLUE, title="STORY REPORT")
     EvaText.box_msg([
         f"ELAPSED TIME : {int(m)}m {int(s)}s",
         f"OUTPUT DIR   : {project_root}",
+        f"HTTP LINKS   : {link_stats['connections_opened']} opened / {link_stats['connections_reused']} reused",
+        f"MODEL LOADS  : {model_loads}",
+        *report_lines,
         "STATUS       : MISSION COMPLETED"
     ], color=EvaText.BLUE, title="MISSION REPORT")
     
     print("\n" + EvaText.GREEN + "(｀・ω・´)ゞ OMEDETOU! (Congratulations!)" + EvaText.ENDC)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Render the story in data/story.json, or remix the images in inputs/.")
+    parser.add_argument("stories", nargs="*", metavar="STORY",
+                        help="story files or folders of them to render as one batch; each model is loaded "
+                             "once per phase for all of them (default: data/story.json)")
+    parser.add_argument("--headless", action="store_true", default=None,
+                        help="plain line-per-event output without delays or spinners, for cron and CI "
+                             "(same as PROJECT_ERO_HEADLESS=1)")
+    args = parser.parse_args()
+    raise SystemExit(main(headless=args.headless, story_paths=args.stories))
@@ -0,0 +1,85 @@
+import json
+import unittest
+
+import httpx
+
+from core.async_client import AsyncSDClient
+
+
+def make_client(handler, **kwargs):
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return AsyncSDClient("http://webui.invalid", http_client=http_client, **kwargs)
+
+
+class AsyncSDClientTests(unittest.IsolatedAsyncioTestCase):
+    async def test_http_errors_stop_after_configured_attempts(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(500, text="bad request")
+
+        async with make_client(handler, max_retries=2, retry_delay=0) as client:
+            with self.assertRaisesRegex(RuntimeError, "after 2 attempts"):
+                await client.txt2img("prompt")
+
+        self.assertEqual(len(calls), 2)
+
+    async def test_read_timeout_is_not_retried(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            raise httpx.ReadTimeout("slow", request=request)
+
+        async with make_client(handler, max_retries=3, retry_delay=0) as client:
+            with self.assertRaisesRegex(RuntimeError, "may still be running"):
+                await client.img2img("image", "prompt")
+
+        self.assertEqual(len(calls), 1)
+
+    async def test_payload_matches_sync_client(self):
+        seen = {}
+
+        def handler(request):
+            if request.url.path == "/controlnet/model_list":
+                return httpx.Response(200, json={"model_list": ["xinsir-openpose [abc]"]})
+            seen["path"] = request.url.path
+            seen["payload"] = json.loads(request.content)
+            return httpx.Response(200, json={"images": ["img"], "info": ""})
+
+        async with make_client(handler) as client:
+            resp = await client.txt2img("prompt", controlnet_name="xinsir", controlnet_img="pose-image", steps=20)
+
+        self.assertEqual(resp["images"], ["img"])
+        self.assertEqual(seen["path"], "/sdapi/v1/txt2img")
+        self.assertEqual(seen["payload"]["steps"], 20)
+        cn_args = seen["payload"]["alwayson_scripts"]["ControlNet"]["args"][0]
+        self.assertEqual(cn_args["model"], "xinsir-openpose [abc]")
+        self.assertEqual(cn_args["image"], "pose-image")
+
+    async def test_set_model_polls_until_checkpoint_loaded(self):
+        state = {"checkpoint": "old.safetensors [1]"}
+
+        def handler(request):
+            if request.method == "POST":
+                state["checkpoint"] = json.loads(request.content).get("sd_model_checkpoint", state["checkpoint"])
+                return httpx.Response(200, json=None)
+            return httpx.Response(200, json={"sd_model_checkpoint": state["checkpoint"]})
+
+        async with make_client(handler, poll_interval=0) as client:
+            self.assertTrue(await client.set_model("new.safetensors"))
+            self.assertEqual((await client.get_options())["sd_model_checkpoint"], "new.safetensors")
+
+    async def test_offline_backend_reports_disconnected(self):
+        def handler(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        async with make_client(handler) as client:
+            self.assertFalse(await client.check_connection())
+            self.assertFalse(await client.interrupt())
+            self.assertEqual(await client.interrogate("image"), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
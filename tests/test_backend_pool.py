@@ -0,0 +1,132 @@
+import threading
+import unittest
+from functools import partial
+from unittest.mock import patch
+
+import requests
+
+from core.backend_pool import BackendPool
+from core.client import SDClient
+from tools.fake_webui import FakeWebUI
+
+
+MODEL_A = "model_a.safetensors [aaaa]"
+MODEL_B = "model_b.safetensors [bbbb]"
+MODELS = (MODEL_A, MODEL_B)
+
+
+def fast_client(url):
+    return SDClient(url, max_retries=1, retry_delay=0, model_timeout=2, poll_interval=0.01)
+
+
+class BackendPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.fake_a = FakeWebUI(models=MODELS, loaded_model=MODEL_A).start()
+        self.fake_b = FakeWebUI(models=MODELS, loaded_model=MODEL_B).start()
+        self.pool = BackendPool([self.fake_a.url, self.fake_b.url], client_factory=fast_client)
+
+    def tearDown(self):
+        self.pool.close()
+        self.fake_a.stop()
+        self.fake_b.stop()
+
+    def test_routes_to_backend_already_holding_model(self):
+        self.pool.txt2img("model_b.safetensors", "prompt", width=8, height=8)
+        self.pool.txt2img("model_a.safetensors", "prompt", width=8, height=8)
+
+        self.assertEqual([g["model"] for g in self.fake_a.state.generations], [MODEL_A])
+        self.assertEqual([g["model"] for g in self.fake_b.state.generations], [MODEL_B])
+        self.assertEqual(self.fake_a.state.model_loads + self.fake_b.state.model_loads, 0)
+
+    def test_busy_backend_is_not_switched_under_running_request(self):
+        with self.pool.lease(MODEL_A) as client:
+            self.assertEqual(client.base_url, self.fake_a.url)
+            # A keeps MODEL_A for the running request, so the idle B switches instead.
+            with self.pool.lease(MODEL_A) as second:
+                self.assertEqual(second.base_url, self.fake_a.url)
+            with self.pool.lease("model_c.safetensors") as third:
+                self.assertEqual(third.base_url, self.fake_b.url)
+
+        self.assertEqual(self.fake_b.state.loaded_model, "model_c.safetensors")
+        self.assertEqual(self.fake_a.state.model_loads, 0)
+
+    def test_least_busy_holder_wins_when_model_is_everywhere(self):
+        self.fake_b.state.loaded_model = MODEL_A
+        self.pool.refresh()
+
+        with self.pool.lease(MODEL_A) as first:
+            with self.pool.lease(MODEL_A) as second:
+                self.assertNotEqual(first.base_url, second.base_url)
+
+    def test_unwrapped_transport_error_marks_dead_backend_unhealthy(self):
+        self.pool.refresh()
+        dead = self.pool.backends[0].client
+        with patch.object(dead, "check_connection", return_value=False), \
+             self.assertRaises(requests.exceptions.ConnectionError):
+            with self.pool.lease(MODEL_A) as client:
+                self.assertIs(client, dead)
+                raise requests.exceptions.ConnectionError("connection reset")
+
+        self.assertEqual([b["healthy"] for b in self.pool.status()], [False, True])
+
+    def test_waits_for_backend_instead_of_switching_busy_one(self):
+        pool = BackendPool([self.fake_a.url], client_factory=fast_client)
+        order = []
+
+        def draft():
+            with pool.lease(MODEL_B):
+                order.append("switched")
+
+        with pool.lease(MODEL_A):
+            waiter = threading.Thread(target=draft)
+            waiter.start()
+            waiter.join(0.2)
+            self.assertTrue(waiter.is_alive())
+            order.append("released")
+        waiter.join(2)
+
+        self.assertEqual(order, ["released", "switched"])
+        pool.close()
+
+    def test_unreachable_backend_is_skipped(self):
+        self.fake_b.stop()
+        self.pool.refresh()
+
+        self.pool.txt2img(MODEL_B, "prompt", width=8, height=8)
+
+        self.assertFalse(self.pool.status()[1]["healthy"])
+        self.assertEqual(self.fake_a.state.generations[0]["model"], MODEL_B)
+        self.fake_b = FakeWebUI(models=MODELS)
+        self.fake_b.start()
+
+    def test_slots_cap_concurrent_leases_per_backend(self):
+        self.fake_b.state.loaded_model = MODEL_A
+        pool = BackendPool([self.fake_a.url, self.fake_b.url], client_factory=fast_client, slots=1)
+        pool.refresh()
+
+        with pool.lease(MODEL_A) as first, pool.lease(MODEL_A) as second:
+            self.assertNotEqual(first.base_url, second.base_url)
+            with self.assertRaises(TimeoutError):
+                with pool.lease(MODEL_A, timeout=0.1):
+                    pass
+        pool.close()
+
+    def test_preload_skips_excluded_backend(self):
+        self.pool.refresh()
+        self.assertTrue(self.pool.preload("model_c.safetensors", exclude=self.pool.holders(MODEL_A)))
+
+        self.assertEqual(self.fake_b.state.loaded_model, "model_c.safetensors")
+        self.assertEqual(self.fake_a.state.model_loads, 0)
+        # Excluding every backend fails fast instead of waiting forever.
+        self.assertFalse(self.pool.preload(MODEL_A, exclude=[self.fake_a.url, self.fake_b.url]))
+
+    def test_no_healthy_backend_raises(self):
+        pool = BackendPool(["http://127.0.0.1:9"], client_factory=partial(SDClient, max_retries=1))
+
+        with self.assertRaisesRegex(RuntimeError, "No healthy"):
+            pool.txt2img(MODEL_A, "prompt")
+        pool.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
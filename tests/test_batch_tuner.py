@@ -0,0 +1,76 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from core.batch_tuner import BatchTuner, tuning_key
+
+KEY = tuning_key("model.safetensors [abcd]", 832, 1216)
+
+
+class BatchTunerTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "tuning.json"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_requests(self, tuner, seconds_for_batch, requests=10):
+        sizes = []
+        for _ in range(requests):
+            batch = tuner.suggest(KEY)
+            sizes.append(batch)
+            tuner.record(KEY, batch, seconds_for_batch(batch))
+        return sizes
+
+    def test_grows_while_throughput_improves_then_settles(self):
+        tuner = BatchTuner(self.path, max_batch=8, min_gain=0.05)
+
+        # 10s overhead per request + 5s per image: 5 -> 6 saves under 5% per image.
+        sizes = self.run_requests(tuner, lambda b: 10 + 5 * b)
+
+        self.assertEqual(sizes[:6], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(tuner.best(KEY), 5)
+        self.assertEqual(set(sizes[6:]), {5})
+
+    def test_stops_at_max_batch(self):
+        tuner = BatchTuner(self.path, max_batch=3)
+
+        self.assertEqual(self.run_requests(tuner, lambda b: 10 + b, requests=5), [1, 2, 3, 3, 3])
+
+    def test_failure_caps_the_configuration(self):
+        tuner = BatchTuner(self.path, max_batch=8)
+        self.run_requests(tuner, lambda b: 10 + b, requests=3)
+
+        self.assertEqual(tuner.record_failure(KEY, 3), 2)
+        self.assertEqual(tuner.limit(KEY), 2)
+        self.assertEqual(self.run_requests(tuner, lambda b: 10 + b, requests=3), [2, 2, 2])
+
+    def test_batch_that_fills_vram_is_not_grown(self):
+        tuner = BatchTuner(self.path, max_batch=8, vram_headroom=0.9)
+        tuner.record(KEY, 1, 10)
+        tuner.record(KEY, 2, 12, vram_fraction=0.95)
+
+        self.assertEqual(tuner.limit(KEY), 2)
+        self.assertEqual(tuner.suggest(KEY), 2)
+
+    def test_learned_sizes_persist(self):
+        tuner = BatchTuner(self.path, max_batch=8)
+        self.run_requests(tuner, lambda b: 10 + b, requests=4)
+        tuner.record_failure(KEY, 4)
+        tuner.save()
+
+        reloaded = BatchTuner(self.path, max_batch=8)
+
+        self.assertEqual(reloaded.best(KEY), 3)
+        self.assertEqual(reloaded.suggest(KEY), 3)
+        self.assertEqual(reloaded.best(tuning_key("model.safetensors", 1024, 1024)), 1)
+
+    def test_key_separates_resolution_and_extensions(self):
+        self.assertNotEqual(KEY, tuning_key("model.safetensors", 1024, 1024))
+        self.assertNotEqual(KEY, tuning_key("model.safetensors", 832, 1216, ["controlnet"]))
+        self.assertEqual(tuning_key("m", 1, 1, ["controlnet", "adetailer"]), tuning_key("m", 1, 1, ["adetailer", "controlnet", None]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import unittest
+
+from webui.change_feed import ChangeFeed
+
+
+class ChangeFeedTests(unittest.TestCase):
+    def test_delta_lists_only_jobs_changed_after_since(self):
+        feed = ChangeFeed(start_seq=0)
+        for job_id in ("a", "b", "c"):
+            feed.touch(job_id)
+        seen = feed.seq
+        feed.touch("a")
+        feed.delete("b")
+
+        delta = feed.changes_since(seen)
+
+        self.assertFalse(delta["reset"])
+        self.assertEqual(delta["changed"], ["a"])
+        self.assertEqual(delta["deleted"], ["b"])
+        self.assertFalse(delta["queue_changed"])
+        self.assertEqual(feed.changes_since(delta["seq"])["changed"], [])
+
+    def test_queue_changes_are_flagged(self):
+        feed = ChangeFeed(start_seq=0)
+        feed.touch("a")
+        seen = feed.seq
+        feed.touch_queue()
+
+        self.assertTrue(feed.changes_since(seen)["queue_changed"])
+        self.assertFalse(feed.changes_since(feed.seq)["queue_changed"])
+
+    def test_fresh_client_gets_full_list(self):
+        feed = ChangeFeed(start_seq=100)
+        feed.touch("a")
+        feed.touch("b")
+        feed.delete("a")
+
+        delta = feed.changes_since(0)
+
+        self.assertTrue(delta["reset"])
+        self.assertEqual(delta["changed"], ["b"])
+        self.assertEqual(delta["deleted"], [])
+
+    def test_forgotten_tombstones_force_reset(self):
+        feed = ChangeFeed(max_tombstones=2, start_seq=0)
+        for job_id in "abcd":
+            feed.touch(job_id)
+        seen = feed.seq
+        for job_id in "abc":
+            feed.delete(job_id)
+
+        self.assertTrue(feed.changes_since(seen)["reset"])
+        self.assertEqual(feed.changes_since(feed.seq - 2)["deleted"], ["b", "c"])
+
+    def test_numbers_from_previous_process_reset(self):
+        old = ChangeFeed(start_seq=1000)
+        old.touch("a")
+        restarted = ChangeFeed(start_seq=5000)
+        restarted.touch("a")
+
+        self.assertTrue(restarted.changes_since(old.seq)["reset"])
+        self.assertTrue(restarted.changes_since(restarted.seq + 10)["reset"])
+
+    def test_listener_wakes_on_change_from_another_thread(self):
+        feed = ChangeFeed(start_seq=0)
+
+        async def wait_for_change():
+            listener = feed.subscribe()
+            threading.Timer(0.05, feed.touch, args=("a",)).start()
+            await asyncio.wait_for(listener[1].wait(), timeout=2)
+            feed.unsubscribe(listener)
+
+        asyncio.run(wait_for_change())
+        self.assertEqual(feed.changes_since(0)["changed"], ["a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,17 +1,20 @@
 import base64
 import json
+import tempfile
+import threading
 import unittest
 from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from io import BytesIO
 from pathlib import Path
 from unittest.mock import Mock, patch
 
-from PIL import Image
+from PIL import Image, PngImagePlugin
 from requests.exceptions import ReadTimeout
 
-from core.client import SDClient
-from core.utils import save_image
-from main import get_next_draft_batch, wait_for_futures
+from core.client import SDClient, WebUIServerError
+from core.utils import inject_png_text, save_image
+from main import wait_for_futures
 
 
 class SDClientTests(unittest.TestCase):
@@ -19,17 +22,29 @@ class SDClientTests(unittest.TestCase):
         response = Mock(status_code=500, text="bad request")
         client = SDClient(max_retries=2, retry_delay=0)
 
-        with patch("core.client.requests.post", return_value=response) as post:
+        with patch.object(client.session, "post", return_value=response) as post:
             with patch("core.client.OtakuSpinner", side_effect=lambda *_: nullcontext()):
                 with self.assertRaisesRegex(RuntimeError, "after 2 attempts"):
                     client._post_with_retry("http://example.invalid", {})
 
         self.assertEqual(post.call_count, 2)
 
+    def test_out_of_memory_is_raised_without_retrying(self):
+        response = Mock(status_code=500, text='{"error": "OutOfMemoryError", "errors": "CUDA out of memory."}')
+        client = SDClient(max_retries=3, retry_delay=0)
+
+        with patch.object(client.session, "post", return_value=response) as post:
+            with self.assertRaises(WebUIServerError) as raised:
+                client._post_with_retry("http://example.invalid", {})
+
+        self.assertTrue(raised.exception.out_of_memory)
+        self.assertEqual(raised.exception.status_code, 500)
+        self.assertEqual(post.call_count, 1)
+
     def test_read_timeout_is_not_retried(self):
         client = SDClient(max_retries=3, retry_delay=0)
 
-        with patch("core.client.requests.post", side_effect=ReadTimeout) as post:
+        with patch.object(client.session, "post", side_effect=ReadTimeout) as post:
             with self.assertRaisesRegex(RuntimeError, "may still be running"):
                 client._post_with_retry("http://example.invalid", {})
 
@@ -38,7 +53,7 @@ class SDClientTests(unittest.TestCase):
     def test_connection_check_requires_success_response(self):
         client = SDClient()
 
-        with patch("core.client.requests.get", return_value=Mock(ok=False)):
+        with patch.object(client.session, "get", return_value=Mock(ok=False)):
             self.assertFalse(client.check_connection())
 
     def test_missing_controlnet_model_stops_before_generation(self):
@@ -69,10 +84,61 @@ class SDClientTests(unittest.TestCase):
         client = SDClient(model_timeout=0)
 
         with patch.object(client, "get_options", return_value={"sd_model_checkpoint": "old"}):
-            with patch("core.client.requests.post", return_value=response):
+            with patch.object(client.session, "post", return_value=response):
                 self.assertFalse(client.set_model("new"))
 
 
+class _ProgressHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps({"progress": 0.0}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ConnectionPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _ProgressHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive_session_reuses_one_connection(self):
+        with SDClient(self.base_url) as client:
+            for _ in range(3):
+                self.assertTrue(client.check_connection())
+            stats = client.connection_stats()
+
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["connections_opened"], 1)
+        self.assertEqual(stats["connections_reused"], 2)
+
+    def test_keep_alive_can_be_disabled(self):
+        with SDClient(self.base_url, pool_settings={"keep_alive": False}) as client:
+            for _ in range(2):
+                self.assertTrue(client.check_connection())
+            stats = client.connection_stats()
+
+        self.assertEqual(stats["connections_opened"], 2)
+
+    def test_per_endpoint_timeouts_override_defaults(self):
+        client = SDClient(request_timeout=90, timeouts={"progress": 1})
+
+        self.assertEqual(client._timeout("progress"), 1)
+        self.assertEqual(client._timeout("options"), 10)
+        self.assertEqual(client._timeout("generate"), 90)
+
+
 class SaveSynchronizationTests(unittest.TestCase):
     def test_wait_for_futures_observes_each_save(self):
         first = Mock()
@@ -83,12 +149,6 @@ class SaveSynchronizationTests(unittest.TestCase):
         first.result.assert_called_once_with()
         second.result.assert_called_once_with()
 
-    def test_resume_generates_missing_draft_before_existing_file(self):
-        draft_root = Path("draft")
-        with patch.object(Path, "exists", autospec=True, side_effect=lambda path: path.name == "scene_002.png"):
-            self.assertEqual(get_next_draft_batch(draft_root, "scene", 0, 3, 3), 1)
-            self.assertEqual(get_next_draft_batch(draft_root, "scene", 1, 3, 3), 0)
-
     def test_saved_png_keeps_generation_parameters(self):
         source = BytesIO()
         Image.new("RGB", (1, 1), color="white").save(source, format="PNG")
@@ -103,6 +163,36 @@ class SaveSynchronizationTests(unittest.TestCase):
         finally:
             output_path.unlink(missing_ok=True)
 
+    def test_png_metadata_is_spliced_without_reencoding(self):
+        source = BytesIO()
+        pnginfo = PngImagePlugin.PngInfo()
+        pnginfo.add_text("parameters", "old infotext")
+        Image.new("RGB", (4, 4), color="red").save(source, format="PNG", pnginfo=pnginfo)
+        original = source.getvalue()
+
+        spliced = inject_png_text(original, "Steps: 20, 女の子")
+
+        # Pixel data is copied byte for byte; only the text chunk changes.
+        self.assertIn(original[original.index(b"IDAT") - 4:], spliced)
+        with Image.open(BytesIO(spliced)) as image:
+            self.assertEqual(image.info["parameters"], "Steps: 20, 女の子")
+            self.assertEqual(image.getpixel((0, 0)), (255, 0, 0))
+        with Image.open(BytesIO(inject_png_text(original))) as image:
+            self.assertNotIn("parameters", image.info)
+
+    def test_non_png_payload_falls_back_to_reencode(self):
+        source = BytesIO()
+        Image.new("RGB", (2, 2), color="white").save(source, format="JPEG")
+        self.assertIsNone(inject_png_text(source.getvalue(), "Steps: 20"))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = Path(tmp) / "from-jpeg.png"
+            save_image(base64.b64encode(source.getvalue()).decode(), output_path, "Steps: 20")
+
+            with Image.open(output_path) as image:
+                self.assertEqual(image.format, "PNG")
+                self.assertEqual(image.info["parameters"], "Steps: 20")
+
     def test_save_failure_is_not_silently_ignored(self):
         output_path = Path.cwd() / "outputs" / "invalid-image.png"
 
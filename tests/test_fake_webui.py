@@ -0,0 +1,89 @@
+import contextlib
+import io
+import threading
+import time
+import unittest
+
+import requests
+
+from core.client import SDClient, WebUIServerError
+from tools.fake_webui import AD_MODELS, FakeWebUI
+
+MODEL = "model_a.safetensors [aaaa]"
+
+
+def fast_client(url):
+    return SDClient(url, max_retries=2, retry_delay=0, model_timeout=2, poll_interval=0.01)
+
+
+class FakeWebUITests(unittest.TestCase):
+    def test_extension_endpoints(self):
+        with FakeWebUI(models=(MODEL,)) as fake:
+            self.assertEqual(requests.get(f"{fake.url}/adetailer/v1/ad_model", timeout=5).json(), {"ad_model": AD_MODELS})
+            client = fast_client(fake.url)
+            self.assertTrue(any("openpose" in m for m in client.get_controlnet_models()))
+            self.assertEqual(client.get_sd_models()[0]["title"], MODEL)
+            client.close()
+
+    def test_generation_time_follows_steps_and_batch(self):
+        with FakeWebUI(models=(MODEL,), step_delay=0.01) as fake:
+            client = fast_client(fake.url)
+            started = time.monotonic()
+            response = client.txt2img("p", steps=10, batch_size=2, width=32, height=32)
+            elapsed = time.monotonic() - started
+            client.close()
+            self.assertEqual(len(response["images"]), 2)
+            self.assertGreaterEqual(elapsed, 0.2)
+            stats = fake.state.stats()
+            self.assertEqual((stats["generations"], stats["images"]), (1, 2))
+            self.assertGreaterEqual(stats["busy_seconds"], 0.2)
+            self.assertLessEqual(stats["busy_seconds"], elapsed)
+
+    def test_progress_moves_during_generation(self):
+        with FakeWebUI(models=(MODEL,), generate_delay=0.4) as fake:
+            client = fast_client(fake.url)
+            worker = threading.Thread(target=client.txt2img, args=("p",), kwargs={"width": 32, "height": 32})
+            worker.start()
+            time.sleep(0.2)
+            progress = client.get_progress()
+            worker.join()
+            self.assertGreater(progress["progress"], 0.0)
+            self.assertLess(progress["progress"], 1.0)
+            self.assertEqual(client.get_progress()["progress"], 0.0)
+            client.close()
+
+    def test_oversized_batch_runs_out_of_memory(self):
+        with FakeWebUI(models=(MODEL,), oom_batch=2) as fake:
+            client = fast_client(fake.url)
+            with self.assertRaises(WebUIServerError) as caught:
+                client.txt2img("p", batch_size=3, width=32, height=32)
+            self.assertTrue(caught.exception.out_of_memory)
+            self.assertEqual(len(client.txt2img("p", batch_size=2, width=32, height=32)["images"]), 2)
+            client.close()
+            # Out of memory is not retried; the caller shrinks the batch.
+            self.assertEqual(fake.state.failures, 1)
+
+    def test_injected_failures_are_retried(self):
+        with FakeWebUI(models=(MODEL,), fail_rate=1.0) as fake:
+            client = fast_client(fake.url)
+            with self.assertRaises(WebUIServerError) as caught, contextlib.redirect_stdout(io.StringIO()):
+                client.txt2img("p", width=32, height=32)
+            client.close()
+            self.assertEqual(caught.exception.status_code, 500)
+            self.assertEqual(fake.state.failures, 2)
+            self.assertEqual(fake.state.stats()["images"], 0)
+
+    def test_model_switch_does_not_wait_a_poll_interval(self):
+        models = (MODEL, "model_b.safetensors [bbbb]")
+        with FakeWebUI(models=models, model_load_delay=0.1) as fake:
+            client = SDClient(fake.url, max_retries=1, retry_delay=0, model_timeout=30, poll_interval=5)
+            started = time.monotonic()
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertTrue(client.set_model("model_b.safetensors"))
+            client.close()
+            self.assertLess(time.monotonic() - started, 2.0)
+            self.assertEqual(fake.state.model_loads, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import contextlib
+import io
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import main
+from core.client import SDClient
+from core.story_scheduler import ThroughputBar
+from core.utils import EvaText, LineProgress, OtakuSpinner, headless_requested, progress_bar
+
+
+def no_sleep(seconds):
+    raise AssertionError(f"headless output slept for {seconds}s")
+
+
+class HeadlessConsoleTests(unittest.TestCase):
+    def setUp(self):
+        EvaText.set_headless(True)
+        self.addCleanup(EvaText.set_headless, False)
+
+    def test_env_switch(self):
+        self.assertTrue(headless_requested({"PROJECT_ERO_HEADLESS": "1"}))
+        self.assertTrue(headless_requested({"PROJECT_ERO_HEADLESS": "yes"}))
+        for value in ("", "0", "false", "off"):
+            self.assertFalse(headless_requested({"PROJECT_ERO_HEADLESS": value}))
+        self.assertFalse(headless_requested({}))
+
+    def test_plain_lines_without_delays_or_colours(self):
+        with patch("core.utils.time.sleep", no_sleep), contextlib.redirect_stdout(io.StringIO()) as out:
+            EvaText.print_system("BOOT")
+            EvaText.slow_print(">> slow", delay=1.0)
+            EvaText.box_msg(["A : 1", "B : 2"], color=EvaText.GREEN, title="STATUS REPORT")
+            EvaText.print_heavy_warning("SYNC LOST")
+            EvaText.print_phase("PHASE 1")
+            print(f"{EvaText.FAIL}failed{EvaText.ENDC}")
+        self.assertEqual(out.getvalue().splitlines(), [
+            "[SYSTEM] BOOT", ">> slow", "[STATUS_REPORT] A : 1", "[STATUS_REPORT] B : 2",
+            "[WARNING] SYNC LOST", "[PHASE] PHASE 1", "failed",
+        ])
+
+    def test_colours_come_back_when_switched_off(self):
+        EvaText.set_headless(False)
+        self.assertEqual(EvaText.GREEN, "\033[92m")
+        self.assertEqual(EvaText.ENDC, "\033[0m")
+
+    def test_spinner_starts_no_thread(self):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            with OtakuSpinner(" Retrying...") as spinner:
+                self.assertIsNone(spinner.thread)
+        self.assertEqual(out.getvalue(), "Retrying...\n")
+
+    def test_progress_lines_are_throttled(self):
+        bar = progress_bar(10, "DRAFT")
+        self.assertIsInstance(bar, LineProgress)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            for _ in range(10):
+                bar.update(1)
+            bar.close()
+        lines = out.getvalue().splitlines()
+        # First update and the one that completes the phase; the rest fall inside the interval.
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("[PROGRESS] DRAFT 1/10 (10%)"))
+        self.assertTrue(lines[1].startswith("[PROGRESS] DRAFT 10/10 (100%)"))
+
+    def test_throughput_bar_reports_rate(self):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            bar = ThroughputBar(1, "REFINE")
+            bar.update(1)
+            bar.close()
+        self.assertRegex(out.getvalue(), r"^\[PROGRESS\] REFINE 1/1 \(100%\) [\d.]+s \| [\d.]+ img/min\n$")
+
+    def test_main_exits_non_zero_without_story(self):
+        with patch.object(main, "STORY_FILE", Path("does/not/exist.json")), \
+             patch("core.utils.time.sleep", no_sleep), patch("main.time.sleep", no_sleep), \
+             contextlib.redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(main.main(headless=True), 1)
+        self.assertNotIn("\033[", out.getvalue())
+        self.assertIn("[ALERT] CRITICAL ERROR: SCRIPT NOT FOUND", out.getvalue())
+
+
+class InteractiveSpinnerTests(unittest.TestCase):
+    def test_exit_does_not_wait_for_the_next_frame(self):
+        spinner = OtakuSpinner(" Working...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            with spinner:
+                time.sleep(0.05)
+                started = time.monotonic()
+        # The spinner thread sleeps 2s between frames; leaving must not wait that out.
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertIsNone(spinner.thread)
+
+    def test_client_enables_windows_ansi_once_outside_headless(self):
+        EvaText.set_headless(True)
+        self.addCleanup(EvaText.set_headless, False)
+        with patch("core.utils.sys.platform", "win32"), patch("core.utils._ansi_enabled", False), \
+             patch("core.utils.os.system") as system:
+            SDClient("http://127.0.0.1:1").close()
+            system.assert_not_called()
+            EvaText.set_headless(False)
+            SDClient("http://127.0.0.1:1").close()
+            SDClient("http://127.0.0.1:1").close()
+        system.assert_called_once_with('')
+
+
+if __name__ == "__main__":
+    unittest.main()
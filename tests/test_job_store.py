@@ -0,0 +1,221 @@
+import json
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from webui import job_store
+
+from webui.job_history import MAX_RESUMES, RESTART_ERROR
+from webui.job_store import JobStore
+
+
+def make_job(job_id, status="Pending", created_at=1.0, **extra):
+    job = {
+        "id": job_id,
+        "status": status,
+        "phase_text": "",
+        "request": {"model": "model_a", "init_image": None},
+        "created_at": created_at,
+        "image_urls": [],
+        "error": None,
+    }
+    job.update(extra)
+    return job
+
+
+class JobStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.db_path = self.root / "jobs.sqlite3"
+        self.store = JobStore(self.db_path)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def reopen(self):
+        self.store.close()
+        self.store = JobStore(self.db_path)
+        return self.store.load()
+
+    def test_job_and_queue_order_are_written_together(self):
+        self.store.save(make_job("b", created_at=2.0), queue=["b"])
+        self.store.save(make_job("c", created_at=3.0), queue=["c", "b"])
+
+        self.assertEqual(self.store.queued_ids(), ["c", "b"])
+        self.store.save_queue(["b"])
+        self.assertEqual(self.store.queued_ids(), ["b"])
+
+    def test_finished_job_survives_restart(self):
+        self.store.save(make_job("a", "Running", image_urls=["/api/images/a.png"]))
+        self.store.update_status("a", "Completed", phase_text="done")
+
+        jobs, _ = self.reopen()
+
+        self.assertEqual(jobs["a"]["status"], "Completed")
+        self.assertEqual(jobs["a"]["phase_text"], "done")
+        self.assertEqual(jobs["a"]["image_urls"], ["/api/images/a.png"])
+
+    def test_interrupted_jobs_resume_at_the_front_of_the_queue(self):
+        self.store.save(make_job("p", created_at=3.0), queue=["p"])
+        self.store.save(make_job("r", "Pending", created_at=2.0, checkpoint={"outputs": {"0": 42}, "drafts": {}}))
+        self.store.update_status("r", "Running", phase_text="Phase 1")
+
+        jobs, queue = self.reopen()
+
+        self.assertEqual(queue, ["r", "p"])
+        self.assertEqual(jobs["r"]["status"], "Pending")
+        self.assertEqual(jobs["r"]["checkpoint"]["outputs"], {"0": 42})
+        # The normalized state is written back, not recomputed on every start.
+        self.store.close()
+        self.store = JobStore(self.db_path)
+        self.assertEqual(self.store.queued_ids(), ["r", "p"])
+        self.assertEqual(self.store.load()[0]["r"]["resumes"], 1)
+
+    def test_job_that_keeps_interrupting_fails_and_leaves_queue(self):
+        self.store.save(make_job("r", "Running", resumes=MAX_RESUMES))
+        self.store.save(make_job("c", "Canceling"))
+
+        jobs, queue = self.reopen()
+
+        self.assertEqual(queue, [])
+        self.assertEqual(jobs["r"]["status"], "Failed")
+        self.assertEqual(jobs["r"]["error"], RESTART_ERROR)
+        self.assertEqual(jobs["c"]["status"], "Canceled")
+
+    def test_status_update_keeps_existing_error_and_phase(self):
+        self.store.save(make_job("x", "Running", phase_text="Phase 2", error="warn"))
+        self.store.update_status("x", "Failed")
+
+        jobs, _ = self.reopen()
+
+        self.assertEqual((jobs["x"]["phase_text"], jobs["x"]["error"]), ("Phase 2", "warn"))
+
+    def test_deleting_a_job_removes_it_from_queue(self):
+        self.store.save(make_job("a"), queue=["a"])
+        self.store.save(make_job("b"), queue=["a", "b"])
+        self.store.delete("a")
+
+        self.assertEqual(self.store.queued_ids(), ["b"])
+        self.assertEqual(self.store.count(), 1)
+
+    def test_resaving_a_queued_job_keeps_its_queue_entry(self):
+        self.store.save(make_job("a"), queue=["a"])
+        self.store.save(make_job("a", pinned=True))
+
+        self.assertEqual(self.store.queued_ids(), ["a"])
+
+    def test_legacy_json_history_is_migrated_once(self):
+        legacy = self.root / "webui_jobs"
+        legacy.mkdir()
+        for job in (
+            make_job("old1", "Completed", image_urls=["/api/images/old1.png"]),
+            make_job("old2", "Running", request={"model": "m", "init_image": "aGVsbG8="}),
+        ):
+            (legacy / f"{job['id']}.json").write_text(json.dumps(job), encoding="utf-8")
+        (legacy / "broken.json").write_text("{", encoding="utf-8")
+
+        self.assertEqual(self.store.migrate_json_dir(legacy), 2)
+        self.assertEqual(self.store.migrate_json_dir(legacy), 0)
+        jobs, _ = self.store.load()
+
+        self.assertEqual(jobs["old1"]["image_urls"], ["/api/images/old1.png"])
+        self.assertEqual(jobs["old2"]["status"], "Pending")
+        self.assertEqual(jobs["old2"]["request"]["init_image"], "<saved_to_disk>")
+
+    def history_job(self, n, status="Completed", mode="standard", model="model_a", prompt="1girl, smile"):
+        return make_job(f"h{n:03d}", status, created_at=float(n), request={
+            "mode": mode, "model": model, "task_name": f"Task{n % 3}",
+            "global_prompt": "masterpiece", "char_prompt": prompt, "action_prompt": f"pose{n}",
+            "negative_prompt": "lowres",
+        })
+
+    def all_pages(self, **filters):
+        ids, cursor = [], None
+        while True:
+            page, cursor = self.store.history(cursor=cursor, limit=4, **filters)
+            ids += [job["id"] for job in page]
+            if cursor is None:
+                return ids
+
+    def test_history_pages_newest_first_without_gaps_or_repeats(self):
+        for n in range(10):
+            self.store.save(self.history_job(n))
+        # Same created_at: id breaks the tie.
+        self.store.save(make_job("h005b", "Completed", created_at=5.0))
+
+        ids = self.all_pages()
+
+        self.assertEqual(ids, ["h009", "h008", "h007", "h006", "h005b", "h005", "h004", "h003", "h002", "h001", "h000"])
+        page, cursor = self.store.history(limit=11)
+        self.assertEqual(len(page), 11)
+        self.assertIsNone(cursor)
+
+    def test_history_filters(self):
+        for n in range(12):
+            self.store.save(self.history_job(
+                n, status=["Completed", "Failed", "Canceled"][n % 3], mode="remix" if n % 2 else "standard",
+                model="model_b" if n >= 6 else "model_a", prompt="School Uniform, rain" if n in (2, 9) else "smile",
+            ))
+        self.store.save(make_job("live", "Running", created_at=100.0))
+
+        self.assertEqual(self.all_pages(statuses=["Failed", "Canceled"]),
+                         ["h011", "h010", "h008", "h007", "h005", "h004", "h002", "h001"])
+        self.assertEqual(self.all_pages(statuses=["Completed"], mode="remix"), ["h009", "h003"])
+        self.assertEqual(self.all_pages(model="model_b", task_name="Task1"), ["h010", "h007"])
+        self.assertEqual(self.all_pages(created_from=3.0, created_to=6.0), ["h005", "h004", "h003"])
+        self.assertEqual(self.all_pages(prompt="school uniform"), ["h009", "h002"])
+        self.assertEqual(self.all_pages(prompt="pose1"), ["h011", "h010", "h001"])
+        self.assertEqual(self.all_pages(prompt="nowhere"), [])
+
+    def test_rare_prompt_search_falls_back_to_the_index(self):
+        for n in range(30):
+            self.store.save(self.history_job(n, prompt="needle in here" if n == 3 else "hay"))
+
+        with patch.object(job_store, "PROMPT_SCAN_WINDOW", 5):
+            self.assertEqual(self.all_pages(prompt="NEEDLE"), ["h003"])
+            self.assertEqual(self.all_pages(prompt="hay")[:3], ["h029", "h028", "h027"])
+            # Too short for the trigram index.
+            self.assertEqual(self.all_pages(prompt="ne"), ["h003"])
+
+    def test_deleted_and_edited_jobs_leave_the_prompt_index(self):
+        for n in range(3):
+            self.store.save(self.history_job(n, prompt="findme"))
+        self.store.delete("h001")
+        self.store.save(self.history_job(2, prompt="other"))
+
+        with patch.object(job_store, "PROMPT_SCAN_WINDOW", 1):
+            self.assertEqual(self.all_pages(prompt="findme"), ["h000"])
+            self.assertEqual(self.all_pages(prompt="other"), ["h002"])
+
+    def test_bad_cursor_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.store.history(cursor="not-a-cursor")
+
+    def test_database_from_before_the_filter_columns_is_backfilled(self):
+        self.store.close()
+        self.db_path.unlink()
+        for suffix in ("-wal", "-shm"):
+            Path(f"{self.db_path}{suffix}").unlink(missing_ok=True)
+        old = sqlite3.connect(self.db_path)
+        old.executescript(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, phase_text TEXT, error TEXT, "
+            "created_at REAL NOT NULL, data TEXT NOT NULL);"
+        )
+        job = self.history_job(1, mode="remix", prompt="old prompt")
+        old.execute("INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?)",
+                    (job["id"], "Completed", "", None, 1.0, json.dumps(job)))
+        old.commit()
+        old.close()
+
+        self.store = JobStore(self.db_path)
+
+        with patch.object(job_store, "PROMPT_SCAN_WINDOW", 1):
+            self.assertEqual(self.all_pages(mode="remix", prompt="old prompt"), ["h001"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import threading
+import time
+import unittest
+
+from core.pipeline import RefinePipeline
+
+
+class RefinePipelineTests(unittest.TestCase):
+    def test_items_flow_through_in_order(self):
+        seen = []
+
+        with RefinePipeline(seen.append, maxsize=2) as pipe:
+            for i in range(5):
+                pipe.submit(i)
+
+        self.assertEqual(seen, [0, 1, 2, 3, 4])
+        stats = pipe.stats()
+        self.assertEqual(stats["draft"]["items"], 5)
+        self.assertEqual(stats["refine"]["items"], 5)
+
+    def test_refine_overlaps_with_production(self):
+        started = threading.Event()
+
+        def consume(item):
+            started.set()
+
+        pipe = RefinePipeline(consume, maxsize=4).start()
+        pipe.submit("first")
+        # The consumer picks up work before the producer has finished.
+        self.assertTrue(started.wait(1))
+        pipe.submit("second")
+        pipe.close()
+
+    def test_full_queue_blocks_producer(self):
+        release = threading.Event()
+
+        def consume(item):
+            release.wait(1)
+
+        pipe = RefinePipeline(consume, maxsize=1).start()
+        pipe.submit(1)  # taken by the consumer
+        pipe.submit(2)  # fills the queue
+        threading.Timer(0.2, release.set).start()
+        t0 = time.monotonic()
+        pipe.submit(3)
+
+        self.assertGreaterEqual(time.monotonic() - t0, 0.1)
+        stats = pipe.close()
+        self.assertGreater(stats["draft"]["idle_seconds"], 0.1)
+        self.assertEqual(stats["queue"]["maxsize"], 1)
+        self.assertGreaterEqual(stats["queue"]["max_depth"], 1)
+
+    def test_consumer_errors_surface_after_drain(self):
+        seen = []
+
+        def consume(item):
+            if item == 1:
+                raise RuntimeError("refine failed")
+            seen.append(item)
+
+        pipe = RefinePipeline(consume).start()
+        for i in range(3):
+            pipe.submit(i)
+
+        with self.assertRaisesRegex(RuntimeError, "refine failed"):
+            pipe.close()
+        self.assertEqual(seen, [0, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
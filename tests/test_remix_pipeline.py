@@ -0,0 +1,115 @@
+import base64
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from PIL import Image
+
+from core.remix_pipeline import order_by_size, run_remix_pipeline
+
+
+class RemixPipelineTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_image(self, name, size):
+        path = self.root / name
+        Image.new("RGB", size, (200, 100, 50)).save(path)
+        return path
+
+    def test_inputs_are_grouped_by_size_in_first_seen_order(self):
+        paths = [
+            self.make_image("a.png", (64, 96)),
+            self.make_image("b.png", (96, 64)),
+            self.make_image("c.png", (64, 96)),
+            self.make_image("d.png", (96, 64)),
+        ]
+        broken = self.root / "broken.png"
+        broken.write_bytes(b"not an image")
+
+        items, unreadable = order_by_size(paths + [broken])
+
+        self.assertEqual([i.path.name for i in items], ["a.png", "c.png", "b.png", "d.png"])
+        self.assertEqual([p for p, _ in unreadable], [broken])
+        # Only headers were read so far.
+        self.assertTrue(all(i.image_b64 is None for i in items))
+
+    def test_reads_ahead_while_gpu_is_busy(self):
+        items, _ = order_by_size([self.make_image(f"{n}.png", (32, 32)) for n in range(4)])
+        first_render_started = threading.Event()
+        release = threading.Event()
+        loaded_before_release = []
+
+        def render(item):
+            if not first_render_started.is_set():
+                first_render_started.set()
+                release.wait(2)
+            return {"images": [item.image_b64]}
+
+        def watch():
+            first_render_started.wait(2)
+            time.sleep(0.2)
+            loaded_before_release.append(sum(1 for i in items if i.image_b64 is not None))
+            release.set()
+
+        watcher = threading.Thread(target=watch)
+        watcher.start()
+        saved = []
+        stats = run_remix_pipeline(items, render, lambda item, resp: saved.append(item.path.name), prefetch=2)
+        watcher.join()
+
+        # While the first image rendered, the next ones were already read and encoded.
+        self.assertGreaterEqual(loaded_before_release[0], 3)
+        self.assertEqual(sorted(saved), ["0.png", "1.png", "2.png", "3.png"])
+        self.assertEqual((stats["read"]["items"], stats["gpu"]["items"], stats["save"]["items"]), (4, 4, 4))
+        self.assertGreater(stats["gpu"]["busy_seconds"], 0.1)
+        self.assertEqual(stats["queues"]["prefetch"]["maxsize"], 2)
+
+    def test_render_receives_encoded_image_and_failures_do_not_stop_the_run(self):
+        paths = [self.make_image(f"{n}.png", (32, 32)) for n in range(3)]
+        items, _ = order_by_size(paths)
+        done = []
+
+        def render(item):
+            self.assertEqual(base64.b64decode(item.image_b64), item.path.read_bytes())
+            if item.path.name == "1.png":
+                raise RuntimeError("boom")
+            return {"images": ["x"]}
+
+        run_remix_pipeline(
+            items, render, lambda item, resp: None, gpu_workers=2,
+            on_done=lambda item, error: done.append((item.path.name, type(error).__name__ if error else None)),
+        )
+
+        self.assertEqual(sorted(done), [("0.png", None), ("1.png", "RuntimeError"), ("2.png", None)])
+        # Payloads are dropped once an item is finished.
+        self.assertTrue(all(i.image_b64 is None for i in items))
+
+    def test_gpu_workers_render_concurrently(self):
+        items, _ = order_by_size([self.make_image(f"{n}.png", (32, 32)) for n in range(4)])
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def render(item):
+            with lock:
+                active.append(item)
+                peak.append(len(active))
+            time.sleep(0.1)
+            with lock:
+                active.remove(item)
+            return {}
+
+        run_remix_pipeline(items, render, lambda item, resp: None, gpu_workers=2)
+
+        self.assertEqual(max(peak), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
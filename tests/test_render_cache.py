@@ -0,0 +1,126 @@
+import base64
+import tempfile
+import unittest
+from pathlib import Path
+
+from core.client import SDClient
+from core.render_cache import RenderCache, is_cacheable, render_key
+from tools.fake_webui import FakeWebUI, render_png
+
+MODEL_A = "model_a.safetensors [aaaa]"
+MODEL_B = "model_b.safetensors [bbbb]"
+
+
+def response(*seeds):
+    return {"images": [render_png(16, 16, seed) for seed in seeds], "parameters": {"seed": seeds[0]}, "info": "{}"}
+
+
+class RenderCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = RenderCache(self.tmp.name)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_stored_render_comes_back_byte_identical(self):
+        stored = response(1, 2)
+        self.cache.put("k", stored)
+
+        self.assertEqual(self.cache.get("k"), stored)
+        self.assertIsNone(self.cache.get("other"))
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    def test_identical_images_are_stored_once(self):
+        self.cache.put("a", response(7))
+        self.cache.put("b", response(7))
+
+        self.assertEqual(len(list(Path(self.tmp.name, "blobs").rglob("*.png"))), 1)
+        self.assertEqual(self.cache.stats()["entries"], 2)
+
+    def test_least_recently_used_renders_are_evicted_by_size(self):
+        size = len(base64.b64decode(render_png(16, 16, 1)))
+        self.cache.max_bytes = size * 3
+        for key, seed in (("a", 1), ("b", 2), ("c", 3)):
+            self.cache.put(key, response(seed))
+        self.cache.get("a")
+
+        self.cache.put("d", response(4))
+
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.assertLessEqual(self.cache.total_bytes(), self.cache.max_bytes)
+        self.assertEqual(len(list(Path(self.tmp.name, "blobs").rglob("*.png"))), 3)
+
+    def test_missing_blob_is_a_miss(self):
+        self.cache.put("k", response(1))
+        for blob in Path(self.tmp.name, "blobs").rglob("*.png"):
+            blob.unlink()
+
+        self.assertIsNone(self.cache.get("k"))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_key_covers_payload_and_loaded_weights(self):
+        payload = {"prompt": "p", "seed": 5, "cfg_scale": 5.0, "alwayson_scripts": {"ControlNet": {"args": [{"image": "abc"}]}}}
+        key = render_key("txt2img", payload, MODEL_A, "Automatic")
+
+        self.assertEqual(key, render_key("txt2img", dict(payload, cfg_scale=5), MODEL_A, "Automatic"))
+        self.assertNotEqual(key, render_key("img2img", payload, MODEL_A, "Automatic"))
+        self.assertNotEqual(key, render_key("txt2img", payload, MODEL_B, "Automatic"))
+        self.assertNotEqual(key, render_key("txt2img", payload, MODEL_A, "sdxl_vae.safetensors"))
+        changed_cn = {**payload, "alwayson_scripts": {"ControlNet": {"args": [{"image": "abd"}]}}}
+        self.assertNotEqual(key, render_key("txt2img", changed_cn, MODEL_A, "Automatic"))
+
+    def test_only_fixed_seeds_are_cacheable(self):
+        self.assertTrue(is_cacheable({"seed": 0}))
+        self.assertFalse(is_cacheable({"seed": -1}))
+        self.assertFalse(is_cacheable({}))
+        self.assertFalse(is_cacheable({"seed": 3, "subseed": -1, "subseed_strength": 0.2}))
+
+
+class SDClientRenderCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = RenderCache(self.tmp.name)
+        self.fake = FakeWebUI(models=(MODEL_A, MODEL_B)).start()
+        self.client = SDClient(self.fake.url, render_cache=self.cache)
+
+    def tearDown(self):
+        self.client.close()
+        self.fake.stop()
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def generations(self):
+        return len(self.fake.state.generations)
+
+    def test_fixed_seed_repeat_is_served_from_cache(self):
+        first = self.client.txt2img("1girl", seed=42, width=32, height=32, n_iter=2)
+        second = self.client.txt2img("1girl", seed=42, width=32, height=32, n_iter=2)
+
+        self.assertEqual(self.generations(), 1)
+        self.assertEqual(second["images"], first["images"])
+        self.assertEqual(second["info"], first["info"])
+
+    def test_random_seed_bypasses_cache(self):
+        self.client.txt2img("1girl", seed=-1, width=32, height=32)
+        self.client.txt2img("1girl", seed=-1, width=32, height=32)
+
+        self.assertEqual(self.generations(), 2)
+        self.assertEqual(self.cache.stats()["bypassed"], 2)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_switching_checkpoint_misses(self):
+        self.client.txt2img("1girl", seed=42, width=32, height=32)
+        self.assertTrue(self.client.set_model(MODEL_B))
+        self.client.txt2img("1girl", seed=42, width=32, height=32)
+
+        self.assertEqual(self.generations(), 2)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+
+from webui.scheduler import new_scheduler_stats, pick_next, required_model
+
+
+def make_jobs(*specs):
+    jobs = {}
+    for job_id, model, final_model in specs:
+        jobs[job_id] = {"id": job_id, "request": {"model": model, "final_model": final_model}}
+    return jobs
+
+
+def simulate(jobs, queue, mode, loaded="A"):
+    """Run the queue to completion; twophase jobs park after their draft like the worker does."""
+    stats = new_scheduler_stats(mode)
+    order = []
+    while queue:
+        idx = pick_next(queue, jobs, [loaded], stats, mode)
+        job_id = queue.pop(idx)
+        job = jobs[job_id]
+        loaded = required_model(job)
+        order.append((job_id, loaded))
+        if job["request"]["final_model"] and job.get("stage") != "refine":
+            if mode == "affinity":
+                job["stage"] = "refine"
+                job["skips"] = 0
+                queue.insert(idx, job_id)
+            else:
+                loaded = job["request"]["final_model"]
+                order.append((job_id, loaded))
+    return order, stats
+
+
+def count_swaps(order, loaded="A"):
+    swaps = 0
+    for _, model in order:
+        if model != loaded:
+            swaps += 1
+            loaded = model
+    return swaps
+
+
+class SchedulerTests(unittest.TestCase):
+    def test_fifo_runs_queue_head(self):
+        jobs = make_jobs(("j1", "B", None), ("j2", "A", None))
+        stats = new_scheduler_stats("fifo")
+
+        self.assertEqual(pick_next(["j1", "j2"], jobs, ["A"], stats, "fifo"), 0)
+        self.assertEqual(stats["swaps"], 1)
+
+    def test_affinity_prefers_job_for_loaded_checkpoint(self):
+        jobs = make_jobs(("j1", "B", None), ("j2", "A", None))
+        stats = new_scheduler_stats("affinity")
+
+        self.assertEqual(pick_next(["j1", "j2"], jobs, ["A"], stats, "affinity"), 1)
+        self.assertEqual(jobs["j1"]["skips"], 1)
+        self.assertEqual(stats["swaps_avoided"], 1)
+        self.assertEqual(stats["swaps"], 0)
+
+    def test_twophase_drafts_run_before_single_switch_to_final(self):
+        specs = [(f"t{i}", "A", "B") for i in range(3)]
+
+        fifo_order, _ = simulate(make_jobs(*specs), [s[0] for s in specs], "fifo")
+        affinity_order, stats = simulate(make_jobs(*specs), [s[0] for s in specs], "affinity")
+
+        self.assertEqual([m for _, m in affinity_order], ["A", "A", "A", "B", "B", "B"])
+        self.assertEqual(count_swaps(affinity_order), 1)
+        self.assertEqual(count_swaps(fifo_order), 5)
+        self.assertEqual(stats["swaps"], 1)
+        self.assertGreater(stats["swaps_avoided"], 0)
+
+    def test_pinned_job_is_a_barrier(self):
+        jobs = make_jobs(("x", "A", None), ("p", "B", None), ("y", "C", None))
+        jobs["p"]["pinned"] = True
+        stats = new_scheduler_stats("affinity")
+
+        # y holds the loaded model but sits behind the manually placed job.
+        self.assertEqual(pick_next(["x", "p", "y"], jobs, ["C"], stats, "affinity"), 0)
+        self.assertEqual(pick_next(["p", "y"], jobs, ["C"], stats, "affinity"), 0)
+
+    def test_starved_job_runs_despite_model_mismatch(self):
+        jobs = make_jobs(("old", "B", None), *[(f"n{i}", "A", None) for i in range(10)])
+        queue = ["old"] + [f"n{i}" for i in range(10)]
+        stats = new_scheduler_stats("affinity")
+
+        picked = []
+        while "old" in queue:
+            picked.append(queue.pop(pick_next(queue, jobs, ["A"], stats, "affinity", max_skips=3)))
+
+        self.assertEqual(picked, ["n0", "n1", "n2", "old"])
+        self.assertEqual(stats["starvation_overrides"], 1)
+
+    def test_empty_queue_has_no_pick(self):
+        self.assertIsNone(pick_next([], {}, ["A"], new_scheduler_stats("affinity"), "affinity"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+
+import httpx
+
+from core.async_client import AsyncSDClient
+from core.backend_pool import BackendPool
+from webui.status_poller import StatusPoller, estimate_queue_eta
+
+URL_A = "http://gpu-a.invalid"
+URL_B = "http://gpu-b.invalid"
+
+
+class FakeBackends:
+    def __init__(self):
+        self.calls = []
+        self.offline = set()
+        self.busy = set()
+        self.models = {URL_A: "model_a.safetensors [aaaa]", URL_B: "model_b.safetensors [bbbb]"}
+
+    def handler(self, request):
+        base = f"{request.url.scheme}://{request.url.host}"
+        self.calls.append((base, request.url.path))
+        if base in self.offline:
+            raise httpx.ConnectError("offline", request=request)
+        if request.url.path.endswith("/progress"):
+            busy = base in self.busy
+            return httpx.Response(200, json={
+                "progress": 0.5 if busy else 0.0, "eta_relative": 4.0 if busy else 0.0,
+                "state": {"job_count": 1 if busy else 0}, "current_image": "preview" if busy else None,
+            })
+        if request.url.path.endswith("/options"):
+            return httpx.Response(200, json={"sd_model_checkpoint": self.models[base]})
+        return httpx.Response(404)
+
+    def clients(self):
+        http_client = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+        return {url: AsyncSDClient(url, http_client=http_client) for url in (URL_A, URL_B)}
+
+    def count(self, path):
+        return sum(1 for _, p in self.calls if p.endswith(path))
+
+
+class StatusPollerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_reads_are_served_from_one_shared_sample(self):
+        fake = FakeBackends()
+        poller = StatusPoller(fake.clients(), options_every=10)
+
+        for _ in range(5):
+            await poller.latest()
+            poller.progress()
+
+        self.assertEqual(fake.count("/progress"), 2)
+        self.assertEqual(poller.online_urls(), [URL_A, URL_B])
+        self.assertEqual(poller.snapshot()["backends"][URL_B]["loaded_model"], fake.models[URL_B])
+
+    async def test_options_are_sampled_less_often_than_progress(self):
+        fake = FakeBackends()
+        poller = StatusPoller(fake.clients(), options_every=3)
+
+        for _ in range(6):
+            await poller.poll_once()
+
+        self.assertEqual(fake.count("/progress"), 12)
+        self.assertEqual(fake.count("/options"), 4)
+
+    async def test_backend_coming_back_reloads_its_model(self):
+        fake = FakeBackends()
+        fake.offline.add(URL_B)
+        poller = StatusPoller(fake.clients(), options_every=100)
+        await poller.poll_once()
+        self.assertEqual(poller.online_urls(), [URL_A])
+
+        fake.offline.clear()
+        await poller.poll_once()
+
+        self.assertEqual(poller.snapshot()["backends"][URL_B]["loaded_model"], fake.models[URL_B])
+
+    async def test_progress_prefers_busy_backend_and_lists_all(self):
+        fake = FakeBackends()
+        fake.busy.add(URL_B)
+        poller = StatusPoller(fake.clients())
+        await poller.poll_once()
+
+        progress = poller.progress()
+
+        self.assertEqual(progress["url"], URL_B)
+        self.assertEqual(progress["current_image"], "preview")
+        self.assertEqual(progress["backends"][URL_A]["progress"], 0.0)
+        self.assertNotIn("current_image", progress["backends"][URL_B])
+
+    async def test_samples_update_backend_pool(self):
+        fake = FakeBackends()
+        fake.offline.add(URL_B)
+        pool = BackendPool([URL_A, URL_B])
+        poller = StatusPoller(fake.clients(), on_sample=pool.observe)
+
+        await poller.poll_once()
+
+        status = {b["url"]: b for b in pool.status()}
+        self.assertTrue(status[URL_A]["healthy"])
+        self.assertEqual(status[URL_A]["loaded_model"], fake.models[URL_A])
+        self.assertFalse(status[URL_B]["healthy"])
+        self.assertIsNotNone(status[URL_B]["last_checked"])
+        pool.close()
+
+    async def test_queue_eta_spreads_pending_images_over_online_backends(self):
+        fake = FakeBackends()
+        fake.busy.add(URL_A)
+        poller = StatusPoller(fake.clients())
+        snapshot = await poller.poll_once()
+
+        self.assertEqual(estimate_queue_eta(snapshot, pending_images=6, seconds_per_image=10), 34.0)
+        self.assertIsNone(estimate_queue_eta(snapshot, pending_images=6, seconds_per_image=None))
+
+
+if __name__ == "__main__":
+    unittest.main()
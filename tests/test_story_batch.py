@@ -0,0 +1,112 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import main
+from core.batch_tuner import BatchTuner
+from core.client import SDClient
+from core.story_batch import StoryJob, find_story_files, group_by_model
+from tools.fake_webui import FakeWebUI
+
+MODEL_A = "model_a.safetensors"
+MODEL_B = "model_b.safetensors"
+
+
+def story(name, draft_model, final_model, scenes=("Scene_A",), num_images=1):
+    return {
+        "project_name": name,
+        "models": {"draft_model": draft_model, "final_model": final_model, "controlnet_openpose": None},
+        "seed_strategy": {"global_num_images": num_images, "base_seed": 7},
+        "character_header": "1girl",
+        "scenes": [{"scene_id": scene, "prompt": "standing"} for scene in scenes],
+    }
+
+
+def fast_client(url, **kwargs):
+    return SDClient(url, max_retries=1, retry_delay=0, model_timeout=2, poll_interval=0.01, **kwargs)
+
+
+class StoryBatchTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.stories = self.root / "stories"
+        self.stories.mkdir()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, filename, data):
+        path = self.stories / filename
+        path.write_text(json.dumps(data), encoding="utf-8")
+        return path
+
+    def test_find_story_files_expands_folders_and_drops_repeats(self):
+        b = self.write("b.json", story("B", MODEL_A, MODEL_B))
+        a = self.write("a.json", story("A", MODEL_A, MODEL_B))
+        (self.stories / "notes.txt").write_text("not a story")
+        self.assertEqual(find_story_files([self.stories, b]), [a.resolve(), b.resolve()])
+        with self.assertRaises(FileNotFoundError):
+            find_story_files([self.stories / "missing.json"])
+
+    def test_group_by_model_keeps_first_appearance_order(self):
+        jobs = [StoryJob(story(n, d, f), self.root) for n, d, f in
+                (("one", MODEL_B, MODEL_A), ("two", MODEL_A, MODEL_A), ("three", MODEL_B, MODEL_B))]
+        self.assertEqual([(m, [j.name for j in g]) for m, g in group_by_model(jobs, "draft_model")],
+                         [(MODEL_B, ["one", "three"]), (MODEL_A, ["two"])])
+
+    def test_job_plans_its_own_folder(self):
+        job = StoryJob(story("Solo", MODEL_A, MODEL_B, scenes=("S1", "S2"), num_images=2), self.root)
+        job.build_plan()
+        self.assertEqual((job.drafts_todo, job.finals_todo), (4, 4))
+        self.assertEqual(job.draft_path(job.scenes[1], 0), self.root / "Solo" / "draft" / "S2_001.png")
+        # Same prompt in both scenes, consecutive seeds only within a scene.
+        self.assertEqual([item.images for item in job.draft_items(8)], [[(0, 0), (0, 1)], [(1, 0), (1, 1)]])
+        self.assertEqual(len(job.final_items()), 4)
+
+    def run_main(self, **kwargs):
+        with FakeWebUI(models=(MODEL_A + " [a]", MODEL_B + " [b]")) as fake, \
+             patch.dict(os.environ, {"PROJECT_ERO_WEBUI_URLS": fake.url}), \
+             patch.object(main, "SDClient", fast_client), \
+             patch.object(main, "OUTPUT_DIR", self.root / "out"), patch.object(main, "INPUT_DIR", self.root / "in"), \
+             patch.object(main, "build_render_cache", lambda: None), patch.object(main, "build_tag_cache", lambda: None), \
+             patch.object(main, "BatchTuner", lambda: BatchTuner(self.root / "tuning.json")), \
+             contextlib.redirect_stdout(io.StringIO()) as out:
+            result = main.main(headless=True, **kwargs)
+            return result, fake.state.model_loads, out.getvalue()
+
+    def test_batch_loads_each_model_once_per_phase(self):
+        self.write("1.json", story("P1", MODEL_A, MODEL_B))
+        self.write("2.json", story("P2", MODEL_B, MODEL_A))
+        self.write("3.json", story("P3", MODEL_A, MODEL_B))
+        result, loads, output = self.run_main(story_paths=[self.stories])
+        self.assertIsNone(result)
+        # Drafts: A (already loaded), then B. Finals: B (still loaded), then A.
+        self.assertEqual(loads, 2)
+        for name in ("P1", "P2", "P3"):
+            for folder in ("draft", "example"):
+                self.assertTrue((self.root / "out" / name / folder / "Scene_A_001.png").exists())
+            self.assertTrue((self.root / "out" / name / "manifest.json").exists())
+            self.assertIn(f"[STORY_REPORT] {name:<24}: 1/1 drafts | 1/1 finals", output)
+
+    def test_shared_project_name_is_rejected_before_rendering(self):
+        self.write("1.json", story("Same", MODEL_A, MODEL_B))
+        self.write("2.json", story("Same", MODEL_B, MODEL_A))
+        result, loads, output = self.run_main(story_paths=[self.stories])
+        self.assertEqual(result, 1)
+        self.assertIn("share a project_name", output)
+        self.assertFalse((self.root / "out" / "Same" / "draft").exists())
+
+    def test_missing_story_file_fails(self):
+        result, _, output = self.run_main(story_paths=[self.stories / "nope.json"])
+        self.assertEqual(result, 1)
+        self.assertIn("Story file not found", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from core.story_plan import StoryManifest, StoryPlan
+
+DRAFT = {"prompt": "standing", "seed": 100}
+FINAL = {"prompt": "standing, final", "seed": 100}
+
+
+class StoryPlanTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        for folder in ("draft", "example"):
+            (self.root / folder).mkdir()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def render(self, plan, path):
+        path.write_bytes(b"png")
+        plan.record(path)
+
+    def plan(self, scenes):
+        """Plan a draft and a final per scene; scenes maps a file name to its draft/final inputs."""
+        plan = StoryPlan(StoryManifest(self.root))
+        for name, (draft, final) in scenes.items():
+            digest = plan.add(self.root / "draft" / name, draft)
+            plan.add(self.root / "example" / name, {**final, "draft": digest}, depends_on=self.root / "draft" / name)
+        return plan
+
+    def first_run(self, scenes):
+        plan = self.plan(scenes)
+        for name in scenes:
+            self.render(plan, self.root / "draft" / name)
+            self.render(plan, self.root / "example" / name)
+
+    def test_unchanged_outputs_are_reused(self):
+        scenes = {"a_001.png": (DRAFT, FINAL), "b_001.png": (DRAFT, FINAL)}
+        self.first_run(scenes)
+
+        plan = self.plan(scenes)
+
+        self.assertEqual(plan.counts("draft")["reused"], 2)
+        self.assertEqual(plan.counts("example")["reused"], 2)
+        self.assertTrue(plan.is_current(self.root / "example" / "a_001.png"))
+
+    def test_changed_scene_prompt_rerenders_its_draft_and_final_only(self):
+        self.first_run({"a_001.png": (DRAFT, FINAL), "b_001.png": (DRAFT, FINAL)})
+
+        plan = self.plan({"a_001.png": (dict(DRAFT, prompt="sitting"), FINAL), "b_001.png": (DRAFT, FINAL)})
+
+        self.assertTrue(plan.needs_render(self.root / "draft" / "a_001.png"))
+        self.assertTrue(plan.needs_render(self.root / "example" / "a_001.png"))
+        self.assertTrue(plan.is_current(self.root / "draft" / "b_001.png"))
+        self.assertEqual(plan.counts("example"), {"new": 0, "changed": 1, "reused": 1, "adopted": 0})
+
+    def test_final_only_change_keeps_the_draft(self):
+        self.first_run({"a_001.png": (DRAFT, FINAL)})
+
+        plan = self.plan({"a_001.png": (DRAFT, dict(FINAL, cfg=7))})
+
+        self.assertTrue(plan.is_current(self.root / "draft" / "a_001.png"))
+        self.assertTrue(plan.needs_render(self.root / "example" / "a_001.png"))
+
+    def test_deleted_draft_rerenders_its_final(self):
+        self.first_run({"a_001.png": (DRAFT, FINAL)})
+        (self.root / "draft" / "a_001.png").unlink()
+
+        plan = self.plan({"a_001.png": (DRAFT, FINAL)})
+
+        self.assertEqual(plan.counts("draft")["new"], 1)
+        self.assertTrue(plan.needs_render(self.root / "example" / "a_001.png"))
+
+    def test_files_from_before_the_manifest_are_adopted(self):
+        (self.root / "draft" / "a_001.png").write_bytes(b"png")
+        (self.root / "example" / "a_001.png").write_bytes(b"png")
+
+        self.plan({"a_001.png": (DRAFT, FINAL)})
+        plan = self.plan({"a_001.png": (DRAFT, FINAL)})
+
+        self.assertEqual(plan.counts("example")["reused"], 1)
+
+    def test_outputs_no_scene_produces_are_marked_orphans(self):
+        self.first_run({"a_001.png": (DRAFT, FINAL), "a_002.png": (DRAFT, FINAL)})
+
+        orphans = self.plan({"a_001.png": (DRAFT, FINAL)}).find_orphans()
+
+        self.assertEqual([p.relative_to(self.root).as_posix() for p in orphans], ["draft/a_002.png", "example/a_002.png"])
+        manifest = json.loads((self.root / "manifest.json").read_text(encoding="utf-8"))
+        self.assertEqual(manifest["orphans"], ["draft/a_002.png", "example/a_002.png"])
+        self.assertNotIn("draft/a_002.png", manifest["outputs"])
+        self.assertTrue((self.root / "draft" / "a_002.png").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
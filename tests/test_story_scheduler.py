@@ -0,0 +1,73 @@
+import threading
+import time
+import unittest
+
+from core.story_scheduler import pack_batches, run_work_items
+
+
+def batches(items):
+    return [item.images for item in items]
+
+
+class PackBatchesTests(unittest.TestCase):
+    def test_resume_generates_missing_draft_before_existing_file(self):
+        # Image 1 of the scene already exists, so 0 and 2 are not consecutive seeds.
+        items = pack_batches("draft", [("p", 0, 0, 100), ("p", 0, 2, 102)], 3)
+
+        self.assertEqual(batches(items), [[(0, 0)], [(0, 2)]])
+        self.assertEqual([item.seed for item in items], [100, 102])
+
+    def test_fixed_seed_batches_are_consecutive_and_capped(self):
+        candidates = [("p", 0, i, 10 + i) for i in range(5)]
+
+        self.assertEqual([item.size for item in pack_batches("draft", candidates, 2)], [2, 2, 1])
+
+    def test_same_prompt_packs_across_scenes_with_random_seeds(self):
+        candidates = [("a", 0, 0, -1), ("b", 1, 0, -1), ("a", 2, 0, -1), ("a", 2, 1, -1)]
+
+        items = pack_batches("draft", candidates, 4)
+
+        self.assertEqual([item.key for item in items], ["a", "b"])
+        self.assertEqual(batches(items), [[(0, 0), (2, 0), (2, 1)], [(1, 0)]])
+
+    def test_random_and_fixed_seeds_never_share_a_batch(self):
+        items = pack_batches("draft", [("p", 0, 0, -1), ("p", 1, 0, 5)], 4)
+
+        self.assertEqual(len(items), 2)
+
+
+class RunWorkItemsTests(unittest.TestCase):
+    def test_items_run_concurrently(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def run(item):
+            with lock:
+                running.append(item)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(item)
+
+        run_work_items(list(range(6)), run, concurrency=3)
+
+        self.assertEqual(max(peak), 3)
+
+    def test_first_failure_stops_items_not_yet_started(self):
+        started = []
+
+        def run(item):
+            started.append(item)
+            if item == 0:
+                raise RuntimeError("draft failed")
+            time.sleep(0.05)
+
+        with self.assertRaisesRegex(RuntimeError, "draft failed"):
+            run_work_items(list(range(20)), run, concurrency=2)
+
+        self.assertLess(len(started), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
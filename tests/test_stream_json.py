@@ -0,0 +1,43 @@
+import json
+import unittest
+
+from core.stream_json import ImageResponseDecoder, decode_image_response
+
+
+def pieces(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class ImageResponseDecoderTests(unittest.TestCase):
+    def test_matches_json_loads_for_any_chunking(self):
+        response = {
+            "images": ["iVBORw0KGgo=", 'with "quote" and \\/ escapes'],
+            "parameters": {"images": ["nested stays"], "n_iter": 2, "cfg": [1.5, None, True]},
+            "info": json.dumps({"infotexts": ["a, b\nSeed: 1"]}),
+        }
+        for indent in (None, 2):
+            body = json.dumps(response, indent=indent).encode()
+            for size in (1, 3, 7, len(body)):
+                self.assertEqual(decode_image_response(pieces(body, size)), response)
+
+    def test_images_are_cut_out_as_they_complete(self):
+        decoder = ImageResponseDecoder()
+        decoder.feed(b'{"images": ["aaaa", "bb')
+        self.assertEqual(decoder.images, ["aaaa"])
+        decoder.feed(b'bb"], "info": "x"}')
+
+        self.assertEqual(decoder.result(), {"images": ["aaaa", "bbbb"], "info": "x"})
+        # Only the small non-image part of the body is buffered.
+        self.assertEqual(bytes(decoder._rest), b'{"images":[],"info":"x"}')
+
+    def test_other_bodies_pass_through(self):
+        for response in ({"detail": "Not Found"}, {"images": None}, [1, "a"], "text", None):
+            self.assertEqual(decode_image_response([json.dumps(response).encode()]), response)
+
+    def test_truncated_body_is_an_error(self):
+        with self.assertRaises(ValueError):
+            decode_image_response([b'{"images": ["aaa'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import base64
+import tempfile
+import unittest
+from functools import partial
+from pathlib import Path
+
+from core.backend_pool import BackendPool
+from core.client import SDClient
+from core.tag_cache import TagCache
+from tools.fake_webui import FakeWebUI, render_png
+from tools.pretag_inputs import pretag
+
+INTERROGATE = "/sdapi/v1/interrogate"
+
+
+class TagCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = TagCache(Path(self.tmp.name) / "tags.sqlite3")
+        self.fake = FakeWebUI().start()
+
+    def tearDown(self):
+        self.fake.stop()
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def interrogations(self):
+        return self.fake.state.requests.get(INTERROGATE, 0)
+
+    def test_same_image_is_interrogated_once_per_model(self):
+        image = render_png(32, 32, 1)
+        with SDClient(self.fake.url, tag_cache=self.cache) as client:
+            first = client.interrogate(image)
+            second = client.interrogate(image)
+            client.interrogate(image, model="clip")
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.interrogations(), 2)
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 2, "entries": 2})
+
+    def test_failed_interrogation_is_not_cached(self):
+        image = render_png(32, 32, 1)
+        with SDClient("http://127.0.0.1:9", tag_cache=self.cache) as client:
+            self.assertEqual(client.interrogate(image), "")
+
+        self.assertFalse(self.cache.contains(image, "deepdanbooru"))
+
+    def test_pretag_fills_cache_and_skips_known_images(self):
+        inputs = Path(self.tmp.name) / "inputs"
+        inputs.mkdir()
+        for seed in range(3):
+            (inputs / f"{seed}.png").write_bytes(base64.b64decode(render_png(32, 32, seed)))
+        paths = sorted(inputs.glob("*.png"))
+
+        with BackendPool([self.fake.url], client_factory=partial(SDClient, tag_cache=self.cache)) as pool:
+            pool.check_connection()
+            self.assertEqual(pretag(paths[:1], pool, self.cache), (0, 1, 0))
+            self.assertEqual(pretag(paths, pool, self.cache, workers=2), (1, 2, 0))
+
+        self.assertEqual(self.interrogations(), 3)
+        self.assertEqual(self.cache.stats()["entries"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
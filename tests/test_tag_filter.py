@@ -0,0 +1,58 @@
+import random
+import unittest
+
+from core.settings import GLOBAL_TAG_BLACKLIST, TAG_CONFLICT_MAP
+from core.utils import compile_tag_blacklist, smart_process_tags
+from tools.bench_tag_filter import reference_process_tags
+
+# Small alphabet so block words often overlap, share prefixes and nest in tags.
+ALPHABET = "abc (_)\\.*+?[]"
+
+
+def random_text(rng, max_len):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_len)))
+
+
+class SmartProcessTagsTests(unittest.TestCase):
+    def test_matches_reference_on_random_inputs(self):
+        rng = random.Random(1234)
+        conflict_keys = list(TAG_CONFLICT_MAP)
+        for _ in range(2000):
+            tags = ",".join(random_text(rng, 8) for _ in range(rng.randint(0, 12)))
+            block_words = [random_text(rng, 4) for _ in range(rng.randint(0, 6))]
+            prompt = " ".join(rng.sample(conflict_keys, rng.randint(0, 2))) + random_text(rng, 5)
+            blocked = block_words if rng.random() < 0.8 else None
+            with self.subTest(tags=tags, blocked=blocked, prompt=prompt):
+                self.assertEqual(
+                    smart_process_tags(tags, prompt, 0.6, blocked),
+                    reference_process_tags(tags, prompt, 0.6, blocked),
+                )
+
+    def test_matches_reference_on_realistic_tags(self):
+        tags = "1girl, solo, long hair, blue eyes, cleavage, smile, white background, ponytail, school uniform"
+        for prompt in ("", "black hair", "RED EYES, large breasts", "hair, eye, breast"):
+            for blocked in (None, [], ["uniform"], ["smile", "school"]):
+                with self.subTest(prompt=prompt, blocked=blocked):
+                    self.assertEqual(
+                        smart_process_tags(tags, prompt, 0.4, blocked),
+                        reference_process_tags(tags, prompt, 0.4, blocked),
+                    )
+
+    def test_empty_block_word_blocks_everything(self):
+        self.assertEqual(smart_process_tags("a, b", "", 0.5, [""]), "")
+
+    def test_matcher_is_compiled_once_per_blacklist(self):
+        compile_tag_blacklist.cache_clear()
+        for _ in range(5):
+            smart_process_tags("a, b, c", "black hair", 0.5, ["b"])
+        smart_process_tags("a, b, c", "black hair", 0.5, ["c"])
+        info = compile_tag_blacklist.cache_info()
+        self.assertEqual((info.misses, info.hits), (2, 4))
+
+    def test_global_blacklist_applies_without_user_words(self):
+        result = smart_process_tags(", ".join(GLOBAL_TAG_BLACKLIST + ["keep me"]), "", 0.5)
+        self.assertEqual(result, "(keep me:0.5)")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import sys
+import time
+import unittest
+
+from core.client import SDClient
+from core.telemetry import CommandTelemetry, FallbackTelemetry, StubTelemetry, VramSampler, WebUIMemoryTelemetry, build_telemetry
+from tools.fake_webui import FakeWebUI
+
+
+class TelemetryTests(unittest.TestCase):
+    def test_webui_memory_endpoint_reports_render_host_vram(self):
+        with FakeWebUI() as fake:
+            client = SDClient(fake.url)
+            reading = WebUIMemoryTelemetry(client).sample()
+            client.close()
+
+        self.assertEqual(reading["source"], "webui")
+        self.assertEqual(reading["total_gb"], 24.0)
+        self.assertEqual(reading["used_gb"], 3.0)
+
+    def test_unreachable_webui_falls_back_to_next_source(self):
+        client = SDClient("http://127.0.0.1:9", max_retries=1)
+        telemetry = FallbackTelemetry([WebUIMemoryTelemetry(client), StubTelemetry(total_gb=8, used_gb=2)])
+
+        reading = telemetry.sample()
+        client.close()
+
+        self.assertEqual((reading["source"], reading["total_gb"], reading["used_fraction"]), ("stub", 8.0, 0.25))
+
+    def test_probe_command_output_is_parsed_like_nvidia_smi(self):
+        probe = CommandTelemetry([sys.executable, "-c", "print('24576, 6144, NVIDIA GeForce RTX 4090')"])
+
+        reading = probe.sample()
+
+        self.assertEqual(reading["name"], "NVIDIA GeForce RTX 4090")
+        self.assertEqual((reading["total_gb"], reading["used_gb"]), (24.0, 6.0))
+
+    def test_missing_probe_command_gives_no_reading(self):
+        self.assertIsNone(CommandTelemetry(["definitely-not-nvidia-smi"]).sample())
+
+    def test_configured_probe_is_asked_before_the_webui(self):
+        telemetry = build_telemetry(client=None, settings={"probe": [sys.executable, "-c", "print('8192, 1024, Probe')"],
+                                                           "local_fallback": False})
+
+        self.assertEqual(telemetry.sample()["name"], "Probe")
+
+
+class VramSamplerTests(unittest.TestCase):
+    def test_peak_fraction_covers_only_the_requested_window(self):
+        stub = StubTelemetry(total_gb=10, used_gb=9.5)
+        sampler = VramSampler([stub], interval=0.01)
+        with sampler:
+            time.sleep(0.05)
+            stub.used_gb = 2
+            started = time.monotonic()
+            time.sleep(0.05)
+
+        self.assertAlmostEqual(sampler.peak_fraction(started), 0.2)
+        self.assertAlmostEqual(sampler.peak_fraction(0), 0.95)
+        self.assertEqual(sampler.peak["used_gb"], 9.5)
+
+    def test_fullest_backend_wins(self):
+        sampler = VramSampler([StubTelemetry(used_gb=4), StubTelemetry(used_gb=20)])
+
+        self.assertEqual(sampler.sample_once()["used_gb"], 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from PIL import Image
+
+from webui.thumbnails import ThumbnailCache
+
+
+class ThumbnailCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.thumbs = ThumbnailCache(self.root / "thumbs", widths=(64, 128))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_png(self, name, size=(300, 400), color=(10, 120, 200)):
+        path = self.root / name
+        Image.new("RGB", size, color).save(path)
+        return path
+
+    def test_generate_writes_every_width_keeping_aspect(self):
+        source = self.make_png("a.png")
+
+        self.thumbs.generate(source)
+
+        for width in (64, 128):
+            with Image.open(self.thumbs.path(source, width)) as thumb:
+                self.assertEqual(thumb.format, "WEBP")
+                self.assertEqual(thumb.size, (width, round(width * 4 / 3)))
+
+    def test_requested_width_snaps_to_a_configured_size(self):
+        self.assertEqual(self.thumbs.snap_width(10), 64)
+        self.assertEqual(self.thumbs.snap_width(100), 128)
+        self.assertEqual(self.thumbs.snap_width(4000), 128)
+        self.assertEqual(self.thumbs.snap_width(None), 64)
+
+    def test_missing_thumbnail_is_backfilled_and_stale_one_remade(self):
+        source = self.make_png("old.png")
+
+        thumb = self.thumbs.get(source, 64)
+        self.assertTrue(thumb.exists())
+        etag = self.thumbs.etag(source, 64)
+        self.assertEqual(self.thumbs.get(source, 64), thumb)
+        self.assertEqual(self.thumbs.generated, 1)
+
+        # The source is rewritten after its thumbnail was made.
+        Image.new("RGB", (300, 400), (250, 0, 0)).save(source)
+        later = time.time() + 5
+        os.utime(source, (later, later))
+        self.thumbs.get(source, 64)
+
+        self.assertEqual(self.thumbs.generated, 2)
+        self.assertNotEqual(self.thumbs.etag(source, 64), etag)
+        with Image.open(thumb) as img:
+            self.assertGreater(img.convert("RGB").getpixel((5, 5))[0], 200)
+
+    def test_least_recently_used_thumbnails_are_evicted(self):
+        # Same content, so every thumbnail has the same size.
+        sources = [self.make_png(f"{n}.png") for n in range(3)]
+        for n, source in enumerate(sources):
+            self.thumbs.get(source, 64)
+            stamp = time.time() - 100 + n
+            os.utime(self.thumbs.path(source, 64), (stamp, stamp))
+        # Using the oldest one makes it the most recent.
+        self.thumbs.get(sources[0], 64)
+        size = self.thumbs.path(sources[0], 64).stat().st_size
+        self.thumbs.max_bytes = size * 2
+
+        self.thumbs.get(self.make_png("new.png"), 64)
+
+        self.assertTrue(self.thumbs.path(sources[0], 64).exists())
+        self.assertFalse(self.thumbs.path(sources[1], 64).exists())
+        self.assertFalse(self.thumbs.path(sources[2], 64).exists())
+        self.assertLessEqual(self.thumbs.total_bytes, self.thumbs.max_bytes)
+        self.assertEqual(self.thumbs.stats()["evictions"], 2)
+
+    def test_existing_thumbnails_count_towards_the_limit_after_restart(self):
+        source = self.make_png("a.png")
+        self.thumbs.generate(source)
+
+        reopened = ThumbnailCache(self.root / "thumbs", widths=(64, 128))
+
+        self.assertEqual(reopened.total_bytes, self.thumbs.total_bytes)
+        self.assertGreater(reopened.total_bytes, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
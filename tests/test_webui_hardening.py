@@ -2,7 +2,7 @@ import re
 import unittest
 from pathlib import Path
 
-from webui.job_history import normalize_loaded_job
+from webui.job_history import MAX_RESUMES, normalize_loaded_job
 
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
@@ -49,8 +49,8 @@ class WebUIHardeningTests(unittest.TestCase):
 
         self.assertRegex(style_css, r"--danger-color:\s*var\(--error-color\);")
 
-    def test_interrupted_history_jobs_are_marked_failed_on_load(self):
-        for status in ("Pending", "Running", "Canceling"):
+    def test_interrupted_history_jobs_resume_on_load(self):
+        for status, expected in (("Pending", "Pending"), ("Running", "Pending"), ("Canceling", "Canceled")):
             with self.subTest(status=status):
                 job, changed = normalize_loaded_job({
                     "id": "abc123",
@@ -60,9 +60,25 @@ class WebUIHardeningTests(unittest.TestCase):
                 })
 
                 self.assertTrue(changed)
-                self.assertEqual(job["status"], "Failed")
-                self.assertEqual(job["phase_text"], "")
-                self.assertEqual(job["error"], "Server restarted before completion")
+                self.assertEqual(job["status"], expected)
+                self.assertNotEqual(job["phase_text"], "old phase")
+
+        job, _ = normalize_loaded_job({"id": "abc123", "status": "Running", "phase_text": "", "error": None})
+        self.assertEqual(job["resumes"], 1)
+
+    def test_job_interrupted_too_often_is_marked_failed(self):
+        job, changed = normalize_loaded_job({
+            "id": "abc123",
+            "status": "Running",
+            "phase_text": "old phase",
+            "error": None,
+            "resumes": MAX_RESUMES,
+        })
+
+        self.assertTrue(changed)
+        self.assertEqual(job["status"], "Failed")
+        self.assertEqual(job["phase_text"], "")
+        self.assertEqual(job["error"], "Server restarted before completion")
 
         completed, changed = normalize_loaded_job({
             "id": "done123",
@@ -0,0 +1,300 @@
+import importlib
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from core.utils import save_image
+from tools.fake_webui import FakeWebUI, render_png
+
+MODEL = "model_a.safetensors [aaaa]"
+
+
+def job_payload(tag, **extra):
+    payload = {
+        "model": "model_a.safetensors", "global_prompt": "g", "char_prompt": "c", "action_prompt": tag,
+        "negative_prompt": "n", "width": 64, "height": 64,
+    }
+    payload.update(extra)
+    return payload
+
+
+class WebUIWorkerTests(unittest.TestCase):
+    """Runs the real webui.app worker pool against two fake SD WebUIs."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.fakes = [FakeWebUI(models=(MODEL,), generate_delay=0.3).start() for _ in range(2)]
+        env = {
+            "PROJECT_ERO_WEBUI_URLS": ",".join(f.url for f in cls.fakes),
+            "PROJECT_ERO_OUTPUT_ROOT": cls.tmp.name,
+            "PROJECT_ERO_POLL_INTERVAL": "0.1",
+        }
+        with patch.dict(os.environ, env):
+            sys.modules.pop("webui.app", None)
+            cls.app = importlib.import_module("webui.app")
+        cls.client = TestClient(cls.app.app)
+        cls.client.__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.__exit__(None, None, None)
+        cls.app.job_store.close()
+        sys.modules.pop("webui.app", None)
+        for fake in cls.fakes:
+            fake.stop()
+        cls.tmp.cleanup()
+
+    def submit(self, tag, **extra):
+        response = self.client.post("/api/jobs", json=job_payload(tag, **extra))
+        self.assertEqual(response.status_code, 200)
+        return response.json()["job_id"]
+
+    def job(self, job_id):
+        with self.app.jobs_lock:
+            return dict(self.app.jobs[job_id])
+
+    def wait_for(self, job_id, statuses, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.job(job_id)
+            if job["status"] in statuses:
+                return job
+            time.sleep(0.02)
+        self.fail(f"{job_id} stuck in {self.job(job_id)['status']}")
+
+    def generated_prompts(self):
+        return [g["prompt"] for fake in self.fakes for g in fake.state.generations]
+
+    def test_jobs_run_concurrently_across_backends(self):
+        job_ids = [self.submit(f"concurrent {i}", total_images=2) for i in range(4)]
+
+        finished = [self.wait_for(job_id, {"Completed", "Failed"}) for job_id in job_ids]
+
+        self.assertEqual([job["status"] for job in finished], ["Completed"] * 4)
+        for job in finished:
+            names = [url.rsplit("/", 1)[-1] for url in job["image_urls"]]
+            self.assertEqual(names, sorted(names))
+            self.assertEqual(len(names), 2)
+            for name in names:
+                self.assertTrue((Path(self.tmp.name) / "webui_jobs" / name).exists())
+        self.assertTrue(all(fake.state.generations for fake in self.fakes))
+        self.assertEqual({job["backend"] for job in finished}, {fake.url for fake in self.fakes})
+
+    def test_large_jobs_are_split_and_saved_per_chunk(self):
+        before = {fake.url: len(fake.state.generations) for fake in self.fakes}
+        with patch.object(self.app, "MAX_IMAGES_PER_REQUEST", 2):
+            job_id = self.submit("chunked", total_images=5)
+            job = self.wait_for(job_id, {"Completed", "Failed"})
+
+        self.assertEqual(job["status"], "Completed")
+        fake = next(f for f in self.fakes if f.url == job["backend"])
+        chunks = [g["images"] for g in fake.state.generations[before[fake.url]:] if g["prompt"] == "g, c, chunked"]
+        self.assertEqual(chunks, [2, 2, 1])
+        names = [url.rsplit("/", 1)[-1] for url in job["image_urls"]]
+        self.assertEqual([name[-8:] for name in names], [f"{i:04d}.png" for i in range(1, 6)])
+
+    def failed_job(self, tag, outputs=(), drafts=(), **extra):
+        """A job that died partway: files for `outputs`/`drafts` exist and are in its checkpoint."""
+        req = self.app.JobRequest(**job_payload(tag, **extra)).model_dump()
+        job_id = f"resume-{tag}"
+        for idx in outputs:
+            save_image(render_png(64, 64, idx), self.app.OUTPUT_DIR / self.app.output_filename(job_id, req, idx))
+        for idx in drafts:
+            save_image(render_png(32, 32, idx), self.app.draft_path(job_id, idx))
+        with self.app.jobs_lock:
+            self.app.jobs[job_id] = {
+                "id": job_id, "status": "Failed", "phase_text": "", "request": req, "created_at": time.time(),
+                "image_urls": [], "error": "Server restarted before completion",
+                "checkpoint": {"outputs": {str(i): 100 + i for i in outputs}, "drafts": {str(i): 200 + i for i in drafts}},
+            }
+            self.app.save_job_unlocked(job_id)
+        return job_id
+
+    def generations_for(self, tag):
+        return [(g["endpoint"], g["images"]) for fake in self.fakes for g in fake.state.generations
+                if g["prompt"] == f"g, c, {tag}"]
+
+    def test_retry_generates_only_missing_outputs(self):
+        job_id = self.failed_job("resume standard", outputs=(0, 2), total_images=4)
+        with self.app.jobs_lock:
+            # Moved by hand before it failed; the resumed job goes to the tail unpinned.
+            self.app.jobs[job_id]["pinned"] = True
+
+        self.assertEqual(self.client.post(f"/api/jobs/{job_id}/retry").json()["job_id"], job_id)
+        job = self.wait_for(job_id, {"Completed", "Failed"})
+
+        self.assertEqual(job["status"], "Completed")
+        self.assertFalse(job["pinned"])
+        self.assertEqual(self.generations_for("resume standard"), [("txt2img", 2)])
+        self.assertEqual([url[-8:] for url in job["image_urls"]], [f"{i:04d}.png" for i in range(1, 5)])
+        self.assertEqual(job["checkpoint"]["outputs"]["0"], 100)
+        self.assertIsInstance(job["checkpoint"]["outputs"]["1"], int)
+
+    def test_retry_of_job_saved_without_checkpoint_keeps_its_outputs(self):
+        job_id = self.failed_job("resume legacy", outputs=(0, 1, 2), total_images=4)
+        req = self.job(job_id)["request"]
+        files = [self.app.OUTPUT_DIR / self.app.output_filename(job_id, req, idx) for idx in range(3)]
+        before = [f.read_bytes() for f in files]
+        with self.app.jobs_lock:
+            # As stored before checkpoints existed: only the image list records what was saved.
+            job = self.app.jobs[job_id]
+            del job["checkpoint"]
+            job["image_urls"] = [f"/api/images/{f.name}" for f in files]
+            self.app.save_job_unlocked(job_id)
+
+        self.assertEqual(self.client.post(f"/api/jobs/{job_id}/retry").json()["job_id"], job_id)
+        job = self.wait_for(job_id, {"Completed", "Failed"})
+
+        self.assertEqual(job["status"], "Completed")
+        self.assertEqual(self.generations_for("resume legacy"), [("txt2img", 1)])
+        self.assertEqual([f.read_bytes() for f in files], before)
+        self.assertEqual(len(job["image_urls"]), 4)
+        self.assertIsNone(job["checkpoint"]["outputs"]["0"])
+
+    def test_twophase_retry_reuses_saved_drafts(self):
+        job_id = self.failed_job("resume twophase", outputs=(0,), drafts=(1,), mode="twophase",
+                                 final_model="model_a.safetensors", total_images=3)
+
+        self.client.post(f"/api/jobs/{job_id}/retry")
+        job = self.wait_for(job_id, {"Completed", "Failed"})
+
+        self.assertEqual(job["status"], "Completed", job["error"])
+        # One draft for index 2 only, then a refine for each missing output.
+        self.assertEqual(self.generations_for("resume twophase"), [("txt2img", 1), ("img2img", 1), ("img2img", 1)])
+        self.assertEqual(len(job["image_urls"]), 3)
+        self.assertEqual(job["checkpoint"]["drafts"], {})
+        self.assertEqual(list(self.app.DRAFT_DIR.glob(f"{job_id}_draft_*.png")), [])
+
+    def test_fixed_seed_job_repeat_is_served_from_render_cache(self):
+        first = self.wait_for(self.submit("cached", total_images=2, seed=7), {"Completed", "Failed"})
+        hits = self.client.get("/api/render-cache").json()["hits"]
+        second = self.wait_for(self.submit("cached", total_images=2, seed=7), {"Completed", "Failed"})
+
+        self.assertEqual((first["status"], second["status"]), ("Completed", "Completed"))
+        self.assertEqual(self.generations_for("cached"), [("txt2img", 2)])
+        self.assertEqual(self.client.get("/api/render-cache").json()["hits"], hits + 1)
+        self.assertEqual(second["checkpoint"]["outputs"], {"0": 7, "1": 8})
+
+    def test_saved_images_get_cacheable_thumbnails(self):
+        job = self.wait_for(self.submit("thumbs"), {"Completed", "Failed"})
+        name = job["image_urls"][0].rsplit("/", 1)[-1]
+        # Made when the image was saved, not on request.
+        self.assertTrue(self.app.thumbs.path(self.app.OUTPUT_DIR / name, 160).exists())
+
+        response = self.client.get(f"/api/thumbs/{name}?w=100")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "image/webp")
+        self.assertIn("immutable", response.headers["cache-control"])
+        self.assertIn("last-modified", response.headers)
+        etag = response.headers["etag"]
+        revalidated = self.client.get(f"/api/thumbs/{name}?w=160", headers={"If-None-Match": etag})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertNotEqual(self.client.get(f"/api/thumbs/{name}?w=512").headers["etag"], etag)
+
+    def test_old_images_are_thumbnailed_on_first_request(self):
+        name = "before_thumbs_0001.png"
+        save_image(render_png(64, 96, 1), self.app.OUTPUT_DIR / name)
+
+        response = self.client.get(f"/api/thumbs/{name}?w=512")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.app.thumbs.path(self.app.OUTPUT_DIR / name, 512).exists())
+        self.assertEqual(self.client.get("/api/thumbs/..%2Fwebui_jobs.sqlite3").status_code, 404)
+        self.assertEqual(self.client.get("/api/thumbs/missing.png").status_code, 404)
+
+    def test_history_is_paged_and_reset_deltas_carry_only_live_jobs(self):
+        job_ids = [self.submit(f"history page {i}") for i in range(3)]
+        for job_id in job_ids:
+            self.wait_for(job_id, {"Completed"})
+
+        first = self.client.get("/api/history", params={"q": "history page", "limit": 2}).json()
+        second = self.client.get("/api/history", params={"q": "history page", "cursor": first["next_cursor"]}).json()
+
+        self.assertEqual([job["id"] for job in first["jobs"] + second["jobs"]], job_ids[::-1])
+        self.assertIsNone(second["next_cursor"])
+        card = first["jobs"][0]
+        self.assertEqual(card["request"]["action_prompt"], "history page 2")
+        self.assertNotIn("negative_prompt", card["request"])
+        self.assertNotIn("checkpoint", card)
+
+        reset = self.client.get("/api/jobs", params={"since": 0}).json()
+        self.assertTrue(reset["reset"])
+        self.assertFalse(any(job["status"] in ("Completed", "Failed", "Canceled") for job in reset["jobs"]))
+
+        self.assertEqual(self.client.get("/api/history", params={"cursor": "garbage"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/history", params={"status": "Running"}).status_code, 400)
+
+    def test_job_list_sends_card_summaries_of_live_and_recent_jobs(self):
+        job_ids = [self.submit(f"board {i}") for i in range(3)]
+        board = self.client.get("/api/jobs").json()
+        # Queued, running or (for a fast worker) already finished: each job is listed once.
+        listed = [job["id"] for job in board]
+        self.assertEqual(sorted(listed.count(job_id) for job_id in job_ids), [1, 1, 1])
+        for job_id in job_ids:
+            self.wait_for(job_id, {"Completed"})
+
+        board = self.client.get("/api/jobs").json()
+        self.assertEqual([job["id"] for job in board[:3]], job_ids[::-1])
+        self.assertNotIn("checkpoint", board[0])
+        self.assertNotIn("negative_prompt", board[0]["request"])
+
+    def test_fixed_seed_resume_keeps_seed_offsets(self):
+        job_id = self.failed_job("resume seeded", outputs=(0, 2), total_images=4, seed=50)
+
+        self.client.post(f"/api/jobs/{job_id}/retry")
+        job = self.wait_for(job_id, {"Completed", "Failed"})
+
+        self.assertEqual(job["status"], "Completed")
+        self.assertEqual(self.generations_for("resume seeded"), [("txt2img", 1), ("txt2img", 1)])
+        self.assertEqual((job["checkpoint"]["outputs"]["1"], job["checkpoint"]["outputs"]["3"]), (51, 53))
+
+    def test_canceled_pending_job_never_runs(self):
+        busy = [self.submit(f"busy {i}") for i in range(2)]
+        waiting = self.submit("never run")
+
+        self.assertEqual(self.client.delete(f"/api/jobs/{waiting}").json()["status"], "canceled")
+        for job_id in busy:
+            self.wait_for(job_id, {"Completed"})
+
+        self.assertEqual(self.job(waiting)["status"], "Canceled")
+        self.assertNotIn("g, c, never run", self.generated_prompts())
+
+    def test_running_job_canceled_mid_generation_ends_canceled(self):
+        job_id = self.submit("cancel me", total_images=1)
+        self.wait_for(job_id, {"Running"})
+        deadline = time.monotonic() + 5
+        while "g, c, cancel me" not in self.generated_prompts() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(self.client.delete(f"/api/jobs/{job_id}").json()["status"], "canceling")
+        job = self.wait_for(job_id, {"Completed", "Failed", "Canceled"})
+
+        self.assertEqual(job["status"], "Canceled")
+        self.assertEqual(job["error"], "Canceled by user")
+
+    def test_delete_waiting_on_jobs_lock_leaves_event_loop_free(self):
+        deleted, progress = [], []
+        with self.app.jobs_lock:
+            deleter = threading.Thread(target=lambda: deleted.append(self.client.delete("/api/jobs/missing")))
+            deleter.start()
+            time.sleep(0.1)
+            # The delete is parked on the lock in a worker thread; async endpoints still answer.
+            prober = threading.Thread(target=lambda: progress.append(self.client.get("/api/progress")), daemon=True)
+            prober.start()
+            prober.join(2)
+            self.assertEqual([r.status_code for r in progress], [200])
+            self.assertEqual(deleted, [])
+        deleter.join(5)
+        self.assertEqual(deleted[0].status_code, 404)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import threading
+import time
+import unittest
+
+from webui.job_history import can_transition
+from webui.worker_pool import JobSaves, WorkerPool
+
+
+class WorkerPoolTests(unittest.TestCase):
+    def test_next_job_starts_while_previous_images_are_saved(self):
+        tickets = ["a", "b"]
+        lock = threading.Lock()
+        events = []
+        release_save = threading.Event()
+
+        def take_job():
+            with lock:
+                return tickets.pop(0) if tickets else None
+
+        def slow_save(ticket):
+            release_save.wait(2)
+            events.append(f"saved {ticket}")
+
+        def run_job(ticket, saves):
+            events.append(f"generated {ticket}")
+            saves.submit(slow_save, ticket)
+            if ticket == "b":
+                release_save.set()
+            saves.wait()
+
+        pool = WorkerPool(take_job, run_job, workers=2, save_workers=2, idle_wait=0.01).start()
+        deadline = time.monotonic() + 2
+        while len(events) < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pool.stop()
+
+        # Both generations happened before either save finished.
+        self.assertEqual(sorted(events[:2]), ["generated a", "generated b"])
+        self.assertEqual(sorted(events[2:]), ["saved a", "saved b"])
+
+    def test_wake_cuts_idle_wait_short(self):
+        queue = []
+        done = threading.Event()
+
+        def take_job():
+            return queue.pop() if queue else None
+
+        pool = WorkerPool(take_job, lambda ticket, saves: done.set(), idle_wait=30).start()
+        time.sleep(0.05)
+        queue.append("job")
+        pool.wake()
+
+        self.assertTrue(done.wait(2))
+        pool.stop()
+
+    def test_job_saves_wait_reraises_first_failure(self):
+        pool = WorkerPool(lambda: None, None, workers=0)
+        saves = JobSaves(pool.save_executor)
+        saves.submit(lambda: None)
+        saves.submit(lambda: 1 / 0)
+
+        with self.assertRaises(ZeroDivisionError):
+            saves.wait()
+        pool.stop()
+
+
+class JobTransitionTests(unittest.TestCase):
+    def test_cancel_wins_over_late_completion(self):
+        self.assertTrue(can_transition("Running", "Canceling"))
+        self.assertFalse(can_transition("Canceling", "Completed"))
+        self.assertFalse(can_transition("Canceling", "Failed"))
+        self.assertFalse(can_transition("Canceling", "Running"))
+        self.assertTrue(can_transition("Canceling", "Canceled"))
+
+    def test_canceled_pending_job_cannot_start(self):
+        self.assertFalse(can_transition("Canceled", "Running"))
+        self.assertTrue(can_transition("Pending", "Running"))
+
+    def test_parked_twophase_job_returns_to_pending(self):
+        self.assertTrue(can_transition("Running", "Pending"))
+        self.assertFalse(can_transition("Completed", "Pending"))
+
+
+if __name__ == "__main__":
+    unittest.main()
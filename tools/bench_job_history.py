@@ -0,0 +1,101 @@
+"""Time /api/history-style queries on job histories of growing size.
+
+Usage: python tools/bench_job_history.py [--sizes 1000,10000,100000] [--page 50] [--runs 20]
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from webui.job_history import job_summary
+from webui.job_store import JobStore
+
+STATUSES = ["Completed"] * 8 + ["Failed", "Canceled"]
+MODES = ["standard", "twophase", "remix"]
+MODELS = [f"model_{n}.safetensors" for n in range(8)]
+WORDS = ["1girl", "solo", "smile", "long hair", "school uniform", "night", "rain", "city", "forest", "beach",
+         "looking at viewer", "sitting", "standing", "from above", "dynamic pose", "masterpiece"]
+
+
+def make_job(rng, n):
+    prompt_words = rng.sample(WORDS, 6) + [f"tag{n}"]
+    return {
+        "id": f"{n:08x}",
+        "status": rng.choice(STATUSES),
+        "phase_text": "",
+        "created_at": 1_700_000_000 + n * 7.5,
+        "image_urls": [f"/api/images/Task_{n:08x}_{i:04d}.png" for i in range(1, rng.randint(1, 4) + 1)],
+        "error": None,
+        "request": {
+            "mode": rng.choice(MODES),
+            "task_name": f"Task{n % 50}",
+            "model": rng.choice(MODELS),
+            "global_prompt": "masterpiece, best quality, " * 8,
+            "char_prompt": ", ".join(prompt_words[:3]),
+            "action_prompt": ", ".join(prompt_words[3:]),
+            "negative_prompt": "lowres, bad anatomy, " * 20,
+            "total_images": 4,
+        },
+    }
+
+
+def fill(store, count, seed=0):
+    rng = random.Random(seed)
+    with store._transaction():
+        for n in range(count):
+            store._upsert(make_job(rng, n))
+
+
+def time_query(store, runs, **filters):
+    samples, size = [], 0
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        jobs, cursor = store.history(**filters)
+        body = json.dumps({"jobs": [job_summary(j) for j in jobs], "next_cursor": cursor})
+        samples.append(time.perf_counter() - t0)
+        size = len(body)
+    return statistics.median(samples), size, cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark paginated job history queries.")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in (int(s) for s in args.sizes.split(",")):
+            store = JobStore(Path(tmp) / f"jobs_{count}.sqlite3")
+            t0 = time.perf_counter()
+            fill(store, count)
+            print(f"\n{count} jobs (filled in {time.perf_counter() - t0:.1f}s)")
+
+            # Cursor half way down the history, to show deep pages cost the same as the first.
+            _, _, deep_cursor = time_query(store, 1, limit=count // 2)
+            cases = {
+                "first page": {},
+                "deep page": {"cursor": deep_cursor},
+                "status=Failed": {"statuses": ["Failed"]},
+                "finished": {"statuses": ["Completed", "Failed", "Canceled"]},
+                "mode+model": {"mode": "remix", "model": MODELS[3]},
+                "task_name": {"task_name": "Task7"},
+                "created range": {"created_from": 1_700_000_000 + count * 2.5, "created_to": 1_700_000_000 + count * 5.0},
+                "prompt (common)": {"prompt": "school uniform"},
+                "prompt (rare)": {"prompt": f"tag{count // 3}"},
+            }
+            for name, filters in cases.items():
+                median, size, _ = time_query(store, args.runs, limit=args.page, **filters)
+                print(f"  {name:<16} median {median * 1000:7.2f} ms   {size / 1024:6.1f} KiB")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
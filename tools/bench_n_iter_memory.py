@@ -0,0 +1,107 @@
+"""Peak client RSS for one n_iter=total request versus chunked, streamed requests.
+
+Runs each case in a fresh subprocess against tools/fake_webui.py serving
+incompressible images, and reports peak RSS above the post-import baseline.
+
+Usage: python tools/bench_n_iter_memory.py [--totals 4 16 32 64] [--chunk 4]
+"""
+import argparse
+import base64
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import requests
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from core.client import SDClient
+from core.utils import extract_infotext, save_image
+from tools.fake_webui import FakeWebUI, render_noise_png
+
+
+def peak_rss_mib():
+    # VmHWM starts fresh at exec; ru_maxrss inherits the parent's peak on Linux.
+    status = Path("/proc/self/status")
+    if status.exists():
+        for line in status.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def payload(n_iter, width, height):
+    return {"prompt": "bench", "width": width, "height": height, "batch_size": 1, "n_iter": n_iter, "seed": -1}
+
+
+def run_single(url, total, chunk, width, height, out_dir):
+    # The previous behaviour: one request, whole body parsed by r.json(), saves after it returns.
+    resp = requests.post(f"{url}/sdapi/v1/txt2img", json=payload(total, width, height)).json()
+    info_text = extract_infotext(resp.get("info"))
+    for idx, b64_img in enumerate(resp["images"]):
+        save_image(b64_img, Path(out_dir) / f"{idx:04d}.png", info_text)
+
+
+def run_chunked(url, total, chunk, width, height, out_dir):
+    client = SDClient(url)
+    done = 0
+    while done < total:
+        n_iter = min(chunk, total - done)
+        resp = client._post_with_retry(f"{client.api_url}/txt2img", payload(n_iter, width, height))
+        info_text = extract_infotext(resp.get("info"))
+        for offset, b64_img in enumerate(resp["images"]):
+            save_image(b64_img, Path(out_dir) / f"{done + offset:04d}.png", info_text)
+        done += n_iter
+        del resp
+
+
+MODES = {"single": run_single, "chunked": run_chunked}
+
+
+def child(args):
+    baseline = peak_rss_mib()
+    with tempfile.TemporaryDirectory() as out_dir:
+        MODES[args.mode](args.url, args.total, args.chunk, args.width, args.height, out_dir)
+        saved = len(list(Path(out_dir).glob("*.png")))
+    print(json.dumps({"baseline": baseline, "peak": peak_rss_mib(), "saved": saved}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark client memory for large n_iter jobs.")
+    parser.add_argument("--totals", type=int, nargs="+", default=[4, 16, 32, 64])
+    parser.add_argument("--chunk", type=int, default=4)
+    parser.add_argument("--width", type=int, default=832)
+    parser.add_argument("--height", type=int, default=1216)
+    parser.add_argument("--child", dest="mode", choices=sorted(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--total", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        child(args)
+        return
+
+    with FakeWebUI(noise=True) as fake:
+        sample = base64.b64decode(render_noise_png(args.width, args.height))
+        print(f"Image: {args.width}x{args.height}, {len(sample) / 1024 / 1024:.1f} MiB PNG, chunk size {args.chunk}")
+        print(f"{'total_images':>12} {'single MiB':>11} {'chunked MiB':>12}")
+        for total in args.totals:
+            row = {}
+            for mode in ("single", "chunked"):
+                out = subprocess.run(
+                    [sys.executable, __file__, "--child", mode, "--url", fake.url, "--total", str(total),
+                     "--chunk", str(args.chunk), "--width", str(args.width), "--height", str(args.height)],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                result = json.loads(out)
+                assert result["saved"] == total, result
+                row[mode] = result["peak"] - result["baseline"]
+            print(f"{total:>12} {row['single']:>11.0f} {row['chunked']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Offline throughput benchmarks: story mode, remix mode and the WebUI queue against fake WebUIs.
+
+No GPU needed. The fake WebUIs run in this process. Each scenario runs in a
+fresh child interpreter, so its peak memory is the client's alone. Reported
+per scenario:
+- images/min over the whole run;
+- client overhead: seconds per image that the fake GPUs sat idle while the
+  run went on (connection checks, encoding, saving, scheduling);
+- peak RSS of the client process (not available on Windows).
+
+Usage: python tools/bench_offline.py [--scenario story|remix|queue|all] [--images 24]
+       [--backends 1] [--steps 20] [--step-delay 0.005] [--model-load-delay 0.5]
+       [--fail-rate 0.0] [--small]
+"""
+import argparse
+import base64
+import contextlib
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from core.settings import STORY_FILE
+from tools.fake_webui import FakeWebUI, render_png
+
+DRAFT_MODEL = "bench_draft.safetensors"
+FINAL_MODEL = "bench_final.safetensors"
+SCENARIOS = ("story", "remix", "queue")
+IMAGES_PER_SCENE = 4
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return round(peak / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+
+
+@contextlib.contextmanager
+def patched_main(workdir):
+    """main with its story, inputs and outputs inside workdir and no caches from earlier runs."""
+    from unittest.mock import patch
+
+    import main
+    from core.batch_tuner import BatchTuner
+
+    with patch.object(main, "STORY_FILE", workdir / "story.json"), patch.object(main, "OUTPUT_DIR", workdir / "out"), \
+         patch.object(main, "INPUT_DIR", workdir / "in"), patch.object(main, "build_render_cache", lambda: None), \
+         patch.object(main, "build_tag_cache", lambda: None), \
+         patch.object(main, "BatchTuner", lambda: BatchTuner(workdir / "tuning.json")):
+        yield main
+
+
+def write_story(workdir, images, small):
+    story = json.loads(STORY_FILE.read_text(encoding="utf-8"))
+    story["project_name"] = "Bench"
+    story["models"] = {"draft_model": DRAFT_MODEL, "final_model": FINAL_MODEL, "controlnet_openpose": None}
+    story["story_pipeline_mode"] = "twopass"
+    story["seed_strategy"] = {"global_num_images": IMAGES_PER_SCENE, "base_seed": 1}
+    scenes = math.ceil(images / 2 / IMAGES_PER_SCENE)
+    story["scenes"] = [{"scene_id": f"Scene_{n:02}", "prompt": f"bench scene {n}"} for n in range(scenes)]
+    if small:
+        story["generation_settings"] = {
+            **story.get("generation_settings", {}),
+            "draft_width": 64, "draft_height": 96, "final_width": 128, "final_height": 192,
+        }
+    (workdir / "story.json").write_text(json.dumps(story), encoding="utf-8")
+    (workdir / "in").mkdir(exist_ok=True)
+    # Every scene has a draft and a final per image.
+    return scenes * IMAGES_PER_SCENE * 2
+
+
+def write_remix_inputs(workdir, images, small):
+    write_story(workdir, 0, small)
+    inputs = workdir / "in"
+    width, height = (128, 192) if small else (832, 1216)
+    for n in range(images):
+        (inputs / f"input_{n:03}.png").write_bytes(base64.b64decode(render_png(width, height, n)))
+    return images
+
+
+def run_main(workdir):
+    """Story or remix mode, whichever main picks for workdir (remix when in/ has images)."""
+    with patched_main(workdir) as main:
+        return main.main(headless=True)
+
+
+def run_queue(workdir, steps, images, small):
+    """Submit jobs to the real webui.app queue through its HTTP API and wait for all of them."""
+    from fastapi.testclient import TestClient
+
+    import webui.app as app
+
+    width, height = (128, 192) if small else (832, 1216)
+    per_job = 4
+    with TestClient(app.app) as client:
+        job_ids = []
+        for n in range(math.ceil(images / per_job)):
+            response = client.post("/api/jobs", json={
+                "model": DRAFT_MODEL, "global_prompt": "bench", "char_prompt": "1girl", "action_prompt": f"job {n}",
+                "negative_prompt": "lowres", "width": width, "height": height, "steps": steps,
+                "total_images": per_job, "auto_hires": False,
+            })
+            response.raise_for_status()
+            job_ids.append(response.json()["job_id"])
+        while True:
+            with app.jobs_lock:
+                statuses = [app.jobs[job_id]["status"] for job_id in job_ids]
+            if all(status in ("Completed", "Failed", "Canceled") for status in statuses):
+                break
+            time.sleep(0.05)
+        app.job_store.close()
+    return 0 if all(status == "Completed" for status in statuses) else 1
+
+
+def child(args):
+    """Runs one scenario in this (fresh) interpreter and prints a JSON result line."""
+    workdir = Path(args.workdir)
+    if args.child == "queue":
+        os.environ["PROJECT_ERO_OUTPUT_ROOT"] = str(workdir / "out")
+        os.environ.setdefault("PROJECT_ERO_POLL_INTERVAL", "0.2")
+        import webui.app
+    else:
+        import main
+    # Import time is start-up cost (tools/bench_startup.py), not per-image overhead.
+    started = time.monotonic()
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        if args.child == "queue":
+            result = run_queue(workdir, args.steps, args.images, args.small)
+        else:
+            result = run_main(workdir)
+    print(json.dumps({
+        "ok": not result, "run_seconds": round(time.monotonic() - started, 3), "peak_rss_mb": peak_rss_mb(),
+    }))
+
+
+def bench(scenario, args):
+    with tempfile.TemporaryDirectory() as tmp_name:
+        workdir = Path(tmp_name)
+        if scenario == "remix":
+            images = write_remix_inputs(workdir, args.images, args.small)
+        elif scenario == "story":
+            images = write_story(workdir, args.images, args.small)
+        else:
+            images = math.ceil(args.images / 4) * 4
+        models = (f"{DRAFT_MODEL} [d]", f"{FINAL_MODEL} [f]")
+        fakes = [
+            FakeWebUI(models=models, step_delay=args.step_delay, model_load_delay=args.model_load_delay,
+                      noise=not args.small, fail_rate=args.fail_rate, fail_seed=n).start()
+            for n in range(args.backends)
+        ]
+        env = {**os.environ, "PROJECT_ERO_WEBUI_URLS": ",".join(f.url for f in fakes)}
+        command = [sys.executable, str(Path(__file__).resolve()), "--child", scenario, "--workdir", str(workdir),
+                   "--images", str(args.images), "--steps", str(args.steps)] + (["--small"] if args.small else [])
+        try:
+            started = time.monotonic()
+            proc = subprocess.run(command, cwd=BASE_DIR, env=env, capture_output=True, text=True)
+            wall = time.monotonic() - started
+            stats = [fake.state.stats() for fake in fakes]
+        finally:
+            for fake in fakes:
+                fake.stop()
+    if proc.returncode != 0 or not proc.stdout.strip():
+        raise SystemExit(f"{scenario} failed (exit {proc.returncode}):\n{proc.stderr[-3000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    run_seconds = result["run_seconds"]
+    busy = sum(s["busy_seconds"] for s in stats)
+    generated = sum(s["images"] for s in stats)
+    return {
+        "scenario": scenario,
+        "ok": result["ok"],
+        "images": generated,
+        "planned": images,
+        "run_seconds": run_seconds,
+        "startup_seconds": round(wall - run_seconds, 3),
+        "images_per_min": round(generated * 60 / run_seconds, 1) if run_seconds else 0.0,
+        "overhead_per_image": round((run_seconds * len(stats) - busy) / max(generated, 1), 4),
+        "gpu_busy_fraction": round(busy / (run_seconds * len(stats)), 3) if run_seconds else 0.0,
+        "model_loads": sum(s["model_loads"] for s in stats),
+        "failures": sum(s["failures"] for s in stats),
+        "peak_rss_mb": result["peak_rss_mb"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--images", type=int, default=24, help="images per scenario (story: drafts + finals)")
+    parser.add_argument("--backends", type=int, default=1, help="fake WebUIs to spread the work over")
+    parser.add_argument("--steps", type=int, default=20, help="sampling steps of queue jobs")
+    parser.add_argument("--step-delay", type=float, default=0.005, help="fake seconds per step per image")
+    parser.add_argument("--model-load-delay", type=float, default=0.5)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of generations that answer HTTP 500")
+    parser.add_argument("--small", action="store_true", help="tiny images instead of full-size noise PNGs")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    if not args.json:
+        print(f"{'scenario':<8} {'images':>6} {'img/min':>8} {'overhead/img':>13} {'gpu busy':>9} "
+              f"{'loads':>6} {'fails':>6} {'peak RSS':>9} {'startup':>8}")
+    for scenario in scenarios:
+        r = bench(scenario, args)
+        if args.json:
+            print(json.dumps(r))
+            continue
+        rss = f"{r['peak_rss_mb']:.0f} MB" if r["peak_rss_mb"] is not None else "n/a"
+        status = "" if r["ok"] else "  (run reported a failure)"
+        print(f"{scenario:<8} {r['images']:>6} {r['images_per_min']:>8.1f} {r['overhead_per_image'] * 1000:>10.1f} ms "
+              f"{r['gpu_busy_fraction']:>9.0%} {r['model_loads']:>6} {r['failures']:>6} {rss:>9} "
+              f"{r['startup_seconds']:>7.2f}s{status}")
+
+
+if __name__ == "__main__":
+    main()
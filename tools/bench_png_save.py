@@ -0,0 +1,81 @@
+"""Compare the PNG save paths used by core.utils.save_image.
+
+Usage: python tools/bench_png_save.py [--width 832] [--height 1216] [--runs 10]
+"""
+import argparse
+import base64
+import statistics
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from core.utils import _save_image_reencode, inject_png_text, save_image
+
+
+INFO_TEXT = (
+    "1girl, solo, black hair, masterpiece, best quality\n"
+    "Negative prompt: lowres, bad anatomy\n"
+    "Steps: 28, Sampler: Euler a, CFG scale: 5.0, Seed: 123456, Size: 832x1216"
+)
+
+
+def sample_png(width, height):
+    # Gradient plus noise compresses roughly like a real render, unlike a flat fill.
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 48)
+    img = Image.merge("RGB", (gradient, noise, gradient.rotate(90).resize((width, height))))
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def time_runs(fn, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PNG metadata save paths.")
+    parser.add_argument("--width", type=int, default=832)
+    parser.add_argument("--height", type=int, default=1216)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    png = sample_png(args.width, args.height)
+    png_b64 = base64.b64encode(png).decode()
+    print(f"Payload: {args.width}x{args.height}, {len(png) / 1024:.0f} KiB PNG")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        splice_path = Path(tmp) / "splice.png"
+        reencode_path = Path(tmp) / "reencode.png"
+        results = {
+            "splice (save_image)": time_runs(lambda: save_image(png_b64, splice_path, INFO_TEXT), args.runs),
+            "PIL decode + re-encode": time_runs(
+                lambda: _save_image_reencode(base64.b64decode(png_b64), reencode_path, INFO_TEXT), args.runs
+            ),
+        }
+        with Image.open(splice_path) as spliced, Image.open(reencode_path) as reencoded:
+            assert spliced.info["parameters"] == reencoded.info["parameters"] == INFO_TEXT
+            assert spliced.tobytes() == reencoded.tobytes()
+        assert inject_png_text(png, INFO_TEXT) == splice_path.read_bytes()
+
+    baseline = statistics.median(results["PIL decode + re-encode"])
+    for name, samples in results.items():
+        median = statistics.median(samples)
+        print(f"{name:<24} median {median * 1000:8.2f} ms   min {min(samples) * 1000:8.2f} ms   "
+              f"x{baseline / median:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Measure main.py start-up: import time and the wall clock of a tiny run, interactive vs headless.
+
+Each run is a fresh interpreter rendering a one-image story against the fake
+WebUI, with outputs in a temporary folder, so the difference between the two
+modes is the console effects (typing delays, box pauses, spinners, tqdm).
+
+Usage: python tools/bench_startup.py [--runs 3]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from core.settings import STORY_FILE
+from tools.fake_webui import FakeWebUI
+
+# Runs inside the child interpreter: point main at the temporary story and folders.
+DRIVER = """
+import sys
+from pathlib import Path
+from unittest.mock import patch
+sys.path.insert(0, {base!r})
+import main
+from core.batch_tuner import BatchTuner
+tmp = Path({tmp!r})
+with patch.object(main, "STORY_FILE", tmp / "story.json"), patch.object(main, "OUTPUT_DIR", tmp / "out"), \\
+     patch.object(main, "INPUT_DIR", tmp / "in"), patch.object(main, "build_render_cache", lambda: None), \\
+     patch.object(main, "build_tag_cache", lambda: None), \\
+     patch.object(main, "BatchTuner", lambda: BatchTuner(tmp / "tuner.json")):
+    raise SystemExit(main.main(headless={headless}))
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_profile():
+    """(cumulative microseconds of main, [(microseconds, module)] of its slowest direct imports)."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BASE_DIR, capture_output=True, text=True, check=True,
+    ).stderr
+    total, children = 0, []
+    for match in IMPORT_LINE.finditer(output):
+        cumulative, indent, module = int(match.group(2)), len(match.group(3)), match.group(4)
+        if module == "main":
+            total = cumulative
+        elif indent == 3:
+            children.append((cumulative, module))
+    return total, sorted(children, reverse=True)[:5]
+
+
+def write_story(tmp):
+    story = json.loads(STORY_FILE.read_text(encoding="utf-8"))
+    story["scenes"] = story["scenes"][:1]
+    story["seed_strategy"] = {"global_num_images": 1, "base_seed": 1}
+    story["story_pipeline_mode"] = "twopass"
+    story["models"]["controlnet_openpose"] = None
+    (tmp / "story.json").write_text(json.dumps(story), encoding="utf-8")
+    (tmp / "in").mkdir(exist_ok=True)
+    return story["models"]
+
+
+def timed_run(tmp, headless, env):
+    # A finished manifest would make the next run skip rendering.
+    shutil.rmtree(tmp / "out", ignore_errors=True)
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", DRIVER.format(base=str(BASE_DIR), tmp=str(tmp), headless=headless)],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, encoding="utf-8", errors="replace",
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(f"run failed (exit {result.returncode}):\n{result.stdout[-2000:]}\n{result.stderr[-2000:]}")
+    return elapsed, len(result.stdout.splitlines())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.runs):
+        total, slowest = import_profile()
+        totals.append(total)
+    print(f"import main: {statistics.median(totals) / 1000:.1f} ms (median of {args.runs})")
+    for cumulative, module in slowest:
+        print(f"  {module:<24} {cumulative / 1000:7.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp_name:
+        tmp = Path(tmp_name)
+        models = write_story(tmp)
+        names = tuple(dict.fromkeys(m for m in (models.get("draft_model"), models.get("final_model")) if m))
+        with FakeWebUI(models=names) as fake:
+            env = {**os.environ, "PROJECT_ERO_WEBUI_URLS": fake.url}
+            env.pop("PROJECT_ERO_HEADLESS", None)
+            print(f"\none-image story run, {args.runs} runs each:")
+            for label, headless in (("interactive", False), ("headless", True)):
+                runs = [timed_run(tmp, headless, env) for _ in range(args.runs)]
+                seconds = statistics.median(elapsed for elapsed, _ in runs)
+                print(f"  {label:<12} {seconds * 1000:8.0f} ms wall clock, {runs[-1][1]} stdout lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Compare core.utils.smart_process_tags with the nested-loop filter it replaced.
+
+Usage: python tools/bench_tag_filter.py [--tags 10000] [--words 1000] [--runs 5]
+"""
+import argparse
+import random
+import statistics
+import string
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from core.settings import GLOBAL_TAG_BLACKLIST, TAG_CONFLICT_MAP
+from core.utils import compile_tag_blacklist, smart_process_tags
+
+
+def reference_process_tags(scanned_tags_str, user_prompt, weight, blocked_list=None):
+    """The original smart_process_tags: every tag against every block word."""
+    if not scanned_tags_str:
+        return ""
+
+    scanned_list = [t.strip() for t in scanned_tags_str.split(',')]
+    user_prompt_lower = user_prompt.lower()
+
+    active_blacklist = set(GLOBAL_TAG_BLACKLIST)
+    if blocked_list:
+        active_blacklist.update(blocked_list)
+
+    for user_key, conflict_vals in TAG_CONFLICT_MAP.items():
+        if user_key in user_prompt_lower:
+            active_blacklist.update(conflict_vals)
+
+    kept_tags = []
+    for tag in scanned_list:
+        is_blocked = False
+        for block_word in active_blacklist:
+            if block_word in tag:
+                is_blocked = True
+                break
+        if not is_blocked:
+            kept_tags.append(tag)
+
+    if not kept_tags:
+        return ""
+
+    joined_tags = ", ".join(kept_tags)
+    return f"({joined_tags}:{weight})"
+
+
+def random_word(rng):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+
+
+def sample_inputs(tag_count, word_count, seed=0):
+    rng = random.Random(seed)
+    block_words = [" ".join(random_word(rng) for _ in range(rng.randint(1, 2))) for _ in range(word_count)]
+    tags = [" ".join(random_word(rng) for _ in range(rng.randint(1, 3))) for _ in range(tag_count)]
+    # Make sure a share of the tags actually hits the blocklist.
+    for i in range(0, tag_count, 7):
+        tags[i] = f"{tags[i]} {rng.choice(block_words)}"
+    return ", ".join(tags), block_words
+
+
+def time_runs(fn, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the remix tag filter.")
+    parser.add_argument("--tags", type=int, default=10000)
+    parser.add_argument("--words", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    scanned, block_words = sample_inputs(args.tags, args.words)
+    user_prompt = "1girl, black hair, red eyes"
+    print(f"Payload: {args.tags} tags x {args.words} block words")
+
+    expected = reference_process_tags(scanned, user_prompt, 0.6, block_words)
+    assert smart_process_tags(scanned, user_prompt, 0.6, block_words) == expected
+
+    compile_tag_blacklist.cache_clear()
+    t0 = time.perf_counter()
+    smart_process_tags(scanned, user_prompt, 0.6, block_words)
+    first_call = time.perf_counter() - t0
+
+    results = {
+        "nested loops": time_runs(lambda: reference_process_tags(scanned, user_prompt, 0.6, block_words), args.runs),
+        "compiled matcher": time_runs(lambda: smart_process_tags(scanned, user_prompt, 0.6, block_words), args.runs),
+    }
+    baseline = statistics.median(results["nested loops"])
+    for name, samples in results.items():
+        median = statistics.median(samples)
+        print(f"{name:<18} median {median * 1000:8.2f} ms   min {min(samples) * 1000:8.2f} ms   "
+              f"x{baseline / median:.1f}")
+    print(f"{'first call':<18} {first_call * 1000:8.2f} ms (includes compiling the matcher)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""Local stand-in for the SD WebUI API, for tests, offline runs and benchmarks.
+
+Serves txt2img/img2img (real PNGs), options, progress, interrogate,
+sd-models, memory, /controlnet/model_list and /adetailer/v1/ad_model.
+Generation takes generate_delay plus step_delay per sampling step per
+image; fail_rate and oom_batch inject HTTP 500s.
+
+Usage: python tools/fake_webui.py [--port 7860] [--model NAME] [--step-delay 0.02] [--fail-rate 0.1]
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image
+
+
+def render_png(width, height, seed=0, noise=False):
+    if noise:
+        return render_noise_png(width, height)
+    color = (seed * 37 % 256, seed * 91 % 256, seed * 53 % 256)
+    buffer = BytesIO()
+    Image.new("RGB", (max(1, width), max(1, height)), color=color).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+@lru_cache(maxsize=8)
+def render_noise_png(width, height):
+    """Incompressible image, so responses are as large as real renders."""
+    width, height = max(1, width), max(1, height)
+    buffer = BytesIO()
+    Image.frombytes("RGB", (width, height), os.urandom(width * height * 3)).save(buffer, format="PNG", compress_level=1)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+AD_MODELS = ["face_yolov8n.pt", "face_yolov8s.pt", "hand_yolov8n.pt", "person_yolov8n-seg.pt", "mediapipe_face_full"]
+CONTROLNET_MODELS = ["control_v11p_sd15_openpose [cab727d4]", "thibaud_xl_openpose [c7b9cadd]"]
+
+
+class FakeWebUIState:
+    def __init__(self, models, loaded_model, model_load_delay, generate_delay=0.0, noise=False,
+                 step_delay=0.0, fail_rate=0.0, oom_batch=None, fail_seed=0):
+        self.lock = threading.Lock()
+        self.models = list(models)
+        self.loaded_model = loaded_model
+        self.model_load_delay = model_load_delay
+        self.generate_delay = generate_delay
+        # Seconds per sampling step per image, so time follows the request's steps and batch size.
+        self.step_delay = step_delay
+        self.noise = noise
+        # Failure injection: a fraction of generations answer 500, and batches above oom_batch run out of memory.
+        self.fail_rate = fail_rate
+        self.oom_batch = oom_batch
+        self.rng = random.Random(fail_seed)
+        self.failures = 0
+        self.requests = {}
+        self.generations = []
+        self.model_loads = 0
+        self.active = 0
+        self.max_active = 0
+        # Time with at least one generation running; the rest of a run the "GPU" waited on the client.
+        self.busy_seconds = 0.0
+        self._busy_since = None
+        self.current_job = None
+        # VRAM reported by /sdapi/v1/memory: a resident model plus a slice per image being generated.
+        self.vram_total = 24 * 1024 ** 3
+        self.vram_base = 3 * 1024 ** 3
+        self.vram_per_image = 1536 * 1024 ** 2
+        self.active_images = 0
+        self.vram_peak = self.vram_base
+
+    def count(self, path):
+        with self.lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def generation_seconds(self, payload, count):
+        return self.generate_delay + self.step_delay * int(payload.get("steps", 20)) * count
+
+    def injected_failure(self, count):
+        """(status, body) to answer instead of generating, or None."""
+        with self.lock:
+            if self.oom_batch is not None and count > self.oom_batch:
+                self.failures += 1
+                return 500, {"error": "OutOfMemoryError",
+                             "detail": f"CUDA out of memory. Batch of {count} is above {self.oom_batch}."}
+            if self.fail_rate and self.rng.random() < self.fail_rate:
+                self.failures += 1
+                return 500, {"error": "RuntimeError", "detail": "Injected failure"}
+        return None
+
+    def progress(self):
+        with self.lock:
+            if not self.active or self.current_job is None:
+                return 0.0, 0.0
+            started, seconds = self.current_job
+        elapsed = time.monotonic() - started
+        if seconds <= 0:
+            return 0.5, 0.0
+        return min(0.99, elapsed / seconds), max(0.0, seconds - elapsed)
+
+    def stats(self):
+        with self.lock:
+            busy = self.busy_seconds
+            if self._busy_since is not None:
+                busy += time.monotonic() - self._busy_since
+            return {
+                "requests": dict(self.requests),
+                "generations": len(self.generations),
+                "images": sum(g["images"] for g in self.generations),
+                "model_loads": self.model_loads,
+                "failures": self.failures,
+                "max_active": self.max_active,
+                "busy_seconds": round(busy, 3),
+            }
+
+
+class FakeWebUIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def do_GET(self):
+        self.state.count(self.path)
+        if self.path == "/sdapi/v1/progress":
+            progress, eta = self.state.progress()
+            self._send_json({"progress": progress, "eta_relative": eta,
+                             "state": {"job_count": self.state.active}, "current_image": None})
+        elif self.path == "/sdapi/v1/options":
+            self._send_json({"sd_model_checkpoint": self.state.loaded_model, "sd_vae": "Automatic"})
+        elif self.path == "/sdapi/v1/sd-models":
+            self._send_json([{"title": m, "model_name": m.split(" [")[0]} for m in self.state.models])
+        elif self.path == "/sdapi/v1/memory":
+            with self.state.lock:
+                used = min(self.state.vram_total, self.state.vram_base + self.state.active_images * self.state.vram_per_image)
+                total, peak = self.state.vram_total, self.state.vram_peak
+            self._send_json({
+                "ram": {"free": 8 * 1024 ** 3, "used": 8 * 1024 ** 3, "total": 16 * 1024 ** 3},
+                "cuda": {
+                    "system": {"free": total - used, "used": used, "total": total},
+                    "active": {"current": used, "peak": peak},
+                    "events": {"retries": 0, "oom": 0},
+                },
+            })
+        elif self.path == "/controlnet/model_list":
+            self._send_json({"model_list": CONTROLNET_MODELS})
+        elif self.path == "/adetailer/v1/ad_model":
+            self._send_json({"ad_model": AD_MODELS})
+        else:
+            self._send_json({"detail": "Not Found"}, status=404)
+
+    def do_POST(self):
+        self.state.count(self.path)
+        payload = self._read_json() or {}
+        if self.path == "/sdapi/v1/options":
+            model = payload.get("sd_model_checkpoint")
+            if model and model != self.state.loaded_model:
+                time.sleep(self.state.model_load_delay)
+                with self.state.lock:
+                    self.state.loaded_model = model
+                    self.state.model_loads += 1
+            self._send_json(None)
+        elif self.path in ("/sdapi/v1/txt2img", "/sdapi/v1/img2img"):
+            self._generate(payload)
+        elif self.path == "/sdapi/v1/interrogate":
+            self._send_json({"caption": "1girl, solo, long hair, smile, outdoors"})
+        elif self.path == "/sdapi/v1/interrupt":
+            self._send_json(None)
+        else:
+            self._send_json({"detail": "Not Found"}, status=404)
+
+    def _generate(self, payload):
+        count = int(payload.get("batch_size", 1)) * int(payload.get("n_iter", 1))
+        seed = int(payload.get("seed", -1))
+        failure = self.state.injected_failure(count)
+        if failure:
+            status, body = failure
+            self._send_json(body, status=status)
+            return
+        seconds = self.state.generation_seconds(payload, count)
+        with self.state.lock:
+            if self.state.active == 0:
+                self.state._busy_since = time.monotonic()
+            self.state.current_job = (time.monotonic(), seconds)
+            self.state.active += 1
+            self.state.max_active = max(self.state.max_active, self.state.active)
+            self.state.active_images += count
+            self.state.vram_peak = max(
+                self.state.vram_peak, self.state.vram_base + self.state.active_images * self.state.vram_per_image
+            )
+            self.state.generations.append({
+                "endpoint": self.path.rsplit("/", 1)[-1],
+                "model": self.state.loaded_model,
+                "images": count,
+                "prompt": payload.get("prompt", ""),
+            })
+        try:
+            time.sleep(seconds)
+            # Like the WebUI, seed -1 means a random seed per image, reported in all_seeds.
+            seeds = [seed + i if seed >= 0 else random.randrange(2 ** 32) for i in range(count)]
+            images = [
+                render_png(int(payload.get("width", 64)), int(payload.get("height", 64)), s, noise=self.state.noise)
+                for s in seeds
+            ]
+            info = json.dumps({
+                "infotexts": [f"{payload.get('prompt', '')}\nSeed: {s}" for s in seeds],
+                "seed": seeds[0] if seeds else seed, "all_seeds": seeds,
+            })
+            self._send_json({"images": images, "parameters": {}, "info": info})
+        finally:
+            with self.state.lock:
+                self.state.active -= 1
+                self.state.active_images -= count
+                if self.state.active == 0:
+                    self.state.busy_seconds += time.monotonic() - self.state._busy_since
+                    self.state._busy_since = None
+
+
+class FakeWebUI:
+    """Threaded fake WebUI server; use as a context manager and read .url / .state."""
+
+    def __init__(self, host="127.0.0.1", port=0, models=("fake_model_a.safetensors [aaaa]",),
+                 loaded_model=None, model_load_delay=0.0, generate_delay=0.0, noise=False,
+                 step_delay=0.0, fail_rate=0.0, oom_batch=None, fail_seed=0):
+        self.server = ThreadingHTTPServer((host, port), FakeWebUIHandler)
+        self.server.daemon_threads = True
+        self.server.state = FakeWebUIState(
+            models, loaded_model or models[0], model_load_delay, generate_delay, noise,
+            step_delay=step_delay, fail_rate=fail_rate, oom_batch=oom_batch, fail_seed=fail_seed,
+        )
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake SD WebUI API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--model", action="append", help="checkpoint title to advertise (repeatable)")
+    parser.add_argument("--model-load-delay", type=float, default=0.0)
+    parser.add_argument("--generate-delay", type=float, default=0.0, help="seconds each txt2img/img2img takes")
+    parser.add_argument("--step-delay", type=float, default=0.0, help="extra seconds per sampling step per image")
+    parser.add_argument("--noise", action="store_true", help="return random-noise images as large as real renders")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of generations answered with HTTP 500")
+    parser.add_argument("--oom-batch", type=int, default=None, help="batches larger than this fail as out of memory")
+    args = parser.parse_args()
+
+    fake = FakeWebUI(args.host, args.port, models=tuple(args.model or ["fake_model_a.safetensors [aaaa]"]),
+                     model_load_delay=args.model_load_delay, generate_delay=args.generate_delay, noise=args.noise,
+                     step_delay=args.step_delay, fail_rate=args.fail_rate, oom_batch=args.oom_batch)
+    print(f"Fake SD WebUI listening on {fake.url}", file=sys.stderr)
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Interrogate every image in inputs/ ahead of a remix run and fill the tag cache.
+
+Later remix runs (main.py or the WebUI) then only spend GPU time on img2img,
+however often remix_settings are tweaked. Images already in the cache are skipped.
+
+Usage: python tools/pretag_inputs.py [--dir inputs] [--model deepdanbooru] [--workers N]
+"""
+import argparse
+import base64
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from tqdm import tqdm
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from core.backend_pool import BackendPool
+from core.client import SDClient
+from core.settings import INPUT_DIR
+from core.tag_cache import build_tag_cache
+from core.utils import list_input_images
+
+
+def pretag(paths, pool, cache, model="deepdanbooru", workers=1):
+    """Interrogate the images not yet cached; returns (cached, tagged, failed) counts."""
+    todo = []
+    cached = 0
+    for path in paths:
+        image_b64 = base64.b64encode(Path(path).read_bytes()).decode()
+        if cache.contains(image_b64, model):
+            cached += 1
+        else:
+            todo.append(image_b64)
+
+    failed = 0
+    with tqdm(total=len(todo), desc="PRETAG", ncols=120, leave=True) as bar:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for caption in executor.map(lambda image_b64: pool.interrogate(image_b64, model=model), todo):
+                failed += not caption
+                bar.update(1)
+    return cached, len(todo) - failed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-tag remix inputs into the interrogation cache.")
+    parser.add_argument("--dir", type=Path, default=INPUT_DIR)
+    parser.add_argument("--model", default="deepdanbooru")
+    parser.add_argument("--workers", type=int, help="concurrent interrogations (default: one per WebUI)")
+    args = parser.parse_args()
+
+    cache = build_tag_cache()
+    if cache is None:
+        print("TAG_CACHE_SETTINGS['enabled'] is False; nothing to fill.")
+        return 1
+    with BackendPool(client_factory=partial(SDClient, tag_cache=cache)) as pool:
+        if not pool.check_connection():
+            print("No WebUI is responding.")
+            return 1
+        paths = list_input_images(args.dir)
+        cached, tagged, failed = pretag(paths, pool, cache, args.model, args.workers or len(pool.backends))
+    cache.close()
+    print(f"{len(paths)} images: {cached} already cached, {tagged} tagged, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
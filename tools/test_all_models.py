@@ -7,7 +7,6 @@ import time
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
-import requests
 from core.client import SDClient
 from core.utils import ensure_dir, save_image, configure_utf8_console, extract_infotext
 
@@ -23,9 +22,7 @@ def main():
 
     # 1. Query all checkpoints from WebUI
     try:
-        r = requests.get(f"{sd.api_url}/sd-models", timeout=10)
-        r.raise_for_status()
-        models_list = r.json()
+        models_list = sd.get_sd_models()
     except Exception as e:
         print(f"Error querying models: {e}")
         return
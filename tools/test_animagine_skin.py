@@ -5,7 +5,6 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
-import requests
 from core.client import SDClient
 from core.utils import ensure_dir, save_image, configure_utf8_console, extract_infotext
 
@@ -6,12 +6,16 @@ import requests
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from core.client import SDClient
+
 STORY_PATH = BASE_DIR / "data" / "story.json"
 WEBUI_URL = "http://127.0.0.1:7860"
 
 
-def get_json(path):
-    response = requests.get(f"{WEBUI_URL}{path}", timeout=10)
+def get_json(client, path):
+    response = client.session.get(f"{client.base_url}{path}", timeout=10)
     response.raise_for_status()
     return response.json()
 
@@ -32,10 +36,11 @@ def main():
         print(f"Failed to load story config: {exc}", file=sys.stderr)
         raise SystemExit(1) from exc
 
+    client = SDClient(WEBUI_URL)
     try:
-        checkpoints = get_json("/sdapi/v1/sd-models")
-        controlnet_models = get_json("/controlnet/model_list").get("model_list", [])
-        adetailer_models = get_json("/adetailer/v1/ad_model").get("ad_model", [])
+        checkpoints = client.get_sd_models()
+        controlnet_models = client.get_controlnet_models()
+        adetailer_models = get_json(client, "/adetailer/v1/ad_model").get("ad_model", [])
     except requests.RequestException as exc:
         print(f"Failed to query SD WebUI assets: {exc}", file=sys.stderr)
         raise SystemExit(1) from exc
@@ -7,36 +7,75 @@ import base64
 import uuid
 import json
 import subprocess
+import asyncio
+from email.utils import formatdate, parsedate_to_datetime
+from contextlib import ExitStack, asynccontextmanager
+from functools import partial
 
 # Add project root to sys.path
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 import uvicorn
-import requests
 
+from core.async_client import AsyncSDClient
+from core.backend_pool import BackendPool
 from core.client import SDClient
-from core.utils import ensure_dir, save_image, extract_infotext, smart_process_tags
+from core.render_cache import build_render_cache
+from core.tag_cache import build_tag_cache
+from core.utils import ensure_dir, save_image, extract_infotext, extract_seeds, smart_process_tags
 from core.settings import AD_PRESETS
-from webui.job_history import normalize_loaded_job
+from webui.change_feed import ChangeFeed
+from webui.job_history import FINISHED_STATUSES, can_transition, job_checkpoint, job_summary
+from webui.job_store import JobStore
+from webui.scheduler import SCHEDULER_MODES, new_scheduler_stats, pick_next
+from webui.status_poller import StatusPoller, estimate_queue_eta
+from webui.thumbnails import ThumbnailCache
+from webui.worker_pool import WorkerPool
 
 APP_VERSION = "v2.1"
 WEBUI_HOST = os.getenv("PROJECT_ERO_HOST", "127.0.0.1")
 WEBUI_PORT = int(os.getenv("PROJECT_ERO_PORT", "8000"))
-
-app = FastAPI(title=f"Project Ero WebUI {APP_VERSION}")
+# "fifo" runs jobs in queue order; "affinity" reorders to minimize checkpoint swaps.
+SCHEDULER_MODE = os.getenv("PROJECT_ERO_SCHEDULER", "fifo")
+if SCHEDULER_MODE not in SCHEDULER_MODES:
+    raise ValueError(f"PROJECT_ERO_SCHEDULER must be one of {SCHEDULER_MODES}")
+# Seconds between shared samples of WebUI progress/health; browsers read the cached snapshot.
+STATUS_POLL_INTERVAL = float(os.getenv("PROJECT_ERO_POLL_INTERVAL", "1.0"))
+# Concurrent jobs each SD WebUI may run, and threads writing PNGs / cleaning drafts.
+WORKERS_PER_BACKEND = int(os.getenv("PROJECT_ERO_WORKERS_PER_BACKEND", "1"))
+SAVE_WORKERS = int(os.getenv("PROJECT_ERO_SAVE_WORKERS", "2"))
+# Largest n_iter sent in one request; bigger jobs are split and each chunk saved before the next.
+MAX_IMAGES_PER_REQUEST = max(1, int(os.getenv("PROJECT_ERO_MAX_IMAGES_PER_REQUEST", "4")))
+OUTPUT_ROOT = Path(os.getenv("PROJECT_ERO_OUTPUT_ROOT", str(BASE_DIR / "outputs")))
+# Job cards load small WebP thumbnails instead of full PNGs; least recently used ones go past the limit.
+THUMB_MAX_MB = float(os.getenv("PROJECT_ERO_THUMB_MAX_MB", "256"))
+THUMB_FORMAT = os.getenv("PROJECT_ERO_THUMB_FORMAT", "webp")
+
+@asynccontextmanager
+async def lifespan(app):
+    status_poller.start()
+    worker_pool.start()
+    yield
+    await status_poller.stop()
+    await asyncio.to_thread(worker_pool.stop)
+
+app = FastAPI(title=f"Project Ero WebUI {APP_VERSION}", lifespan=lifespan)
 
 # Directory setup
 STATIC_DIR = Path(__file__).resolve().parent / "static"
 DATA_DIR = Path(__file__).resolve().parent / "data"
-OUTPUT_DIR = BASE_DIR / "outputs" / "webui_jobs"
-DRAFT_DIR = BASE_DIR / "outputs" / "draft_temp"
-REMIX_DIR = BASE_DIR / "outputs" / "remix_inputs"
+OUTPUT_DIR = OUTPUT_ROOT / "webui_jobs"
+DRAFT_DIR = OUTPUT_ROOT / "draft_temp"
+REMIX_DIR = OUTPUT_ROOT / "remix_inputs"
+# Kept outside OUTPUT_DIR so /api/images can never serve it.
+JOB_DB_FILE = OUTPUT_ROOT / "webui_jobs.sqlite3"
+THUMB_DIR = OUTPUT_ROOT / "webui_thumbs"
 
 ensure_dir(STATIC_DIR)
 ensure_dir(DATA_DIR)
@@ -52,46 +91,76 @@ TEMPLATES_FILE = DATA_DIR / "templates.json"
 job_queue_list = []  # List of job_ids (replaces queue.Queue)
 jobs = {}  # job_id -> dict with job details
 jobs_lock = threading.Lock() # Protects jobs dict AND job_queue_list
+scheduler_stats = new_scheduler_stats(SCHEDULER_MODE)
+
+# Generation is dispatched across every configured SD WebUI (see WEBUI_API_URLS).
+render_cache = build_render_cache(root=OUTPUT_ROOT / "render_cache")
+tag_cache = build_tag_cache(path=OUTPUT_ROOT / "tag_cache.sqlite3")
+thumbs = ThumbnailCache(THUMB_DIR, max_bytes=int(THUMB_MAX_MB * 1024 ** 2), fmt=THUMB_FORMAT)
+backend_pool = BackendPool(
+    slots=WORKERS_PER_BACKEND, client_factory=partial(SDClient, render_cache=render_cache, tag_cache=tag_cache)
+)
+sd = backend_pool.primary
+# Request handlers use async clients so WebUI polling never ties up the threadpool.
+async_clients = {b.url: AsyncSDClient(b.url) for b in backend_pool.backends}
+asd = async_clients[sd.base_url]
+# The poller's samples also keep the pool's health and loaded models fresh for the worker.
+status_poller = StatusPoller(async_clients, interval=STATUS_POLL_INTERVAL, on_sample=backend_pool.observe)
+# Largest page /api/history and /api/jobs return.
+HISTORY_MAX_PAGE = 200
+# Moving average of generation time, used for the queue ETA in /api/scheduler.
+worker_stats = {"seconds_per_image": None}
+
+job_store = JobStore(JOB_DB_FILE)
+# Every persisted mutation also bumps the change feed that /api/jobs?since and /api/events read.
+job_feed = ChangeFeed()
+running_job_ids = set()  # Running/Canceling jobs, so streams know when to push progress
+
+def publish_job_unlocked(job_id):
+    job_feed.touch(job_id)
+    if jobs[job_id]["status"] in ("Running", "Canceling"):
+        running_job_ids.add(job_id)
+    else:
+        running_job_ids.discard(job_id)
 
-sd = SDClient()
-
-# Helper to load/save jobs with lock
-def save_job_unlocked(job_id):
+# Helpers to persist jobs; callers hold jobs_lock so writes land in state order.
+def save_job_unlocked(job_id, with_queue=False):
     if job_id not in jobs:
         return
-    job_file = OUTPUT_DIR / f"{job_id}.json"
-    # Never write massive base64 strings to history JSON
-    job_copy = dict(jobs[job_id])
-    req_copy = dict(job_copy["request"])
-    if req_copy.get("init_image"):
-        req_copy["init_image"] = "<saved_to_disk>"
-    job_copy["request"] = req_copy
-    
-    with open(job_file, "w", encoding="utf-8") as f:
-        json.dump(job_copy, f, ensure_ascii=False, indent=2)
+    job_store.save(jobs[job_id], queue=list(job_queue_list) if with_queue else None)
+    publish_job_unlocked(job_id)
+    if with_queue:
+        job_feed.touch_queue()
+
+def save_queue_unlocked():
+    job_store.save_queue(job_queue_list)
+    job_feed.touch_queue()
 
 def set_job_status(job_id, status, phase_text=None, error=None):
+    """Apply a status change allowed by JOB_TRANSITIONS; returns False if it was refused."""
     with jobs_lock:
-        if job_id in jobs:
-            jobs[job_id]["status"] = status
-            if phase_text is not None:
-                jobs[job_id]["phase_text"] = phase_text
-            if error is not None:
-                jobs[job_id]["error"] = error
-            save_job_unlocked(job_id)
+        if job_id not in jobs or not can_transition(jobs[job_id]["status"], status):
+            return False
+        jobs[job_id]["status"] = status
+        if phase_text is not None:
+            jobs[job_id]["phase_text"] = phase_text
+        if error is not None:
+            jobs[job_id]["error"] = error
+        job_store.update_status(job_id, status, phase_text, error)
+        publish_job_unlocked(job_id)
+        return True
 
 def load_history():
     print("Scanning for job history...")
+    migrated = job_store.migrate_json_dir(OUTPUT_DIR)
+    if migrated:
+        print(f"Migrated {migrated} JSON job files into {JOB_DB_FILE.name}.")
+    loaded_jobs, queue = job_store.load()
     with jobs_lock:
-        for json_file in OUTPUT_DIR.glob("*.json"):
-            try:
-                with open(json_file, "r", encoding="utf-8") as f:
-                    job_data, changed = normalize_loaded_job(json.load(f))
-                    jobs[job_data["id"]] = job_data
-                    if changed:
-                        save_job_unlocked(job_data["id"])
-            except Exception as e:
-                print(f"Failed to load {json_file.name}: {e}")
+        jobs.update(loaded_jobs)
+        job_queue_list[:] = queue
+        for job_id in loaded_jobs:
+            job_feed.touch(job_id)
     print(f"Loaded {len(jobs)} jobs from history.")
 
 load_history()
@@ -112,6 +181,7 @@ class JobRequest(BaseModel):
     denoise_str: float = 0.5
     cn_weight: float = 0.7
     total_images: int = 1
+    seed: int = -1
     auto_hires: bool = True
     ad_modes: list[str] = []
     init_image: Optional[str] = None
@@ -133,12 +203,11 @@ def is_sdxl_model(model_name):
 def get_vae_for_model(model_name):
     return "sdxl_vae.safetensors" if is_sdxl_model(model_name) else "anime.vae.pt"
 
-def get_controlnet_model_for_base(model_name):
+def get_controlnet_model_for_base(model_name, client=sd):
     is_xl = is_sdxl_model(model_name)
     try:
-        res = requests.get(f"{sd.base_url}/controlnet/model_list", timeout=10)
-        if res.status_code == 200:
-            models = res.json().get("model_list", [])
+        models = client.get_controlnet_models()
+        if models:
             for m in models:
                 m_lower = m.lower()
                 if "openpose" in m_lower:
@@ -150,256 +219,455 @@ def get_controlnet_model_for_base(model_name):
         pass
     return "thibaud_xl_openpose [...]" if is_xl else "control_v11p_sd15_openpose"
 
-def worker():
-    print("Worker thread started...")
-    while True:
-        job_id = None
-        with jobs_lock:
-            if job_queue_list:
-                job_id = job_queue_list.pop(0)
+def lease_backend(stack, job_id, model_name):
+    client = stack.enter_context(backend_pool.lease(model_name))
+    with jobs_lock:
+        jobs[job_id]["backend"] = client.base_url
+        save_job_unlocked(job_id)
+    return client
+
+def safe_task_name(req):
+    task_name = req.get("task_name", "Task").strip() or "Task"
+    # Ensure task name is safe for filesystem
+    return "".join(c for c in task_name if c.isalnum() or c in (' ', '-', '_')).rstrip() or "Task"
+
+def output_filename(job_id, req, index):
+    return f"{safe_task_name(req)}_{job_id}_{index+1:04d}.png"
+
+def draft_path(job_id, index):
+    return DRAFT_DIR / f"{job_id}_draft_{index}.png"
+
+def add_job_image(job_id, filename, index, seed=None):
+    with jobs_lock:
+        job = jobs[job_id]
+        urls = job["image_urls"]
+        urls.append(f"/api/images/{filename}")
+        # Saves finish out of order; filenames end in the image index.
+        urls.sort()
+        job_checkpoint(job)["outputs"][str(index)] = seed
+        save_job_unlocked(job_id)
+
+def verify_checkpoint(job_id, req):
+    """Check the job's checkpoint against the files on disk before (re)running it.
+
+    Returns (indices still missing an output, indices with a draft on disk).
+    Entries whose file is gone are dropped; image_urls is rebuilt from the rest.
+    A job without a checkpoint (new, or saved before checkpoints existed) adopts
+    the outputs already on disk with their seed unknown, so a resume never
+    overwrites them.
+    """
+    with jobs_lock:
+        legacy = "checkpoint" not in jobs[job_id]
+        checkpoint = job_checkpoint(jobs[job_id])
+        outputs, drafts = dict(checkpoint["outputs"]), dict(checkpoint["drafts"])
+    if legacy:
+        outputs = {str(idx): None for idx in range(req.get("total_images", 1))}
+    outputs = {k: v for k, v in outputs.items() if (OUTPUT_DIR / output_filename(job_id, req, int(k))).exists()}
+    drafts = {k: v for k, v in drafts.items() if draft_path(job_id, int(k)).exists()}
+    with jobs_lock:
+        job = jobs[job_id]
+        job["checkpoint"] = {"outputs": outputs, "drafts": drafts}
+        job["image_urls"] = sorted(f"/api/images/{output_filename(job_id, req, int(k))}" for k in outputs)
+        save_job_unlocked(job_id)
+    missing = [idx for idx in range(req.get("total_images", 1)) if str(idx) not in outputs]
+    return missing, {int(k) for k in drafts}
+
+def park_for_refine(job_id, queue_index):
+    """Requeue a twophase job whose drafts are on disk until the final model is up."""
+    with jobs_lock:
+        job = jobs[job_id]
+        if job["status"] == "Canceling":
+            return False
+        job.update(
+            status="Pending", stage="refine", skips=0, pinned=False,
+            phase_text="Phase 1 ✓ Waiting for final model...",
+        )
+        job_queue_list.insert(min(queue_index, len(job_queue_list)), job_id)
+        save_job_unlocked(job_id, with_queue=True)
+    worker_pool.wake()
+    return True
+
+def load_draft(job_id, index):
+    draft_file = draft_path(job_id, index)
+    if not draft_file.exists():
+        raise Exception(f"Draft missing for refine: {draft_file.name}")
+    with open(draft_file, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+def remove_parked_drafts(job_id):
+    for draft_file in DRAFT_DIR.glob(f"{job_id}_draft_*.png"):
+        try:
+            draft_file.unlink()
+        except Exception:
+            pass
+
+def record_job_time(seconds, image_count):
+    per_image = seconds / image_count
+    with jobs_lock:
+        previous = worker_stats["seconds_per_image"]
+        worker_stats["seconds_per_image"] = per_image if previous is None else 0.7 * previous + 0.3 * per_image
+
+def save_job_image(job_id, b64_img, filename, index, info_text=None, seed=None):
+    save_image(b64_img, OUTPUT_DIR / filename, info_text=info_text)
+    try:
+        thumbs.generate(OUTPUT_DIR / filename)
+    except Exception as e:
+        # /api/thumbs makes it on first request instead.
+        print(f"[{job_id}] Thumbnail failed for {filename}: {e}")
+    add_job_image(job_id, filename, index, seed)
+
+def save_draft(job_id, index, draft_b64, seed=None):
+    save_image(draft_b64, draft_path(job_id, index))
+    with jobs_lock:
+        job_checkpoint(jobs[job_id])["drafts"][str(index)] = seed
+        save_job_unlocked(job_id)
+
+def save_refined_image(job_id, b64_img, filename, index, info_text=None, seed=None):
+    # The draft is only dropped once its final image is on disk, so a crash in between resumes from it.
+    save_job_image(job_id, b64_img, filename, index, info_text, seed)
+    try:
+        draft_path(job_id, index).unlink(missing_ok=True)
+    except Exception:
+        pass
+    with jobs_lock:
+        job_checkpoint(jobs[job_id])["drafts"].pop(str(index), None)
+        save_job_unlocked(job_id)
+
+def raise_if_canceling(job_id):
+    with jobs_lock:
+        if jobs[job_id]["status"] == "Canceling":
+            raise Exception("Canceled by user")
+
+def image_chunks(indices, size, consecutive=False):
+    """Split sorted indices into chunks of at most `size`.
+
+    With `consecutive`, a chunk never skips an index: the WebUI gives image i of
+    an n_iter request seed+i, so fixed-seed jobs must keep indices contiguous.
+    """
+    chunks = []
+    for index in indices:
+        if chunks and len(chunks[-1]) < size and (not consecutive or chunks[-1][-1] == index - 1):
+            chunks[-1].append(index)
+        else:
+            chunks.append([index])
+    return chunks
+
+def image_seed(req, index):
+    """Fixed-seed jobs give image i seed+i (cacheable, reproducible); -1 stays random."""
+    seed = req.get("seed", -1)
+    return seed + index if seed is not None and seed >= 0 else -1
+
+def generate_chunked(job_id, indices, label, generate, on_image, consecutive=False):
+    """Generate the images for `indices` with at most MAX_IMAGES_PER_REQUEST per request.
+
+    generate(n_iter, first_index) sends one request. on_image(index, b64_img,
+    info_text, seed) is called for each image before the next request goes out,
+    so only one chunk of base64 images is held at once and a crash loses at most
+    that chunk. Returns the number of images received.
+    """
+    received = done = 0
+    for chunk in image_chunks(indices, MAX_IMAGES_PER_REQUEST, consecutive):
+        if done:
+            raise_if_canceling(job_id)
+            set_job_status(job_id, "Running", f"{label} ({done}/{len(indices)})...")
+        done += len(chunk)
+        resp = generate(len(chunk), chunk[0])
+        info_text = extract_infotext(resp.get("info"))
+        seeds = extract_seeds(resp.get("info"))
+        for pos, (index, b64_img) in enumerate(zip(chunk, resp.get("images", []))):
+            on_image(index, b64_img, info_text, seeds[pos] if pos < len(seeds) else None)
+            received += 1
+    return received
+
+def finish_job(job_id, status, phase_text=None, error=None):
+    """Final status for a run; a job the user canceled meanwhile ends as Canceled instead."""
+    if not set_job_status(job_id, status, phase_text, error):
+        set_job_status(job_id, "Canceled", error="Canceled by user")
+
+def take_job():
+    """Pop the next job for a worker thread: (job_id, queue_index), or None when idle."""
+    loaded_models = [b["loaded_model"] for b in backend_pool.status() if b["healthy"]]
+    with jobs_lock:
+        queue_index = pick_next(job_queue_list, jobs, loaded_models, scheduler_stats, SCHEDULER_MODE)
+        if queue_index is None:
+            return None
+        job_id = job_queue_list.pop(queue_index)
+        save_queue_unlocked()
+    return job_id, queue_index
+
+def run_job(ticket, saves):
+    job_id, queue_index = ticket
+    # Double check if job still exists (could be deleted while in queue)
+    with jobs_lock:
+        if job_id not in jobs or jobs[job_id]["status"] != "Pending":
+            return
+        req = jobs[job_id]["request"]
+        stage = jobs[job_id].get("stage")
         
-        if job_id is None:
-            time.sleep(1)
-            continue
+    # Refused if the job was canceled between the pop and here.
+    if not set_job_status(job_id, "Running", "Starting..."):
+        return
+    lease_stack = ExitStack()
+    started_at = time.monotonic()
+    
+    try:
+        mode = req.get("mode", "standard")
         
-        # Double check if job still exists (could be deleted while in queue)
-        with jobs_lock:
-            if job_id not in jobs or jobs[job_id]["status"] != "Pending":
-                continue
-            req = jobs[job_id]["request"]
+        full_prompt = ", ".join(filter(bool, [req["global_prompt"], req["char_prompt"], req["action_prompt"]]))
+        ad_args = [AD_PRESETS[k] for k in req["ad_modes"] if k in AD_PRESETS]
+
+        total_images = req.get("total_images", 1)
+        # Only outputs missing from the checkpoint are generated, so a restart or retry resumes.
+        missing, drafts_on_disk = verify_checkpoint(job_id, req)
+        done_before = total_images - len(missing)
+        resume_note = f" | Resuming: {done_before} done" if done_before or drafts_on_disk else ""
+        print(f"[{job_id}] Mode: {mode.upper()} | Model: {req['model']} | Total Images: {total_images}{resume_note}")
+
+        def save_output(index, b64_img, info_text, seed):
+            saves.submit(save_job_image, job_id, b64_img, output_filename(job_id, req, index), index, info_text, seed)
+
+        # Random seeds can pack any missing indices into one request; fixed seeds need contiguous runs.
+        fixed_seed = image_seed(req, 0) >= 0
+
+        # Load remix init_image
+        init_img_b64 = None
+        if mode == "remix":
+            img_path = REMIX_DIR / f"{job_id}.png"
+            if img_path.exists():
+                with open(img_path, "rb") as f:
+                    init_img_b64 = base64.b64encode(f.read()).decode('utf-8')
+            elif req.get("init_image") and req["init_image"] != "<saved_to_disk>":
+                init_img_b64 = req["init_image"]
             
-        set_job_status(job_id, "Running", "Starting...")
-        
-        try:
-            mode = req.get("mode", "standard")
-            task_name = req.get("task_name", "Task").strip() or "Task"
-            # Ensure task name is safe for filesystem
-            task_name = "".join(c for c in task_name if c.isalnum() or c in (' ', '-', '_')).rstrip() or "Task"
+            if not init_img_b64:
+                raise Exception("No init image found for Remix mode on disk or in request.")
+
+        if not missing:
+            print(f"[{job_id}] All images were saved before the interruption.")
+
+        # ==============================
+        # STANDARD MODE
+        # ==============================
+        elif mode == "standard":
+            client = lease_backend(lease_stack, job_id, req["model"])
+            target_vae = get_vae_for_model(req["model"])
             
-            full_prompt = ", ".join(filter(bool, [req["global_prompt"], req["char_prompt"], req["action_prompt"]]))
-            ad_args = [AD_PRESETS[k] for k in req["ad_modes"] if k in AD_PRESETS]
-
-            print(f"[{job_id}] Mode: {mode.upper()} | Model: {req['model']} | Total Images: {req.get('total_images', 1)}")
-
-            # Load remix init_image
-            init_img_b64 = None
-            if mode == "remix":
-                img_path = REMIX_DIR / f"{job_id}.png"
-                if img_path.exists():
-                    with open(img_path, "rb") as f:
-                        init_img_b64 = base64.b64encode(f.read()).decode('utf-8')
-                elif req.get("init_image") and req["init_image"] != "<saved_to_disk>":
-                    init_img_b64 = req["init_image"]
-                
-                if not init_img_b64:
-                    raise Exception("No init image found for Remix mode on disk or in request.")
-
-            # ==============================
-            # STANDARD MODE
-            # ==============================
-            if mode == "standard":
-                if not sd.set_model(req["model"]): raise Exception("Failed to load model")
-                target_vae = get_vae_for_model(req["model"])
-                
-                # Check Auto Hires limits
-                is_xl = is_sdxl_model(req["model"])
-                safe_pixels = 1200000 if is_xl else 500000
-                current_pixels = req["width"] * req["height"]
-                
-                txt2img_kwargs = {}
-                base_w = req["width"]
-                base_h = req["height"]
-                
-                if req.get("auto_hires", True) and current_pixels > safe_pixels:
-                    set_job_status(job_id, "Running", "Resolution exceeds safe limit. Engaging Auto Hires. fix...")
-                    # Calculate safe base resolution (half size, rounded to nearest 8)
-                    base_w = (req["width"] // 2) // 8 * 8
-                    base_h = (req["height"] // 2) // 8 * 8
-                    
-                    txt2img_kwargs = {
-                        "enable_hr": True,
-                        "hr_scale": 2.0,
-                        "hr_upscaler": "R-ESRGAN 4x+ Anime6B",
-                        "hr_second_pass_steps": 15,
-                        "denoising_strength": 0.55,
-                        "hr_resize_x": req["width"],
-                        "hr_resize_y": req["height"],
-                        # SD WebUI bug workaround: hr_additional_modules=None causes
-                        # TypeError: argument of type 'NoneType' is not iterable
-                        "hr_additional_modules": [],
-                    }
-                
-                resp = sd.txt2img(
-                    prompt=full_prompt, negative_prompt=req["negative_prompt"],
-                    steps=req["steps"], width=base_w, height=base_h,
-                    cfg_scale=req["cfg_scale"], batch_size=1, n_iter=req.get("total_images", 1),
-                    sampler_name="Euler a", seed=-1, override_settings={"sd_vae": target_vae},
-                    adetailer_args=ad_args if ad_args else None,
-                    **txt2img_kwargs
-                )
-                
-                imgs = resp.get("images", [])
-                info_text = extract_infotext(resp.get("info"))
+            # Check Auto Hires limits
+            is_xl = is_sdxl_model(req["model"])
+            safe_pixels = 1200000 if is_xl else 500000
+            current_pixels = req["width"] * req["height"]
+            
+            txt2img_kwargs = {}
+            base_w = req["width"]
+            base_h = req["height"]
+            
+            if req.get("auto_hires", True) and current_pixels > safe_pixels:
+                set_job_status(job_id, "Running", "Resolution exceeds safe limit. Engaging Auto Hires. fix...")
+                # Calculate safe base resolution (half size, rounded to nearest 8)
+                base_w = (req["width"] // 2) // 8 * 8
+                base_h = (req["height"] // 2) // 8 * 8
                 
-                with jobs_lock:
-                    for idx, b64_img in enumerate(imgs):
-                        filename = f"{task_name}_{job_id}_{idx+1:04d}.png"
-                        save_image(b64_img, OUTPUT_DIR / filename, info_text=info_text)
-                        jobs[job_id]["image_urls"].append(f"/api/images/{filename}")
-
-            # ==============================
-            # TWO-PHASE MODE
-            # ==============================
-            elif mode == "twophase":
-                # Phase 1
-                if not req.get("final_model"): raise Exception("Final model not selected for Two-Phase mode.")
-                if not sd.set_model(req["model"]): raise Exception("Failed to load Draft model")
+                txt2img_kwargs = {
+                    "enable_hr": True,
+                    "hr_scale": 2.0,
+                    "hr_upscaler": "R-ESRGAN 4x+ Anime6B",
+                    "hr_second_pass_steps": 15,
+                    "denoising_strength": 0.55,
+                    "hr_resize_x": req["width"],
+                    "hr_resize_y": req["height"],
+                    # SD WebUI bug workaround: hr_additional_modules=None causes
+                    # TypeError: argument of type 'NoneType' is not iterable
+                    "hr_additional_modules": [],
+                }
+            
+            generate_chunked(job_id, missing, "Generating", lambda n_iter, first: client.txt2img(
+                prompt=full_prompt, negative_prompt=req["negative_prompt"],
+                steps=req["steps"], width=base_w, height=base_h,
+                cfg_scale=req["cfg_scale"], batch_size=1, n_iter=n_iter,
+                sampler_name="Euler a", seed=image_seed(req, first), override_settings={"sd_vae": target_vae},
+                adetailer_args=ad_args if ad_args else None,
+                **txt2img_kwargs
+            ), save_output, consecutive=fixed_seed)
+
+        # ==============================
+        # TWO-PHASE MODE
+        # ==============================
+        elif mode == "twophase":
+            if not req.get("final_model"): raise Exception("Final model not selected for Two-Phase mode.")
+            # Phase 1 only for outputs that have neither a final image nor a saved draft.
+            need_drafts = [idx for idx in missing if idx not in drafts_on_disk]
+            if need_drafts:
+                client = lease_backend(lease_stack, job_id, req["model"])
                 
                 set_job_status(job_id, "Running", "Phase 1: Generating Draft...")
                 
                 draft_w = req["width"] // 2
                 draft_h = req["height"] // 2
                 
-                draft_resp = sd.txt2img(
+                # Drafts go to disk as they arrive; Phase 2 and resumed runs read them back.
+                generate_chunked(job_id, need_drafts, "Phase 1: Generating Draft", lambda n_iter, first: client.txt2img(
                     prompt=full_prompt, negative_prompt=req["negative_prompt"],
                     steps=20, width=draft_w, height=draft_h,
-                    cfg_scale=req["cfg_scale"], batch_size=1, n_iter=req.get("total_images", 1),
-                    sampler_name="Euler a", seed=-1, override_settings={"sd_vae": get_vae_for_model(req["model"])}
-                )
-                draft_imgs = draft_resp.get("images", [])
-                
-                set_job_status(job_id, "Running", "Phase 1 ✓ → Phase 2 Running...")
-                
-                # Check for cancellation before switching models
-                with jobs_lock:
-                    if jobs[job_id]["status"] == "Canceling":
-                        raise Exception("Canceled by user")
+                    cfg_scale=req["cfg_scale"], batch_size=1, n_iter=n_iter,
+                    sampler_name="Euler a", seed=image_seed(req, first), override_settings={"sd_vae": get_vae_for_model(req["model"])}
+                ), lambda idx, draft_b64, info_text, seed: saves.submit(save_draft, job_id, idx, draft_b64, seed),
+                    consecutive=fixed_seed)
+                saves.wait()
+
+            if SCHEDULER_MODE == "affinity" and stage != "refine":
+                # Another worker may pick the refine stage as soon as it is parked.
+                if not park_for_refine(job_id, queue_index):
+                    raise Exception("Canceled by user")
+                return
+
+            set_job_status(job_id, "Running", "Phase 2 Running..." if stage == "refine" else "Phase 1 ✓ → Phase 2 Running...")
+            
+            # Check for cancellation before switching models
+            raise_if_canceling(job_id)
 
-                # Phase 2
-                if not sd.set_model(req["final_model"]): raise Exception("Failed to load Final model")
-                
-                cn_model = get_controlnet_model_for_base(req["final_model"])
-
-                for idx, draft_b64 in enumerate(draft_imgs):
-                    with jobs_lock:
-                        if jobs[job_id]["status"] == "Canceling":
-                            raise Exception("Canceled by user")
-
-                    draft_file = DRAFT_DIR / f"{job_id}_draft_{idx}.png"
-                    save_image(draft_b64, draft_file)
-
-                    refine_resp = sd.img2img(
-                        init_image_b64=draft_b64,
-                        prompt=full_prompt, negative_prompt=req["negative_prompt"],
-                        steps=req["steps"], width=req["width"], height=req["height"],
-                        cfg_scale=req["cfg_scale"], denoising_strength=req["denoise_str"],
-                        sampler_name="Euler a", override_settings={"sd_vae": get_vae_for_model(req["final_model"])},
-                        adetailer_args=ad_args if ad_args else None,
-                        controlnet_name=cn_model,
-                        controlnet_img=draft_b64,
-                        cn_weight=req["cn_weight"],
-                        cn_end=0.6,
-                        batch_size=1, n_iter=1
-                    )
-                    imgs = refine_resp.get("images", [])
-                    info_text = extract_infotext(refine_resp.get("info"))
-                    
-                    if imgs:
-                        filename = f"{task_name}_{job_id}_{idx+1:04d}.png"
-                        save_image(imgs[0], OUTPUT_DIR / filename, info_text=info_text)
-                        with jobs_lock:
-                            jobs[job_id]["image_urls"].append(f"/api/images/{filename}")
-                    
-                    if draft_file.exists():
-                        try:
-                            draft_file.unlink()
-                        except Exception:
-                            pass
-
-            # ==============================
-            # REMIX MODE
-            # ==============================
-            elif mode == "remix":
-                set_job_status(job_id, "Running", "Interrogating image tags...")
-                
-                raw_tags = sd.interrogate(init_img_b64, model="deepdanbooru")
-                processed_tags = smart_process_tags(raw_tags, req["char_prompt"], 1.0)
-                remix_prompt = f"{req['global_prompt']}, {processed_tags}, {req['char_prompt']}, {req['action_prompt']}"
-                
-                set_job_status(job_id, "Running", f"Generating Remix (Total: {req.get('total_images', 1)})...")
-                
-                if not sd.set_model(req["model"]): raise Exception("Failed to load Target model")
+            # Phase 2 may run on another backend that already holds the final model.
+            lease_stack.close()
+            client = lease_backend(lease_stack, job_id, req["final_model"])
+            
+            cn_model = get_controlnet_model_for_base(req["final_model"], client)
 
-                remix_resp = sd.img2img(
-                    init_image_b64=init_img_b64,
-                    prompt=remix_prompt, negative_prompt=req["negative_prompt"],
+            for idx in missing:
+                raise_if_canceling(job_id)
+                draft_b64 = load_draft(job_id, idx)
+
+                refine_resp = client.img2img(
+                    init_image_b64=draft_b64,
+                    prompt=full_prompt, negative_prompt=req["negative_prompt"],
                     steps=req["steps"], width=req["width"], height=req["height"],
                     cfg_scale=req["cfg_scale"], denoising_strength=req["denoise_str"],
-                    sampler_name="Euler a", seed=-1, override_settings={"sd_vae": get_vae_for_model(req["model"])},
+                    sampler_name="Euler a", seed=image_seed(req, idx),
+                    override_settings={"sd_vae": get_vae_for_model(req["final_model"])},
                     adetailer_args=ad_args if ad_args else None,
-                    batch_size=1, n_iter=req.get("total_images", 1)
+                    controlnet_name=cn_model,
+                    controlnet_img=draft_b64,
+                    cn_weight=req["cn_weight"],
+                    cn_end=0.6,
+                    batch_size=1, n_iter=1
                 )
-                imgs = remix_resp.get("images", [])
-                info_text = extract_infotext(remix_resp.get("info"))
-                
-                for idx, b64_img in enumerate(imgs):
-                    filename = f"{task_name}_{job_id}_{idx+1:04d}.png"
-                    save_image(b64_img, OUTPUT_DIR / filename, info_text=info_text)
-                    with jobs_lock:
-                        jobs[job_id]["image_urls"].append(f"/api/images/{filename}")
-
-            # Check if any images were saved or if it was canceled
-            with jobs_lock:
-                was_canceled = jobs[job_id]["status"] == "Canceling"
-                success = len(jobs[job_id]["image_urls"]) > 0
-                
-            if was_canceled:
-                set_job_status(job_id, "Canceled", error="Canceled by user")
-            elif success:
-                set_job_status(job_id, "Completed", phase_text="")
-            else:
-                set_job_status(job_id, "Failed", error="No image returned by SD WebUI")
+                imgs = refine_resp.get("images", [])
+                info_text = extract_infotext(refine_resp.get("info"))
+                seeds = extract_seeds(refine_resp.get("info"))
                 
-        except Exception as e:
-            with jobs_lock:
-                if jobs[job_id]["status"] == "Canceling":
-                    set_job_status(job_id, "Canceled", error="Canceled by user")
-                else:
-                    set_job_status(job_id, "Failed", error=str(e))
-            print(f"[{job_id}] Error: {e}")
-
-# Start background worker
-worker_thread = threading.Thread(target=worker, daemon=True)
-worker_thread.start()
+                if imgs:
+                    saves.submit(save_refined_image, job_id, imgs[0], output_filename(job_id, req, idx), idx,
+                                 info_text, seeds[0] if seeds else None)
+
+        # ==============================
+        # REMIX MODE
+        # ==============================
+        elif mode == "remix":
+            tags_cached = tag_cache is not None and tag_cache.contains(init_img_b64, "deepdanbooru")
+            set_job_status(job_id, "Running", "Reusing cached image tags..." if tags_cached else "Interrogating image tags...")
+            client = lease_backend(lease_stack, job_id, req["model"])
+            
+            raw_tags = client.interrogate(init_img_b64, model="deepdanbooru")
+            processed_tags = smart_process_tags(raw_tags, req["char_prompt"], 1.0)
+            remix_prompt = f"{req['global_prompt']}, {processed_tags}, {req['char_prompt']}, {req['action_prompt']}"
+            
+            set_job_status(job_id, "Running", f"Generating Remix (Total: {len(missing)})...")
+
+            generate_chunked(job_id, missing, "Generating Remix", lambda n_iter, first: client.img2img(
+                init_image_b64=init_img_b64,
+                prompt=remix_prompt, negative_prompt=req["negative_prompt"],
+                steps=req["steps"], width=req["width"], height=req["height"],
+                cfg_scale=req["cfg_scale"], denoising_strength=req["denoise_str"],
+                sampler_name="Euler a", seed=image_seed(req, first), override_settings={"sd_vae": get_vae_for_model(req["model"])},
+                adetailer_args=ad_args if ad_args else None,
+                batch_size=1, n_iter=n_iter
+            ), save_output, consecutive=fixed_seed)
+
+        # Free the WebUI for the next job while the last images are still being written.
+        lease_stack.close()
+        saves.wait()
+        with jobs_lock:
+            image_count = len(jobs[job_id]["image_urls"])
+            
+        if image_count:
+            if image_count > done_before:
+                record_job_time(time.monotonic() - started_at, image_count - done_before)
+            finish_job(job_id, "Completed", phase_text="")
+        else:
+            finish_job(job_id, "Failed", error="No image returned by SD WebUI")
+            
+    except Exception as e:
+        # Let queued saves settle so no image is added after the final status.
+        try:
+            saves.wait()
+        except Exception:
+            pass
+        finish_job(job_id, "Failed", error=str(e))
+        print(f"[{job_id}] Error: {e}")
+    finally:
+        lease_stack.close()
+
+worker_pool = WorkerPool(
+take_job, run_job,
+workers=WORKERS_PER_BACKEND * len(backend_pool.backends), save_workers=SAVE_WORKERS,
+)
 
 @app.get("/")
 def read_root():
     return FileResponse(str(STATIC_DIR / "index.html"))
 
+async def first_online_client():
+    await status_poller.latest()
+    online = status_poller.online_urls()
+    return async_clients[online[0]] if online else None
+
 @app.get("/api/status")
-def get_status():
-    if sd.check_connection():
+async def get_status():
+    if await first_online_client():
         return {"status": "online"}
     return {"status": "offline"}
 
+@app.get("/api/backends")
+def get_backends():
+    samples = status_poller.snapshot()["backends"]
+    backends = backend_pool.status()
+    for b in backends:
+        sample = samples.get(b["url"])
+        if sample:
+            b["progress"] = sample["progress"].get("progress", 0.0)
+            b["eta_relative"] = sample["progress"].get("eta_relative", 0.0)
+            b["sampled_at"] = sample["checked_at"]
+    return backends
+
+@app.get("/api/scheduler")
+def get_scheduler():
+    with jobs_lock:
+        pending_images = sum(jobs[j]["request"].get("total_images", 1) for j in job_queue_list)
+        queued = len(job_queue_list)
+    eta = estimate_queue_eta(status_poller.snapshot(), pending_images, worker_stats["seconds_per_image"])
+    return dict(scheduler_stats, queued=queued, eta_seconds=eta)
+
+@app.get("/api/render-cache")
+def get_render_cache():
+    """Hit/miss counters for fixed-seed renders served from disk instead of the WebUI."""
+    if render_cache is None:
+        return {"enabled": False}
+    return dict(render_cache.stats(), enabled=True)
+
+@app.get("/api/thumbs")
+def get_thumbnail_stats():
+    return thumbs.stats()
+
 @app.get("/api/progress")
-def get_progress():
-    try:
-        r = requests.get(f"{sd.api_url}/progress", timeout=2)
-        if r.status_code == 200:
-            return r.json()
-    except Exception:
-        pass
-    return {"progress": 0.0, "eta_relative": 0.0, "current_image": None}
+async def get_progress():
+    await status_poller.latest()
+    return status_poller.progress()
 
 @app.get("/api/models")
-def get_models():
-    if not sd.check_connection():
+async def get_models():
+    client = await first_online_client()
+    if not client:
         raise HTTPException(status_code=500, detail="WebUI is offline")
     try:
-        r = requests.get(f"{sd.api_url}/sd-models", timeout=10)
-        r.raise_for_status()
-        models_list = r.json()
+        models_list = await client.get_sd_models()
         return [m["title"] for m in models_list]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -456,7 +724,8 @@ def create_job(req: JobRequest):
             "error": None
         }
         job_queue_list.append(job_id)
-        save_job_unlocked(job_id)
+        save_job_unlocked(job_id, with_queue=True)
+    worker_pool.wake()
 
     return {"job_id": job_id, "status": "Pending"}
 
@@ -465,7 +734,20 @@ def retry_job(job_id: str):
     with jobs_lock:
         if job_id not in jobs:
             raise HTTPException(status_code=404, detail="Job not found")
-        old_req = dict(jobs[job_id]["request"])
+        job = jobs[job_id]
+        if job["status"] in ("Failed", "Canceled"):
+            # Resume in place: saved outputs and drafts in the checkpoint are kept.
+            # Re-appended at the tail, so an earlier manual placement no longer applies.
+            job.update(status="Pending", error=None, phase_text="Waiting to resume...", skips=0, pinned=False)
+            job_queue_list.append(job_id)
+            save_job_unlocked(job_id, with_queue=True)
+            resumed = True
+        else:
+            old_req = dict(job["request"])
+            resumed = False
+    if resumed:
+        worker_pool.wake()
+        return {"job_id": job_id, "status": "Pending"}
         
     new_job_id = str(uuid.uuid4())[:8]
     
@@ -486,12 +768,17 @@ def retry_job(job_id: str):
             "error": None
         }
         job_queue_list.append(new_job_id)
-        save_job_unlocked(new_job_id)
+        save_job_unlocked(new_job_id, with_queue=True)
+    worker_pool.wake()
         
     return {"job_id": new_job_id, "status": "Pending"}
 
-@app.delete("/api/jobs/{job_id}")
-def delete_job(job_id: str):
+def cancel_or_delete_job(job_id):
+    """Cancel a pending job, mark a running one Canceling or drop a finished one from history.
+
+    Returns (response, client to interrupt); the client is only set for a Running job.
+    Runs in a thread: it waits on jobs_lock and writes SQLite and draft files.
+    """
     with jobs_lock:
         if job_id not in jobs:
             raise HTTPException(status_code=404, detail="Job not found")
@@ -503,26 +790,30 @@ def delete_job(job_id: str):
                 job_queue_list.remove(job_id)
             jobs[job_id]["status"] = "Canceled"
             jobs[job_id]["error"] = "Canceled by user"
-            save_job_unlocked(job_id)
-            return {"status": "canceled"}
+            # Drafts stay on disk so a retry can resume from them.
+            save_job_unlocked(job_id, with_queue=True)
+            return {"status": "canceled"}, None
             
         elif status == "Running":
             jobs[job_id]["status"] = "Canceling"
             save_job_unlocked(job_id)
-            try:
-                requests.post(f"{sd.api_url}/interrupt", timeout=5)
-            except Exception:
-                pass
-            return {"status": "canceling"}
+            return {"status": "canceling"}, async_clients.get(jobs[job_id].get("backend"), asd)
             
         else:
-            # Delete completed/failed/canceled job from disk
-            try:
-                (OUTPUT_DIR / f"{job_id}.json").unlink()
-            except Exception:
-                pass
+            # Delete completed/failed/canceled job from history
+            job_store.delete(job_id)
+            job_feed.delete(job_id)
             del jobs[job_id]
-            return {"status": "deleted"}
+            remove_parked_drafts(job_id)
+            return {"status": "deleted"}, None
+
+@app.delete("/api/jobs/{job_id}")
+async def delete_job(job_id: str):
+    result, running_on = await asyncio.to_thread(cancel_or_delete_job, job_id)
+    if running_on is not None:
+        # Only the interrupt itself runs on the event loop.
+        await running_on.interrupt()
+    return result
 
 @app.post("/api/jobs/{job_id}/move")
 def move_job(job_id: str, payload: MoveRequest):
@@ -535,6 +826,9 @@ def move_job(job_id: str, payload: MoveRequest):
         
         new_idx = max(0, min(payload.new_index, len(job_queue_list)))
         job_queue_list.insert(new_idx, job_id)
+        # Manual placement is a barrier the affinity scheduler will not reorder across.
+        jobs[job_id]["pinned"] = True
+        save_job_unlocked(job_id, with_queue=True)
         
     return {"status": "moved"}
 
@@ -547,25 +841,134 @@ def open_folder():
         subprocess.Popen(['xdg-open', str(OUTPUT_DIR)])
     return {"status": "opened"}
 
-@app.get("/api/jobs")
-def get_jobs():
+def job_changes(since):
+    """Delta for a client that has seen everything up to ``since``.
+
+    Jobs are sent as card summaries. A reset carries only the live (pending and
+    running) jobs; finished ones are paged in from /api/history.
+    """
     with jobs_lock:
-        # Sort so pending jobs reflect queue order, others by creation time
-        def get_sort_key(job):
-            if job["status"] == "Pending" and job["id"] in job_queue_list:
-                # Top priority, sort by queue index
-                return (0, job_queue_list.index(job["id"]))
-            return (1, -job["created_at"]) # Newest first for others
-            
-        return sorted(list(jobs.values()), key=get_sort_key)
+        feed = job_feed.changes_since(since)
+        changed = [jobs[job_id] for job_id in feed["changed"] if job_id in jobs]
+        if feed["reset"]:
+            changed = [job for job in changed if job["status"] not in FINISHED_STATUSES]
+        changed = [job_summary(job) for job in changed]
+        queue = list(job_queue_list) if feed["queue_changed"] else None
+    return {"seq": feed["seq"], "reset": feed["reset"], "jobs": changed, "deleted": feed["deleted"], "queue": queue}
 
-@app.get("/api/images/{filename}")
-def get_image(filename: str):
+@app.get("/api/jobs")
+def get_jobs(since: Optional[int] = None, limit: int = 100):
+    """Card summaries: queued jobs in queue order, running ones, then the newest ``limit`` finished ones.
+
+    All history is in /api/history.
+    """
+    if since is not None:
+        return job_changes(since)
+    with jobs_lock:
+        # The queue and running_job_ids already index the live jobs; no scan over all of history.
+        queued = [job_summary(jobs[job_id]) for job_id in job_queue_list]
+        running = [job_summary(jobs[job_id]) for job_id in running_job_ids if job_id in jobs]
+    running.sort(key=lambda job: -job["created_at"])
+    finished, _ = job_store.history(statuses=FINISHED_STATUSES, limit=max(0, min(limit, HISTORY_MAX_PAGE)))
+    return queued + running + [job_summary(job) for job in finished]
+
+@app.get("/api/history")
+def get_history(status: Optional[str] = None, mode: Optional[str] = None, model: Optional[str] = None,
+                task_name: Optional[str] = None, created_from: Optional[float] = None,
+                created_to: Optional[float] = None, q: Optional[str] = None, cursor: Optional[str] = None,
+                limit: int = 50):
+    """Finished jobs newest first, one page at a time; pass next_cursor back to get the next page.
+
+    ``status`` is a comma-separated subset of Completed, Failed and Canceled
+    (default all three); ``q`` matches a substring of the job's prompts.
+    """
+    statuses = [x.strip() for x in status.split(",") if x.strip()] if status else list(FINISHED_STATUSES)
+    if not set(statuses) <= set(FINISHED_STATUSES):
+        raise HTTPException(status_code=400, detail=f"status must be among {', '.join(FINISHED_STATUSES)}")
+    try:
+        page, next_cursor = job_store.history(
+            statuses=statuses, mode=mode, model=model, task_name=task_name, created_from=created_from,
+            created_to=created_to, prompt=q, cursor=cursor, limit=max(1, min(limit, HISTORY_MAX_PAGE)),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"jobs": [job_summary(job) for job in page], "next_cursor": next_cursor}
+
+def sse_event(event, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/api/events")
+async def job_events(request: Request, since: int = 0):
+    """Server-sent events: "jobs" deltas on every change, "progress" each poller tick while a job runs."""
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    async def stream():
+        nonlocal since
+        listener = job_feed.subscribe()
+        _, changed = listener
+        try:
+            while not await request.is_disconnected():
+                changed.clear()
+                if job_feed.seq != since:
+                    delta = await asyncio.to_thread(job_changes, since)
+                    since = delta["seq"]
+                    yield sse_event("jobs", delta, since)
+                running = bool(running_job_ids)
+                if running:
+                    yield sse_event("progress", await get_progress())
+                try:
+                    # Idle tabs sleep here until the feed moves; the timeout only sends keep-alives.
+                    await asyncio.wait_for(changed.wait(), timeout=STATUS_POLL_INTERVAL if running else 15.0)
+                except asyncio.TimeoutError:
+                    if not running:
+                        yield ": keep-alive\n\n"
+        finally:
+            job_feed.unsubscribe(listener)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def output_file(filename):
     output_root = OUTPUT_DIR.resolve()
     file_path = (OUTPUT_DIR / filename).resolve()
     if file_path.is_relative_to(output_root) and file_path.exists() and file_path.is_file():
-        return FileResponse(str(file_path))
+        return file_path
     raise HTTPException(status_code=404, detail="Image not found")
 
+@app.get("/api/images/{filename}")
+def get_image(filename: str):
+    return FileResponse(str(output_file(filename)))
+
+def not_modified(request, etag, modified_at):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(modified_at) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+@app.get("/api/thumbs/{filename}")
+def get_thumbnail(filename: str, request: Request, w: Optional[int] = None):
+    file_path = output_file(filename)
+    width = thumbs.snap_width(w)
+    modified_at = file_path.stat().st_mtime
+    etag = thumbs.etag(file_path, width)
+    # Output filenames carry the job id and image index and are written once, so
+    # a thumbnail URL never changes content and browsers need not revalidate.
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(modified_at, usegmt=True),
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if not_modified(request, etag, modified_at):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(str(thumbs.get(file_path, width)), media_type=thumbs.media_type, headers=headers)
+
 if __name__ == "__main__":
     uvicorn.run("app:app", host=WEBUI_HOST, port=WEBUI_PORT, reload=True)
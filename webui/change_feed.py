@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+MAX_TOMBSTONES = 1000
+
+
+class ChangeFeed:
+    """Sequence numbers for job mutations, so clients can ask for what changed since N.
+
+    Job ids are kept ordered by their last change, so a delta only walks the
+    entries newer than the client's sequence number. Deleted ids are remembered
+    up to max_tombstones; a client older than the oldest forgotten tombstone
+    gets reset=True and must reload the full list.
+    """
+
+    def __init__(self, max_tombstones=MAX_TOMBSTONES, start_seq=None):
+        # Starting from the clock keeps numbers growing across restarts, so a
+        # client holding a number from the previous process is always reset.
+        self.seq = int(time.time() * 1000) if start_seq is None else start_seq
+        self.queue_seq = self.seq
+        self.max_tombstones = max_tombstones
+        self._changed = OrderedDict()  # job_id -> seq, oldest change first
+        self._deleted = OrderedDict()  # job_id -> seq, oldest delete first
+        self._reset_floor = self.seq
+        self._lock = threading.Lock()
+        self._listeners = set()
+
+    def _bump(self):
+        self.seq += 1
+        return self.seq
+
+    def touch(self, job_id):
+        with self._lock:
+            seq = self._bump()
+            self._changed[job_id] = seq
+            self._changed.move_to_end(job_id)
+            self._deleted.pop(job_id, None)
+        self._notify()
+        return seq
+
+    def touch_queue(self):
+        with self._lock:
+            self.queue_seq = self._bump()
+        self._notify()
+        return self.queue_seq
+
+    def delete(self, job_id):
+        with self._lock:
+            seq = self._bump()
+            self._changed.pop(job_id, None)
+            self._deleted[job_id] = seq
+            while len(self._deleted) > self.max_tombstones:
+                _, forgotten = self._deleted.popitem(last=False)
+                self._reset_floor = forgotten
+        self._notify()
+        return seq
+
+    def changes_since(self, since):
+        """Return {"seq", "reset", "changed", "deleted", "queue_changed"} for a client at ``since``."""
+        with self._lock:
+            reset = since <= 0 or since < self._reset_floor or since > self.seq
+            if reset:
+                changed = list(self._changed)
+                deleted = []
+            else:
+                changed = _ids_after(self._changed, since)
+                deleted = _ids_after(self._deleted, since)
+            return {
+                "seq": self.seq,
+                "reset": reset,
+                "changed": changed,
+                "deleted": deleted,
+                "queue_changed": reset or self.queue_seq > since,
+            }
+
+    # --- async listeners (SSE streams) ---
+
+    def subscribe(self):
+        """Return an asyncio.Event set on the caller's loop whenever the feed moves."""
+        event = asyncio.Event()
+        listener = (asyncio.get_running_loop(), event)
+        with self._lock:
+            self._listeners.add(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            self._listeners.discard(listener)
+
+    def _notify(self):
+        with self._lock:
+            listeners = list(self._listeners)
+        for loop, event in listeners:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The stream's loop is already closed.
+                self.unsubscribe((loop, event))
+
+
+def _ids_after(ordered, since):
+    ids = []
+    for job_id in reversed(ordered):
+        if ordered[job_id] <= since:
+            break
+        ids.append(job_id)
+    ids.reverse()
+    return ids
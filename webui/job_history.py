@@ -1,13 +1,81 @@
 INTERRUPTED_STATUSES = {"Pending", "Running", "Canceling"}
+# Jobs in these states only change again on a retry; the board pages them in from history.
+FINISHED_STATUSES = ("Completed", "Failed", "Canceled")
 RESTART_ERROR = "Server restarted before completion"
+# A job interrupted this many times (e.g. it crashes the server) is failed instead of resumed again.
+MAX_RESUMES = 3
+
+# Allowed status changes. Running -> Pending is a twophase job parked for refine;
+# a Canceling job can only end as Canceled, so a late Completed/Failed never hides a cancel.
+JOB_TRANSITIONS = {
+    "Pending": {"Running", "Canceled"},
+    "Running": {"Running", "Pending", "Canceling", "Completed", "Failed", "Canceled"},
+    "Canceling": {"Canceling", "Canceled"},
+    "Completed": set(),
+    # Retrying a failed or canceled job resumes it in place from its checkpoint.
+    "Failed": {"Pending"},
+    "Canceled": {"Pending"},
+}
+
+
+def can_transition(current, new):
+    return new in JOB_TRANSITIONS.get(current, set())
+
+
+def job_checkpoint(job):
+    """Per-image progress kept in the job: output/draft index (as str) -> seed used."""
+    checkpoint = job.setdefault("checkpoint", {})
+    checkpoint.setdefault("outputs", {})
+    checkpoint.setdefault("drafts", {})
+    return checkpoint
 
 
 def normalize_loaded_job(job_data):
+    """Settle a job that was interrupted by a restart; returns (job, changed).
+
+    Pending and Running jobs go back to Pending and resume from their checkpoint,
+    up to MAX_RESUMES times. A job being canceled finishes as Canceled.
+    """
     normalized = dict(job_data)
-    if normalized.get("status") not in INTERRUPTED_STATUSES:
+    status = normalized.get("status")
+    if status not in INTERRUPTED_STATUSES:
         return normalized, False
 
-    normalized["status"] = "Failed"
-    normalized["error"] = RESTART_ERROR
     normalized["phase_text"] = ""
+    if status == "Canceling":
+        normalized["status"] = "Canceled"
+        normalized["error"] = "Canceled by user"
+    elif normalized.get("resumes", 0) >= MAX_RESUMES:
+        normalized["status"] = "Failed"
+        normalized["error"] = RESTART_ERROR
+    else:
+        normalized["status"] = "Pending"
+        normalized["error"] = None
+        if status == "Running":
+            normalized["resumes"] = normalized.get("resumes", 0) + 1
+            normalized["phase_text"] = "Resuming after restart..."
     return normalized, True
+
+
+# Longest prompt text sent with a job card; the full request stays on the server.
+SUMMARY_PROMPT_CHARS = 300
+SUMMARY_REQUEST_FIELDS = ("mode", "task_name", "model", "final_model", "total_images", "seed")
+
+
+def job_summary(job):
+    """What a board card needs from a job, without the negative prompt, checkpoint or other bulk."""
+    request = job.get("request") or {}
+    summary_request = {k: request[k] for k in SUMMARY_REQUEST_FIELDS if k in request}
+    for key in ("global_prompt", "char_prompt", "action_prompt"):
+        if request.get(key):
+            summary_request[key] = request[key][:SUMMARY_PROMPT_CHARS]
+    return {
+        "id": job["id"],
+        "status": job.get("status"),
+        "phase_text": job.get("phase_text"),
+        "error": job.get("error"),
+        "created_at": job.get("created_at"),
+        "image_urls": job.get("image_urls") or [],
+        "backend": job.get("backend"),
+        "request": summary_request,
+    }
@@ -0,0 +1,356 @@
+import base64
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from webui.job_history import normalize_loaded_job
+
+# Columns updated in place by update_status(); everything else lives in the data blob.
+STATUS_FIELDS = ("status", "phase_text", "error")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    phase_text TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL,
+    mode TEXT,
+    model TEXT,
+    task_name TEXT,
+    prompt TEXT
+);
+CREATE TABLE IF NOT EXISTS queue (
+    position INTEGER PRIMARY KEY,
+    job_id TEXT NOT NULL UNIQUE REFERENCES jobs(id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columns copied out of the request so history filters can use an index; added to older databases on open.
+FILTER_COLUMNS = ("mode", "model", "task_name", "prompt")
+
+# History pages are ordered newest first by (created_at, id); each filter has an index in that order.
+INDEX_SCHEMA = """
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status);
+CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs(created_at);
+CREATE INDEX IF NOT EXISTS jobs_history ON jobs(created_at, id);
+CREATE INDEX IF NOT EXISTS jobs_status_history ON jobs(status, created_at, id);
+CREATE INDEX IF NOT EXISTS jobs_mode_history ON jobs(mode, created_at, id);
+CREATE INDEX IF NOT EXISTS jobs_model_history ON jobs(model, created_at, id);
+CREATE INDEX IF NOT EXISTS jobs_task_history ON jobs(task_name, created_at, id);
+"""
+
+# Trigram full-text index over the prompts, for substring search without a table scan.
+PROMPT_INDEX_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS jobs_prompt USING fts5(
+    prompt, content='jobs', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS jobs_prompt_insert AFTER INSERT ON jobs BEGIN
+    INSERT INTO jobs_prompt(rowid, prompt) VALUES (new.rowid, new.prompt);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_prompt_delete AFTER DELETE ON jobs BEGIN
+    INSERT INTO jobs_prompt(jobs_prompt, rowid, prompt) VALUES ('delete', old.rowid, old.prompt);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_prompt_update AFTER UPDATE OF prompt ON jobs WHEN old.prompt IS NOT new.prompt BEGIN
+    INSERT INTO jobs_prompt(jobs_prompt, rowid, prompt) VALUES ('delete', old.rowid, old.prompt);
+    INSERT INTO jobs_prompt(rowid, prompt) VALUES (new.rowid, new.prompt);
+END;
+"""
+
+# The trigram index only helps for search terms at least this long.
+MIN_INDEXED_SEARCH = 3
+# Newest rows checked directly for a prompt search before falling back to the index.
+PROMPT_SCAN_WINDOW = 2000
+
+
+def job_prompt(request):
+    return ", ".join(p for p in (request.get("global_prompt"), request.get("char_prompt"), request.get("action_prompt")) if p)
+
+
+def encode_cursor(created_at, job_id):
+    raw = json.dumps([created_at, job_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(created_at, id) of the last job of the previous page; ValueError if the cursor is not ours."""
+    try:
+        created_at, job_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(created_at), str(job_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid history cursor: {cursor!r}") from e
+
+
+def job_record(job):
+    """Row values for a job; base64 init images are never written to history."""
+    data = {k: v for k, v in job.items() if k not in STATUS_FIELDS}
+    request = dict(data.get("request") or {})
+    if request.get("init_image"):
+        request["init_image"] = "<saved_to_disk>"
+    data["request"] = request
+    return (
+        job["id"],
+        job["status"],
+        job.get("phase_text"),
+        job.get("error"),
+        job.get("created_at") or 0.0,
+        json.dumps(data, ensure_ascii=False),
+        request.get("mode"),
+        request.get("model"),
+        request.get("task_name"),
+        job_prompt(request),
+    )
+
+
+class JobStore:
+    """SQLite (WAL) persistence for WebUI jobs and the pending queue.
+
+    The WebUI keeps its live jobs dict in memory; this store is the durable copy.
+    Status changes only touch their columns, and a job plus the queue order are
+    written in one transaction so a crash never leaves a queued id without a job.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        if self._add_filter_columns():
+            self._backfill_filter_columns()
+        self.conn.executescript(INDEX_SCHEMA)
+        self.prompt_index = self._create_prompt_index()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _add_filter_columns(self):
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        missing = [column for column in FILTER_COLUMNS if column not in existing]
+        for column in missing:
+            self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+        return bool(missing)
+
+    def _backfill_filter_columns(self):
+        """Fill the filter columns of a database written before they existed."""
+        rows = self.conn.execute("SELECT id, data FROM jobs").fetchall()
+        updates = []
+        for job_id, data in rows:
+            request = json.loads(data).get("request") or {}
+            updates.append((request.get("mode"), request.get("model"), request.get("task_name"), job_prompt(request), job_id))
+        with self._transaction():
+            self.conn.executemany("UPDATE jobs SET mode = ?, model = ?, task_name = ?, prompt = ? WHERE id = ?", updates)
+
+    def _create_prompt_index(self):
+        exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'jobs_prompt'").fetchone()
+        try:
+            self.conn.executescript(PROMPT_INDEX_SCHEMA)
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5 or older than 3.34 (no trigram tokenizer): search scans instead.
+            return False
+        if not exists:
+            # Index the jobs written before the index existed.
+            self.conn.execute("INSERT INTO jobs_prompt(jobs_prompt) VALUES ('rebuild')")
+        return True
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _write_queue(self, queue):
+        self.conn.execute("DELETE FROM queue")
+        self.conn.executemany("INSERT INTO queue (position, job_id) VALUES (?, ?)", enumerate(queue))
+
+    def save(self, job, queue=None):
+        """Insert or replace a full job; pass queue to persist the new queue order with it."""
+        with self._transaction():
+            self._upsert(job)
+            if queue is not None:
+                self._write_queue(queue)
+
+    def _upsert(self, job):
+        # An upsert, not INSERT OR REPLACE: a replace deletes the row and would cascade to the queue.
+        self.conn.execute(
+            "INSERT INTO jobs (id, status, phase_text, error, created_at, data, mode, model, task_name, prompt) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET status = excluded.status, phase_text = excluded.phase_text, "
+            "error = excluded.error, created_at = excluded.created_at, data = excluded.data, mode = excluded.mode, "
+            "model = excluded.model, task_name = excluded.task_name, prompt = excluded.prompt",
+            job_record(job),
+        )
+
+    def update_status(self, job_id, status, phase_text=None, error=None):
+        with self._transaction():
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, phase_text = COALESCE(?, phase_text), error = COALESCE(?, error) WHERE id = ?",
+                (status, phase_text, error, job_id),
+            )
+
+    def save_queue(self, queue):
+        with self._transaction():
+            self._write_queue(queue)
+
+    def delete(self, job_id):
+        with self._transaction():
+            self.conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def queued_ids(self):
+        with self._lock:
+            return [r[0] for r in self.conn.execute("SELECT job_id FROM queue ORDER BY position")]
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def history(self, statuses=None, mode=None, model=None, task_name=None, created_from=None, created_to=None,
+                prompt=None, cursor=None, limit=50):
+        """One page of jobs, newest first, and the cursor of the next page (None on the last page).
+
+        Pages are keyset-paginated on (created_at, id), so every page costs the
+        same however deep into the history it is. Equality filters and the
+        created_at range use the indexes; several statuses are read one indexed
+        page each and merged. ``prompt`` is a case-insensitive substring of the
+        job's prompts: the newest rows are checked directly, and a term too rare
+        to fill a page there is looked up in the trigram index instead.
+        """
+        where, params = [], []
+        for column, value in (("mode", mode), ("model", model), ("task_name", task_name)):
+            if value:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if created_from is not None:
+            where.append("created_at >= ?")
+            params.append(created_from)
+        if created_to is not None:
+            where.append("created_at < ?")
+            params.append(created_to)
+        if cursor:
+            where.append("(created_at, id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+
+        with self._lock:
+            if statuses:
+                keys = []
+                for status in statuses:
+                    keys.extend(self._history_keys(where + ["status = ?"], params + [status], prompt, limit + 1))
+                keys = sorted(keys, reverse=True)[:limit + 1]
+            else:
+                keys = self._history_keys(where, params, prompt, limit + 1)
+            rows = {}
+            if keys:
+                rows = {row[0]: row[1:] for row in self.conn.execute(
+                    f"SELECT rowid, status, phase_text, error, data FROM jobs WHERE rowid IN ({', '.join('?' * len(keys))})",
+                    [rowid for _, _, rowid in keys],
+                )}
+
+        jobs = []
+        for _, _, rowid in keys[:limit]:
+            status, phase_text, error, data = rows[rowid]
+            job = json.loads(data)
+            job.update(status=status, phase_text=phase_text, error=error)
+            jobs.append(job)
+        next_cursor = None
+        if len(keys) > limit:
+            created_at, job_id, _ = keys[limit - 1]
+            next_cursor = encode_cursor(created_at, job_id)
+        return jobs, next_cursor
+
+    def _history_keys(self, where, params, prompt, count):
+        """(created_at, id, rowid) of the newest ``count`` jobs matching; caller holds the lock."""
+        def keys(extra_where=(), extra_params=(), columns="created_at, id, rowid", limit=count):
+            clauses = list(where) + list(extra_where)
+            sql = f"SELECT {columns} FROM jobs"
+            if clauses:
+                sql += " WHERE " + " AND ".join(clauses)
+            sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+            return self.conn.execute(sql, list(params) + list(extra_params) + [limit]).fetchall()
+
+        if not prompt:
+            return keys()
+        # Common terms fill a page within the newest rows; checking those is cheaper than
+        # collecting every match from the index.
+        needle = prompt.lower()
+        window = keys(columns="created_at, id, rowid, prompt", limit=PROMPT_SCAN_WINDOW)
+        matches = [row[:3] for row in window if needle in (row[3] or "").lower()]
+        if len(matches) >= count or len(window) < PROMPT_SCAN_WINDOW:
+            return matches[:count]
+        if self.prompt_index and len(prompt) >= MIN_INDEXED_SEARCH:
+            return keys(["rowid IN (SELECT rowid FROM jobs_prompt WHERE jobs_prompt MATCH ?)"],
+                        ['"' + prompt.replace('"', '""') + '"'])
+        return keys(["instr(lower(prompt), ?) > 0"], [needle])
+
+    def load(self):
+        """Return (jobs, queue) for a restart.
+
+        Interrupted jobs are settled by normalize_loaded_job. Jobs that were
+        running go back to the front of the queue in creation order, ahead of the
+        jobs that were still waiting; failed and canceled ones leave it.
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT status, phase_text, error, data FROM jobs ORDER BY created_at"
+            ).fetchall()
+        queue = self.queued_ids()
+
+        jobs = {}
+        changed = []
+        for status, phase_text, error, data in rows:
+            job = json.loads(data)
+            job.update(status=status, phase_text=phase_text, error=error)
+            job, was_changed = normalize_loaded_job(job)
+            jobs[job["id"]] = job
+            if was_changed:
+                changed.append(job)
+
+        queued = set(queue)
+        resumed = [job["id"] for job in changed if job["status"] == "Pending" and job["id"] not in queued]
+        queue = resumed + [job_id for job_id in queue if job_id in jobs and jobs[job_id]["status"] == "Pending"]
+        with self._transaction():
+            for job in changed:
+                self._upsert(job)
+            self._write_queue(queue)
+        return jobs, queue
+
+    def migrate_json_dir(self, json_dir):
+        """One-time import of the legacy one-file-per-job history. Returns the number imported."""
+        with self._lock:
+            done = self.conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        if done:
+            return 0
+
+        records = []
+        for json_file in sorted(Path(json_dir).glob("*.json")):
+            try:
+                with open(json_file, "r", encoding="utf-8") as f:
+                    job = json.load(f)
+                records.append(job_record(job))
+            except Exception as e:
+                print(f"Failed to migrate {json_file.name}: {e}")
+
+        with self._transaction():
+            # Rows written since the switch to SQLite are newer than the JSON copies.
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO jobs (id, status, phase_text, error, created_at, data, mode, model, task_name, prompt) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                records,
+            )
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (str(len(records)),))
+        return len(records)
+
@@ -0,0 +1,62 @@
+from core.client import checkpoint_matches
+
+SCHEDULER_MODES = ("fifo", "affinity")
+MAX_SKIPS = 4
+
+
+def required_model(job):
+    req = job["request"]
+    if job.get("stage") == "refine":
+        return req.get("final_model") or req["model"]
+    return req["model"]
+
+
+def model_is_loaded(model_name, loaded_models):
+    return any(loaded and checkpoint_matches(model_name, loaded) for loaded in loaded_models)
+
+
+def new_scheduler_stats(mode):
+    return {"mode": mode, "picks": 0, "swaps": 0, "swaps_avoided": 0, "starvation_overrides": 0}
+
+
+def pick_next(queue, jobs, loaded_models, stats, mode="fifo", max_skips=MAX_SKIPS):
+    """Return the queue index of the next job to run, updating skip counters and stats.
+
+    In affinity mode the scheduler looks for the earliest job whose checkpoint is
+    already loaded somewhere, so drafts sharing a model run back to back and parked
+    twophase refines are drained with a single switch to the final model.
+
+    Manual order wins: a job placed with /move is pinned and acts as a barrier, so
+    nothing behind it is pulled forward past it. A job skipped max_skips times
+    runs next regardless of model.
+    """
+    if not queue:
+        return None
+
+    window = len(queue)
+    if mode == "affinity":
+        pinned = [i for i, job_id in enumerate(queue) if jobs[job_id].get("pinned")]
+        if pinned:
+            window = pinned[0] + 1 if pinned[0] == 0 else pinned[0]
+
+    choice = 0
+    if mode == "affinity":
+        starved = [i for i in range(window) if jobs[queue[i]].get("skips", 0) >= max_skips]
+        if starved:
+            choice = starved[0]
+            stats["starvation_overrides"] += 1
+        else:
+            choice = next(
+                (i for i in range(window) if model_is_loaded(required_model(jobs[queue[i]]), loaded_models)),
+                0,
+            )
+            if choice > 0:
+                stats["swaps_avoided"] += 1
+
+    for job_id in queue[:choice]:
+        jobs[job_id]["skips"] = jobs[job_id].get("skips", 0) + 1
+
+    stats["picks"] += 1
+    if not model_is_loaded(required_model(jobs[queue[choice]]), loaded_models):
+        stats["swaps"] += 1
+    return choice
@@ -50,6 +50,10 @@ document.addEventListener("DOMContentLoaded", () => {
         return escapeHtml(JSON.stringify(String(value ?? "")));
     }
 
+    function thumbUrl(imageUrl, width) {
+        return String(imageUrl).replace("/api/images/", "/api/thumbs/") + `?w=${width}`;
+    }
+
     let lastFocusedElement = null;
     let activeModal = null;
     let activeModalKeyHandler = null;
@@ -112,10 +116,9 @@ document.addEventListener("DOMContentLoaded", () => {
     fetchModels();
     fetchTemplates();
     pollStatus();
-    pollJobs();
+    pollJobs().then(connectJobEvents);
     
     setInterval(pollStatus, 5000);
-    setInterval(pollJobs, 2000);
 
     // --- Mode Toggle Logic ---
     btnQuick.addEventListener("click", () => {
@@ -339,6 +342,7 @@ document.addEventListener("DOMContentLoaded", () => {
             denoise_str: getFloat("denoise_str", 0.5),
             cn_weight: getFloat("cn_weight", 0.7),
             total_images: getVal("total_images", 1),
+            seed: getVal("seed", -1),
             auto_hires: getCheck("auto_hires", true),
             ad_modes: Array.from(document.querySelectorAll('input[name="ad_modes"]:checked')).map(cb => cb.value),
             init_image: initImageBase64
@@ -385,35 +389,142 @@ document.addEventListener("DOMContentLoaded", () => {
     }
     window.deleteJob = deleteJob;
 
-    async function pollJobs() {
-        try {
-            const [resJobs, resProg] = await Promise.all([
-                fetch("/api/jobs"),
-                fetch("/api/progress")
-            ]);
-            if (!resJobs.ok) return; // backend offline, skip
-            const jobs = await resJobs.json();
-            const prog = resProg.ok ? await resProg.json() : {};
-            
-            const pending = [], running = [], completed = [];
-            jobs.forEach(job => {
-                if (job.status === "Pending") pending.push(job);
-                else if (job.status === "Running" || job.status === "Canceling") running.push(job);
-                else completed.push(job); 
-            });
+    // --- Job state: the server sends deltas, the board is rebuilt from this map ---
+    const jobsById = new Map();
+    let queueOrder = [];
+    let lastSeq = 0;
+    let lastProgress = {};
+    let runningJobs = [];
+    const FINISHED = new Set(["Completed", "Failed", "Canceled"]);
+
+    // Finished jobs are paged in from /api/history as the Completed column scrolls.
+    const HISTORY_PAGE = 50;
+    const historyPage = { cursor: null, done: false, loading: null, generation: 0 };
+    const historySearch = document.getElementById("history-search");
+    const historyStatus = document.getElementById("history-status");
+
+    function historyFiltered() {
+        return Boolean(historySearch.value.trim() || historyStatus.value);
+    }
 
-            countPending.textContent = pending.length;
-            countRunning.textContent = running.length;
-            countCompleted.textContent = completed.length;
+    async function loadHistory(reset) {
+        if (reset) {
+            historyPage.generation += 1;
+            historyPage.cursor = null;
+            historyPage.done = false;
+            historyPage.loading = null;
+            jobsById.forEach((job, jobId) => { if (FINISHED.has(job.status)) jobsById.delete(jobId); });
+        }
+        if (historyPage.done) return;
+        if (historyPage.loading) return historyPage.loading;
+        const generation = historyPage.generation;
+        const params = new URLSearchParams({ limit: HISTORY_PAGE });
+        if (historyPage.cursor) params.set("cursor", historyPage.cursor);
+        if (historySearch.value.trim()) params.set("q", historySearch.value.trim());
+        if (historyStatus.value) params.set("status", historyStatus.value);
+        historyPage.loading = (async () => {
+            try {
+                const res = await fetch(`/api/history?${params}`);
+                if (!res.ok) return;
+                const page = await res.json();
+                // Filters changed while this page was on its way
+                if (generation !== historyPage.generation) return;
+                page.jobs.forEach(job => { if (!jobsById.has(job.id)) jobsById.set(job.id, job); });
+                historyPage.cursor = page.next_cursor;
+                historyPage.done = !page.next_cursor;
+            } catch (e) {
+                return; // backend unreachable, the next scroll tries again
+            } finally {
+                if (generation === historyPage.generation) historyPage.loading = null;
+            }
+            renderBoard();
+            // Keep paging until the column can scroll
+            if (!historyPage.done && colCompleted.scrollHeight <= colCompleted.clientHeight) loadHistory(false);
+        })();
+        return historyPage.loading;
+    }
 
-            renderCol(colPending, pending, prog, true);
-            renderCol(colRunning, running, prog, false);
-            renderCol(colCompleted, completed, null, false);
+    colCompleted.addEventListener("scroll", () => {
+        if (colCompleted.scrollTop + colCompleted.clientHeight >= colCompleted.scrollHeight - 300) loadHistory(false);
+    });
+    let historySearchTimer = null;
+    historySearch.addEventListener("input", () => {
+        clearTimeout(historySearchTimer);
+        historySearchTimer = setTimeout(() => loadHistory(true), 300);
+    });
+    historyStatus.addEventListener("change", () => loadHistory(true));
+
+    function applyJobDelta(delta) {
+        // A slower fetch must not roll back a newer pushed delta
+        if (!delta.reset && delta.seq < lastSeq) return;
+        if (delta.reset) {
+            // A reset only carries live jobs; finished ones come back through history.
+            jobsById.clear();
+            loadHistory(true);
+        }
+        delta.jobs.forEach(job => {
+            // A job that just finished may not match the history filters; only update finished cards already shown.
+            if (FINISHED.has(job.status) && historyFiltered()) {
+                const shown = jobsById.get(job.id);
+                if (!shown || !FINISHED.has(shown.status)) {
+                    jobsById.delete(job.id);
+                    return;
+                }
+            }
+            jobsById.set(job.id, job);
+        });
+        delta.deleted.forEach(jobId => jobsById.delete(jobId));
+        if (delta.queue) queueOrder = delta.queue;
+        lastSeq = delta.seq;
+        renderBoard();
+    }
+
+    async function pollJobs() {
+        try {
+            const res = await fetch(`/api/jobs?since=${lastSeq}`);
+            if (!res.ok) return; // backend offline, skip
+            applyJobDelta(await res.json());
         } catch(e) {
             // backend unreachable, silently skip
         }
     }
 
+    function connectJobEvents() {
+        if (!window.EventSource) {
+            setInterval(pollJobs, 2000);
+            return;
+        }
+        // EventSource reconnects by itself and resumes from the last event id
+        const events = new EventSource(`/api/events?since=${lastSeq}`);
+        events.addEventListener("jobs", (e) => applyJobDelta(JSON.parse(e.data)));
+        events.addEventListener("progress", (e) => {
+            lastProgress = JSON.parse(e.data);
+            renderCol(colRunning, runningJobs, lastProgress, false);
+        });
+    }
+
+    function renderBoard() {
+        const queuePos = new Map(queueOrder.map((jobId, idx) => [jobId, idx]));
+        const pending = [], running = [], completed = [];
+        jobsById.forEach(job => {
+            if (job.status === "Pending") pending.push(job);
+            else if (job.status === "Running" || job.status === "Canceling") running.push(job);
+            else completed.push(job); 
+        });
+        pending.sort((a, b) => (queuePos.get(a.id) ?? Infinity) - (queuePos.get(b.id) ?? Infinity));
+        completed.sort((a, b) => b.created_at - a.created_at);
+        runningJobs = running;
+        if (!running.length) lastProgress = {};
+
+        countPending.textContent = pending.length;
+        countRunning.textContent = running.length;
+        countCompleted.textContent = historyPage.done ? completed.length : `${completed.length}+`;
+
+        renderCol(colPending, pending, lastProgress, true);
+        renderCol(colRunning, running, lastProgress, false);
+        renderCol(colCompleted, completed, null, false);
+    }
+
     function extractSeed(infoText) {
         if (!infoText) return "N/A";
         const match = infoText.match(/Seed: (\d+)/);
@@ -507,10 +618,13 @@ document.addEventListener("DOMContentLoaded", () => {
                 footerHtml = `<div style="flex:1;"></div><button class="icon-btn" style="padding:4px 8px;font-size:12px;color:var(--danger-color);" onclick="deleteJob(${jobArg})" title="Cancel Job">❌</button>`;
             } else if (job.status === "Running" || job.status === "Canceling") {
                 let progHtml = "";
-                if (progData && progData.progress > 0) {
-                    const p = Math.round(progData.progress * 100);
-                    const eta = Math.round(progData.eta_relative);
-                    const previewSrc = progData.current_image ? escapeHtml(`data:image/jpeg;base64,${progData.current_image}`) : "";
+                // Jobs on another WebUI use that backend's numbers (sent without a preview image)
+                const jobProg = (progData && progData.backends && job.backend && job.backend !== progData.url)
+                    ? progData.backends[job.backend] : progData;
+                if (jobProg && jobProg.progress > 0) {
+                    const p = Math.round(jobProg.progress * 100);
+                    const eta = Math.round(jobProg.eta_relative);
+                    const previewSrc = jobProg.current_image ? escapeHtml(`data:image/jpeg;base64,${jobProg.current_image}`) : "";
                     let previewHtml = previewSrc ? `<img src="${previewSrc}" class="progress-preview" style="max-height:100px; border-radius:4px; align-self:center; margin-top:0.5rem">` : "";
                     progHtml = `
                         <div style="width: 100%; background: #333; border-radius: 4px; height: 6px; margin-top: 8px; overflow: hidden;">
@@ -536,14 +650,15 @@ document.addEventListener("DOMContentLoaded", () => {
             } else if (job.status === "Failed" || job.status === "Canceled") {
                 const safeError = escapeHtml(job.error || "Canceled");
                 footerHtml = `<div class="status-failed" style="flex:1;">❌ ${safeError}</div>
-                              <button class="icon-btn" style="padding:4px 8px;font-size:12px" onclick="retryJob(${jobArg})">🔄</button>
+                              <button class="icon-btn" style="padding:4px 8px;font-size:12px" onclick="retryJob(${jobArg})" title="Resume missing images">🔄</button>
                               <button class="icon-btn" style="padding:4px 8px;font-size:12px;color:var(--danger-color);" onclick="deleteJob(${jobArg})">🗑️</button>`;
             } else if (job.status === "Completed" && job.image_urls) {
                 let imgsHtml = "";
                 job.image_urls.forEach(url => {
-                    const safeUrl = escapeHtml(url);
+                    // Cards show a small WebP; the modal opens the full PNG.
+                    const safeThumbUrl = escapeHtml(thumbUrl(url, 160));
                     const urlArg = jsArg(url);
-                    imgsHtml += `<img src="${safeUrl}" class="card-image" onclick="openModal(${urlArg})" loading="lazy">`;
+                    imgsHtml += `<img src="${safeThumbUrl}" class="card-image" onclick="openModal(${urlArg})" loading="lazy" decoding="async">`;
                 });
                 footerHtml = `<div style="display:flex;gap:0.5rem;flex:1;flex-wrap:wrap;">${imgsHtml}</div>
                               <div style="display:flex;flex-direction:column;gap:4px;">
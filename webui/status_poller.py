@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+IDLE_PROGRESS = {"progress": 0.0, "eta_relative": 0.0, "state": {}, "current_image": None}
+
+
+def empty_sample():
+    return {"online": False, "progress": dict(IDLE_PROGRESS), "loaded_model": "", "checked_at": None}
+
+
+def is_busy(sample):
+    state = sample["progress"].get("state") or {}
+    return sample["online"] and (state.get("job_count", 0) > 0 or sample["progress"].get("progress", 0) > 0)
+
+
+class StatusPoller:
+    """One background task samples every SD WebUI; request handlers read the cached snapshot.
+
+    /progress doubles as the health check, so a tick costs one request per backend
+    no matter how many tabs are open. The loaded checkpoint comes from /options,
+    which is large, so it is only read every ``options_every`` ticks or when a
+    backend comes back online. ``on_sample(url, online, loaded_model)`` lets the
+    backend pool reuse the result instead of running its own health checks.
+    """
+
+    def __init__(self, clients, interval=1.0, options_every=10, on_sample=None):
+        self.clients = clients  # url -> AsyncSDClient
+        self.interval = interval
+        self.options_every = options_every
+        self.on_sample = on_sample
+        self.ticks = 0
+        self._snapshot = {"updated_at": None, "backends": {url: empty_sample() for url in clients}}
+        self._task = None
+
+    async def _sample(self, url, client, with_options):
+        previous = self._snapshot["backends"].get(url) or empty_sample()
+        sample = {"online": False, "progress": dict(IDLE_PROGRESS), "loaded_model": previous["loaded_model"],
+                  "checked_at": time.time()}
+        try:
+            sample["progress"] = await client.get_progress()
+            sample["online"] = True
+        except Exception:
+            return url, sample, None
+
+        loaded_model = None
+        if with_options or not previous["online"]:
+            loaded_model = (await client.get_options()).get("sd_model_checkpoint", "")
+            sample["loaded_model"] = loaded_model
+        return url, sample, loaded_model
+
+    async def poll_once(self):
+        with_options = self.ticks % self.options_every == 0
+        results = await asyncio.gather(*(self._sample(url, c, with_options) for url, c in self.clients.items()))
+        self._snapshot = {"updated_at": time.time(), "backends": {url: sample for url, sample, _ in results}}
+        self.ticks += 1
+        if self.on_sample:
+            for url, sample, loaded_model in results:
+                self.on_sample(url, sample["online"], loaded_model)
+        return self._snapshot
+
+    async def run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                print(f"Status poller error: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self):
+        return self._snapshot
+
+    async def latest(self):
+        """The cached snapshot, sampling once first if the background task is not running yet."""
+        if self._snapshot["updated_at"] is None or (self._task is None and self.is_stale()):
+            await self.poll_once()
+        return self._snapshot
+
+    def is_stale(self):
+        updated_at = self._snapshot["updated_at"]
+        return updated_at is None or time.time() - updated_at > 3 * self.interval
+
+    def online_urls(self):
+        return [url for url, s in self._snapshot["backends"].items() if s["online"]]
+
+    def progress(self):
+        """Progress of the first busy backend (the single-WebUI shape), plus every backend by URL."""
+        backends = self._snapshot["backends"]
+        first_url = next((url for url, s in backends.items() if is_busy(s)), next(iter(backends), None))
+        payload = dict(backends[first_url]["progress"] if first_url else IDLE_PROGRESS)
+        payload["url"] = first_url
+        payload["backends"] = {url: {k: v for k, v in s["progress"].items() if k != "current_image"}
+                               for url, s in backends.items()}
+        return payload
+
+
+def estimate_queue_eta(snapshot, pending_images, seconds_per_image):
+    """Seconds until the queue drains: what busy backends report left, plus queued images spread over online ones."""
+    samples = [s for s in snapshot["backends"].values() if s["online"]]
+    if not samples or seconds_per_image is None:
+        return None
+    running = max((s["progress"].get("eta_relative") or 0.0 for s in samples if is_busy(s)), default=0.0)
+    return round(running + pending_images * seconds_per_image / len(samples), 1)
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from PIL import Image
+
+THUMB_WIDTHS = (160, 512)
+THUMB_FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+
+
+class ThumbnailCache:
+    """Downscaled WebP/JPEG copies of output PNGs at a few fixed widths.
+
+    Thumbnails live at ``<root>/<width>/<stem>.<ext>`` and are made when an
+    image is saved, or on first request for images from before the cache
+    existed. A thumbnail older than its source is made again. A thumbnail's
+    mtime is bumped on every use, and once the files exceed ``max_bytes`` the
+    least recently used ones are deleted.
+    """
+
+    def __init__(self, root, widths=THUMB_WIDTHS, max_bytes=256 * 1024 ** 2, fmt="webp", quality=80):
+        if fmt not in THUMB_FORMATS:
+            raise ValueError(f"Thumbnail format must be one of {sorted(THUMB_FORMATS)}")
+        self.root = Path(root)
+        self.widths = tuple(sorted(widths))
+        self.max_bytes = max_bytes
+        self.fmt = fmt
+        self.quality = quality
+        self.media_type = THUMB_FORMATS[fmt][1]
+        self._lock = threading.Lock()
+        self.generated = 0
+        self.evictions = 0
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.total_bytes = sum(p.stat().st_size for p in self._files())
+
+    def _files(self):
+        return (p for width in self.widths for p in (self.root / str(width)).glob(f"*.{self.fmt}"))
+
+    def snap_width(self, width):
+        """Smallest configured width at least as wide as requested (the largest if none is)."""
+        for candidate in self.widths:
+            if width is None or candidate >= width:
+                return candidate
+        return self.widths[-1]
+
+    def path(self, source, width):
+        return self.root / str(width) / f"{Path(source).stem}.{self.fmt}"
+
+    def etag(self, source, width):
+        """Strong validator: thumbnails are a pure function of source bytes, width and encoder settings."""
+        st = Path(source).stat()
+        key = f"{Path(source).name}|{st.st_size}|{st.st_mtime_ns}|{width}|{self.fmt}|{self.quality}"
+        return '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+    def generate(self, source):
+        """Make every configured width of source; called right after an output is saved."""
+        source = Path(source)
+        with Image.open(source) as img:
+            img.load()
+            for width in self.widths:
+                self._write(img, source, width)
+        self.evict()
+
+    def get(self, source, width):
+        """Path of an up-to-date thumbnail of source at width, making it if needed."""
+        source = Path(source)
+        thumb = self.path(source, width)
+        try:
+            fresh = thumb.stat().st_mtime_ns >= source.stat().st_mtime_ns
+        except FileNotFoundError:
+            fresh = False
+        if fresh:
+            try:
+                os.utime(thumb)
+                return thumb
+            except FileNotFoundError:
+                pass  # Evicted between the stat and the touch.
+        with Image.open(source) as img:
+            img.load()
+            self._write(img, source, width)
+        self.evict()
+        return thumb
+
+    def _write(self, img, source, width):
+        thumb = self.path(source, width)
+        thumb.parent.mkdir(parents=True, exist_ok=True)
+        small = img.copy()
+        small.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+        if small.mode not in ("RGB", "RGBA") or (self.fmt == "jpeg" and small.mode != "RGB"):
+            small = small.convert("RGB")
+        tmp_path = thumb.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        small.save(tmp_path, format=THUMB_FORMATS[self.fmt][0], quality=self.quality)
+        with self._lock:
+            try:
+                previous = thumb.stat().st_size
+            except FileNotFoundError:
+                previous = 0
+            os.replace(tmp_path, thumb)
+            self.total_bytes += thumb.stat().st_size - previous
+            self.generated += 1
+
+    def evict(self):
+        """Delete least recently used thumbnails until they fit in max_bytes."""
+        with self._lock:
+            if self.total_bytes <= self.max_bytes:
+                return
+            entries = []
+            for p in self._files():
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, p))
+            entries.sort()
+            self.total_bytes = sum(size for _, size, _ in entries)
+            for _, size, p in entries:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                p.unlink(missing_ok=True)
+                self.total_bytes -= size
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "widths": list(self.widths),
+                "format": self.fmt,
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "generated": self.generated,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,79 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobSaves:
+    """CPU-side work for one job (PNG writes, draft cleanup) queued on the shared save executor."""
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = self.executor.submit(fn, *args, **kwargs)
+        self.futures.append(future)
+        return future
+
+    def wait(self):
+        """Block until everything submitted so far is done; re-raise the first failure."""
+        futures, self.futures = self.futures, []
+        errors = []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+
+class WorkerPool:
+    """Worker threads that keep the WebUIs fed, plus one executor for CPU work.
+
+    Each thread loops on take_job(), which returns a ticket or None when the queue
+    is empty, and run_job(ticket, saves). Saves go to the executor, so a thread
+    can send the next request while the previous images are still being written.
+    wake() cuts the idle wait short when a job is enqueued.
+    """
+
+    def __init__(self, take_job, run_job, workers=1, save_workers=2, idle_wait=1.0):
+        self.take_job = take_job
+        self.run_job = run_job
+        self.workers = workers
+        self.idle_wait = idle_wait
+        self.save_executor = ThreadPoolExecutor(max_workers=save_workers, thread_name_prefix="job-save")
+        self._threads = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def start(self):
+        for idx in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"job-worker-{idx}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"Started {self.workers} worker thread(s)...")
+        return self
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self.save_executor.shutdown(wait=True)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            ticket = self.take_job()
+            if ticket is None:
+                self._wake.wait(self.idle_wait)
+                self._wake.clear()
+                continue
+            try:
+                self.run_job(ticket, JobSaves(self.save_executor))
+            except Exception as e:
+                # run_job records failures on the job itself; this only keeps the thread alive.
+                print(f"Worker error: {e}")